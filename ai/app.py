@@ -9,12 +9,13 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import the Flask app
-from ml_server import app
+from ml_server import app, start_model_watcher
 
 # This allows Heroku to use: web: gunicorn app:app
 # Instead of: web: cd ai && gunicorn ml_server:app
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    start_model_watcher()
     app.run(host='0.0.0.0', port=port, debug=False)
 
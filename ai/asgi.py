@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for the Water Potability AI Server
+Serves the same routes as ml_server.py with async handlers, so a slow client
+only holds a coroutine instead of a whole worker. Model inference runs on a
+bounded thread pool; rule lookups are answered inline on the event loop.
+
+Run with: cd ai && uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 2
+"""
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ml_server
+from ml_server import (
+    admin_reload_payload, cached_recommendation, get_potability_recommendation,
+    get_potability_recommendations_batch, home_payload, health_payload, load_models, parse_batch_readings,
+    read_prediction_params, resolve_engine, start_model_watcher, status_payload, validate_batch_params,
+    validate_prediction_params
+)
+
+# Threads running model inference, and how many requests may wait for one
+INFERENCE_THREADS = int(os.environ.get('ASGI_INFERENCE_THREADS', 4))
+MAX_PENDING_INFERENCE = int(os.environ.get('ASGI_MAX_PENDING', 64))
+# Largest request body accepted (a full batch of 1000 readings is ~80 KB)
+MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 1024 * 1024))
+
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix='inference')
+inference_slots = None  # asyncio.Semaphore, created on the server's event loop
+
+class HTTPError(Exception):
+    """Error response raised inside a handler"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+async def run_inference(fn, *args):
+    """Run a CPU-bound call on the inference pool
+
+    Rejects the request with 503 once MAX_PENDING_INFERENCE calls are queued
+    or running, instead of letting the backlog grow without bound.
+    """
+    global inference_slots
+    if inference_slots is None:
+        inference_slots = asyncio.Semaphore(MAX_PENDING_INFERENCE)
+    if inference_slots.locked():
+        raise HTTPError(503, 'Server busy, try again shortly')
+    async with inference_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(inference_pool, fn, *args)
+
+async def read_body(receive):
+    """Read the whole request body, rejecting bodies over MAX_BODY_BYTES"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError('Client disconnected')
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, f'Request body too large (maximum is {MAX_BODY_BYTES} bytes)')
+        more_body = message.get('more_body', False)
+    return body
+
+def parse_json(body):
+    """Decoded JSON body, or None when the body is not valid JSON"""
+    try:
+        return json.loads(body) if body else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def request_headers(scope):
+    """Request headers keyed by lower-case name"""
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+
+def query_args(scope):
+    """First value of each query string parameter, like Flask's request.args"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return {key: values[0] for key, values in query.items()}
+
+def request_engine(args, data=None):
+    """Engine from ?engine= or an "engine" key in the JSON body"""
+    engine = args.get('engine')
+    if not engine and isinstance(data, dict):
+        engine = data.get('engine')
+    try:
+        return resolve_engine(engine)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    except RuntimeError as e:
+        raise HTTPError(503, str(e))
+
+async def predict(method, args, body):
+    """/predict: same parameters, validation and responses as the Flask route"""
+    try:
+        data = None
+        if method == 'GET':
+            tds_value, turbidity_value, temperature, ph_level = read_prediction_params(args)
+        else:
+            data = parse_json(body) or {}
+            if not isinstance(data, dict):
+                raise HTTPError(400, 'Request body must be a JSON object')
+            tds_value, turbidity_value, temperature, ph_level = read_prediction_params(data)
+    except (ValueError, TypeError) as e:
+        raise HTTPError(400, f'Invalid parameter format: {str(e)}. All values must be numbers.')
+
+    error = validate_prediction_params(tds_value, turbidity_value, temperature, ph_level)
+    if error:
+        raise HTTPError(400, error)
+
+    engine = request_engine(args, data)
+    params = (tds_value, turbidity_value, temperature, ph_level, engine)
+    try:
+        # Rule results are table lookups; only the models are worth a thread hop
+        if engine == 'ml':
+            return 200, await run_inference(cached_recommendation, *params)
+        return 200, cached_recommendation(*params)
+    except ValueError as e:
+        raise HTTPError(400, f'Invalid parameter format: {str(e)}. All values must be numbers.')
+
+async def predict_batch(args, body):
+    """/predict/batch: scores every reading in one pool call"""
+    data = parse_json(body)
+    if data is None:
+        raise HTTPError(400, 'Request body must be JSON')
+
+    engine = request_engine(args, data)
+    try:
+        tds, turbidity, temperature, ph = parse_batch_readings(data)
+    except (ValueError, TypeError) as e:
+        raise HTTPError(400, f'Invalid batch format: {str(e)}. All values must be numbers.')
+
+    error = validate_batch_params(tds, turbidity, temperature, ph)
+    if error:
+        raise HTTPError(400, error)
+
+    results = await run_inference(get_potability_recommendations_batch, tds, turbidity, temperature, ph, engine)
+    return 200, {
+        'status': 'success',
+        'count': len(results),
+        'results': results
+    }
+
+async def admin_reload(headers):
+    """/admin/reload: same token check and responses as the Flask route; the load runs off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_pool, admin_reload_payload, headers.get('x-admin-token', ''))
+
+async def handle(method, path, args, body, headers=None):
+    """Dispatch a request to its handler; returns (status, payload)"""
+    if path == '/' and method == 'GET':
+        return 200, home_payload()
+    if path == '/predict' and method in ('GET', 'POST'):
+        return await predict(method, args, body)
+    if path == '/predict/batch' and method == 'POST':
+        return await predict_batch(args, body)
+    if path == '/status' and method == 'GET':
+        return 200, status_payload()
+    if path == '/health' and method == 'GET':
+        return 200, health_payload()
+    if path == '/test' and method == 'GET':
+        return 200, get_potability_recommendation(350, 0.8)
+    if path == '/admin/reload' and method == 'POST':
+        return await admin_reload(headers or {})
+    if path in ('/', '/predict', '/predict/batch', '/status', '/health', '/test', '/admin/reload'):
+        raise HTTPError(405, f'Method {method} not allowed for {path}')
+    raise HTTPError(404, f'Not found: {path}')
+
+async def send_json(send, status, payload):
+    """Send a complete JSON response"""
+    body = json.dumps(payload, sort_keys=True).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii'))
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def lifespan(receive, send):
+    """Load models (if the import did not) and start the file watcher"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if not ml_server.current_models['loaded']:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(inference_pool, load_models)
+            start_model_watcher()
+            print(f"[SERVER] ASGI app ready ({INFERENCE_THREADS} inference threads, "
+                  f"max {MAX_PENDING_INFERENCE} pending)")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            inference_pool.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method = scope['method']
+    try:
+        body = await read_body(receive) if method == 'POST' else b''
+        status, payload = await handle(method, scope['path'], query_args(scope), body, request_headers(scope))
+    except ConnectionError:
+        return
+    except HTTPError as e:
+        status, payload = e.status, {'status': 'error', 'message': e.message}
+    except Exception as e:
+        status, payload = 500, {'status': 'error', 'message': f'Prediction failed: {str(e)}'}
+    await send_json(send, status, payload)
@@ -6,13 +6,17 @@ Automatically retrains potability models when new data is available
 
 import schedule
 import time
-import subprocess
 import os
 import sys
-import mysql.connector
+import json
+import urllib.request
 from datetime import datetime, timedelta
 import logging
 
+from db import connect_to_database
+from train_orchestrator import train_all
+import training_state
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,49 +27,26 @@ logging.basicConfig(
     ]
 )
 
-def connect_to_database():
-    """Connect to your MySQL database"""
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='u520834156_dbbagoWaters25',
-            charset='utf8mb4',
-            collation='utf8mb4_general_ci'
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"Database connection failed: {e}")
-        return None
+# Scheduled runs extend the current models with the new readings
+# ('incremental') or retrain from scratch ('full'). Incremental runs fall
+# back to a full retrain on their own when needed; --force is always full.
+TRAINING_MODE = os.environ.get('TRAINING_MODE', 'incremental').lower()
 
 def check_new_data():
-    """Check if there's new sensor data since last training"""
+    """Check if there's new sensor data since last training (against its high-water marks)"""
     conn = connect_to_database()
     if not conn:
+        logging.error("Database connection failed")
         return False
     
     try:
-        # Check for data in last 24 hours
-        query = """
-        SELECT COUNT(*) as new_records FROM (
-            SELECT reading_time FROM tds_readings 
-            WHERE reading_time >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
-            UNION ALL
-            SELECT reading_time FROM turbidity_readings 
-            WHERE reading_time >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
-        ) as combined_data
-        """
+        reason, changes = training_state.check(conn)
+        new_records = sum(change['new_rows'] for change in changes.values())
+        logging.info(f"Found {new_records} new sensor records since the last training")
         
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        new_records = result[0] if result else 0
-        
-        logging.info(f"Found {new_records} new sensor records in last 24 hours")
-        
-        # Retrain if we have at least 10 new records
-        return new_records >= 10
+        if reason:
+            logging.info(f"Retraining: {reason}")
+        return reason is not None
         
     except Exception as e:
         logging.error(f"Error checking new data: {e}")
@@ -73,67 +54,90 @@ def check_new_data():
     finally:
         conn.close()
 
-def run_training():
-    """Run the training script"""
+def current_marks():
+    """High-water marks of the sensor tables before training reads them (None without a database)"""
+    conn = connect_to_database()
+    if not conn:
+        return None
+    try:
+        return training_state.high_water_marks(conn)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not read high-water marks: {e}")
+        return None
+    finally:
+        conn.close()
+
+def run_training(incremental=False):
+    """Train every model with the training orchestrator"""
     try:
-        logging.info("Starting automatic AI training...")
+        logging.info(f"Starting automatic AI training ({'incremental' if incremental else 'full'})...")
         
-        # Change to AI directory
+        # Change to AI directory (models are written next to the scripts)
         ai_dir = os.path.dirname(os.path.abspath(__file__))
         os.chdir(ai_dir)
         
-        # Run training script
-        result = subprocess.run([
-            sys.executable, 'train_with_real_db_data.py'
-        ], capture_output=True, text=True, timeout=300)  # 5 minute timeout
+        # Marks are taken first: rows that arrive while training count as new next time
+        marks = current_marks()
         
-        if result.returncode == 0:
-            logging.info("✅ AI training completed successfully!")
-            logging.info(f"Training output: {result.stdout}")
-            
-            # Try to restart ML server if it's running
-            restart_ml_server()
-            
-            return True
-        else:
-            logging.error(f"❌ Training failed: {result.stderr}")
+        # Read the data once and fit all models in parallel
+        reports = train_all(incremental=incremental)
+        if reports is None:
+            logging.error("❌ Training failed: no sensor data could be read")
             return False
+        
+        for report in reports:
+            if 'error' in report:
+                logging.error(f"❌ {report['model']} failed: {report['error']}")
+            else:
+                logging.info(f"   {report['model']}: fit {report['fit_seconds']}s, peak RSS {report['peak_rss_mb']} MB")
+        if any('error' in report for report in reports):
+            return False
+        
+        logging.info("✅ AI training completed successfully!")
+        if marks:
+            training_state.save(marks)
+        
+        # Hot-reload the models in the running ML server
+        reload_ml_server()
+        
+        return True
             
-    except subprocess.TimeoutExpired:
-        logging.error("❌ Training timed out after 5 minutes")
-        return False
     except Exception as e:
         logging.error(f"❌ Training error: {e}")
         return False
 
-def restart_ml_server():
-    """Restart ML server to load new models"""
+def reload_ml_server():
+    """Ask the running ML server to hot-reload the new models
+    
+    Calls the authenticated /admin/reload endpoint (ML_SERVER_URL, ML_ADMIN_TOKEN).
+    No processes are killed: in-flight requests finish on the old models.
+    Servers that cannot be reached pick up the new files through their
+    model watcher or on their next start.
+    """
+    server_url = os.environ.get('ML_SERVER_URL', 'http://localhost:5000').rstrip('/')
+    admin_token = os.environ.get('ML_ADMIN_TOKEN', '')
+    
+    if not admin_token:
+        logging.info("ML_ADMIN_TOKEN not set - relying on the ML server's model watcher to reload")
+        return False
+    
     try:
-        logging.info("Attempting to restart ML server...")
-        
-        # Kill existing ML server process
-        if os.name == 'nt':  # Windows
-            subprocess.run(['taskkill', '/f', '/im', 'python.exe'], 
-                         capture_output=True)
-        else:  # Linux/Mac
-            subprocess.run(['pkill', '-f', 'ml_server.py'], 
-                         capture_output=True)
-        
-        time.sleep(2)  # Wait for process to stop
-        
-        # Start new ML server in background
-        ai_dir = os.path.dirname(os.path.abspath(__file__))
-        if os.name == 'nt':  # Windows
-            subprocess.Popen([sys.executable, 'ml_server.py'], 
-                           cwd=ai_dir, creationflags=subprocess.CREATE_NEW_CONSOLE)
-        else:  # Linux/Mac
-            subprocess.Popen([sys.executable, 'ml_server.py'], 
-                           cwd=ai_dir, start_new_session=True)
+        logging.info(f"Requesting model reload from {server_url}...")
+        reload_request = urllib.request.Request(
+            f"{server_url}/admin/reload",
+            data=b'',
+            method='POST',
+            headers={'X-Admin-Token': admin_token}
+        )
+        with urllib.request.urlopen(reload_request, timeout=60) as response:
+            result = json.loads(response.read().decode())
         
-        logging.info("✅ ML server restart initiated")
+        logging.info(f"✅ ML server reloaded models (generation {result.get('generation')})")
+        return True
         
     except Exception as e:
-        logging.error(f"⚠️ Could not restart ML server: {e}")
+        logging.warning(f"⚠️ Could not reach ML server for reload: {e} - it will load the new models via its watcher or on next start")
+        return False
 
 def scheduled_training():
     """Scheduled training function"""
@@ -141,7 +145,7 @@ def scheduled_training():
     
     if check_new_data():
         logging.info("📊 New data found - starting training...")
-        success = run_training()
+        success = run_training(incremental=TRAINING_MODE == 'incremental')
         
         if success:
             logging.info("🎉 Automatic training completed successfully!")
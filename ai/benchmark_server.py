@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Server Benchmark Suite
+Drives the ML server's endpoints at fixed concurrency levels and reports
+throughput, p50/p95/p99 latency and (in-process) allocations per request.
+
+Servers:
+    inprocess  ml_server:app through Flask's test client, no sockets
+    gunicorn   sync workers, as in the Procfile
+    uvicorn    the ASGI app in asgi.py
+
+Scenarios:
+    get     GET /predict with a random reading
+    post    POST /predict with a random reading
+    batch   POST /predict/batch with --batch-size random readings
+    health  GET /health
+
+Usage:
+    python benchmark_server.py [--servers inprocess,gunicorn,uvicorn] [--scenarios get,post,batch,health]
+                               [--concurrency 1,8,32] [--duration 5] [--engines rules]
+                               [--slow-clients 0] [--workers 2] [--batch-size 100]
+                               [--output results.json] [--baseline baseline.json] [--tolerance 0.10]
+
+Readings are random so the response cache rarely hits. --slow-clients keeps
+that many connections open that trickle their request headers one byte per
+second, like a client on a bad mobile link (socket servers only).
+With --baseline, every run also in the baseline is compared. The exit status
+is 1 when throughput drops or p99 latency grows by more than --tolerance.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+AI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = ('inprocess', 'gunicorn', 'uvicorn')
+SCENARIOS = ('get', 'post', 'batch', 'health')
+
+def server_command(server, port, workers):
+    """Command line that serves the app with the given server"""
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'ml_server:app', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers), '--timeout', '120', '--preload', '--log-level', 'warning']
+    if server == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    raise ValueError(f'Unknown server: {server}')
+
+def free_port():
+    """An unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(port, timeout=60):
+    """Poll /health until the server answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def start_server(server, workers):
+    """Start a server subprocess; returns (process, port)"""
+    port = free_port()
+    env = dict(os.environ, MODEL_WATCH_INTERVAL='0')
+    process = subprocess.Popen(server_command(server, port, workers), cwd=AI_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_until_ready(port):
+        process.kill()
+        raise RuntimeError(f'{server} did not become ready on port {port}')
+    return process, port
+
+def stop_server(process):
+    """Terminate a server subprocess and its workers"""
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def random_reading(rng):
+    """A random reading spanning every rule band"""
+    return {
+        'tds': round(rng.uniform(0, 1500), 2),
+        'turbidity': round(rng.uniform(0, 60), 3),
+        'temperature': round(rng.uniform(10, 35), 1),
+        'ph': round(rng.uniform(6, 9), 2)
+    }
+
+def make_request(scenario, rng, engine, batch_size):
+    """(method, path, JSON body or None) for one request of a scenario"""
+    if scenario == 'get':
+        reading = random_reading(rng)
+        query = '&'.join(f'{key}={value}' for key, value in reading.items())
+        return 'GET', f'/predict?{query}&engine={engine}', None
+    if scenario == 'post':
+        return 'POST', '/predict', dict(random_reading(rng), engine=engine)
+    if scenario == 'batch':
+        return 'POST', '/predict/batch', {
+            'engine': engine,
+            'readings': [random_reading(rng) for _ in range(batch_size)]
+        }
+    if scenario == 'health':
+        return 'GET', '/health', None
+    raise ValueError(f'Unknown scenario: {scenario}')
+
+def http_sender(port):
+    """send(method, path, body) -> status over a new connection each call (like the PHP client)"""
+    def send(method, path, body):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            if body is None:
+                connection.request(method, path)
+            else:
+                connection.request(method, path, body=json.dumps(body),
+                                   headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+    return send
+
+def inprocess_sender():
+    """send(method, path, body) -> status through a Flask test client"""
+    from ml_server import app
+    client = app.test_client()
+
+    def send(method, path, body):
+        return client.open(path, method=method, json=body).status_code
+    return send
+
+def slow_client(port, stop):
+    """Hold a connection open, sending one header byte per second"""
+    try:
+        s = socket.create_connection(('127.0.0.1', port), timeout=5)
+        s.sendall(b'GET /health HTTP/1.1\r\nHost: localhost\r\n')
+        while not stop.is_set():
+            s.sendall(b'X')
+            stop.wait(1.0)
+        s.close()
+    except OSError:
+        pass
+
+def load_client(new_sender, scenario, engine, batch_size, stop, latencies, errors, seed):
+    """Send requests back to back until stop is set"""
+    rng = random.Random(seed)
+    send = new_sender()
+    while not stop.is_set():
+        method, path, body = make_request(scenario, rng, engine, batch_size)
+        start = time.perf_counter()
+        try:
+            status = send(method, path, body)
+        except OSError as e:
+            errors.append(type(e).__name__)
+            continue
+        if status != 200:
+            errors.append(status)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+def run_load(new_sender, scenario, engine, concurrency, duration, batch_size, port=None, slow_clients=0):
+    """Drive one scenario for duration seconds and summarize the results"""
+    stop = threading.Event()
+    slow = [threading.Thread(target=slow_client, args=(port, stop), daemon=True) for _ in range(slow_clients)]
+    for thread in slow:
+        thread.start()
+    time.sleep(0.5 if slow_clients else 0)
+
+    latencies, errors = [], []
+    clients = [threading.Thread(target=load_client,
+                                args=(new_sender, scenario, engine, batch_size, stop, latencies, errors, i),
+                                daemon=True)
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in clients + slow:
+        thread.join(timeout=35)
+    elapsed = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000
+
+    def percentile(q):
+        return round(float(np.percentile(ms, q)), 3) if len(ms) else None
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(float(ms.max()), 3) if len(ms) else None
+    }
+
+def measure_allocations(scenario, engine, batch_size, n_requests=200):
+    """Mean and max peak Python allocation (KB) per in-process request, via tracemalloc"""
+    send = inprocess_sender()
+    rng = random.Random(0)
+    send(*make_request(scenario, rng, engine, batch_size))  # warm up
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(n_requests):
+            request = make_request(scenario, rng, engine, batch_size)
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            send(*request)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return round(float(np.mean(peaks)), 1), round(float(np.max(peaks)), 1)
+
+def run_key(run):
+    """Identity of a run for baseline comparison"""
+    return (run['server'], run['scenario'], run['engine'], run['concurrency'], run['slow_clients'])
+
+def compare_to_baseline(runs, baseline_path, tolerance):
+    """Print per-run changes against a saved results file; returns the regressed runs"""
+    with open(baseline_path) as f:
+        baseline = {run_key(run): run for run in json.load(f)['runs']}
+
+    regressions = []
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    for run in runs:
+        old = baseline.get(run_key(run))
+        if old is None or not old['rps'] or run['p99_ms'] is None or old['p99_ms'] is None:
+            continue
+        rps_change = run['rps'] / old['rps'] - 1
+        p99_change = run['p99_ms'] / old['p99_ms'] - 1
+        regressed = rps_change < -tolerance or p99_change > tolerance
+        if regressed:
+            regressions.append(run)
+        server, scenario, engine, concurrency, slow = run_key(run)
+        print(f"   {'REGRESSION' if regressed else 'ok':<10} {server:<9} {scenario:<6} {engine:<5} "
+              f"c={concurrency:<3} slow={slow}: req/s {old['rps']:.1f} -> {run['rps']:.1f} ({rps_change:+.1%}), "
+              f"p99 {old['p99_ms']:.1f} -> {run['p99_ms']:.1f} ms ({p99_change:+.1%})")
+    return regressions
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark the ML server endpoints')
+    parser.add_argument('--servers', default='inprocess,gunicorn,uvicorn', help='comma-separated servers')
+    parser.add_argument('--scenarios', default='get,post,batch,health', help='comma-separated scenarios')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per run')
+    parser.add_argument('--engines', default='rules', help='comma-separated scoring engines')
+    parser.add_argument('--slow-clients', default='0', help='comma-separated slow client counts')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--batch-size', type=int, default=100, help='readings per batch request')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against a JSON file written by --output')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed relative regression')
+    args = parser.parse_args()
+
+    servers = args.servers.split(',')
+    scenarios = args.scenarios.split(',')
+    for name, allowed in [(s, SERVERS) for s in servers] + [(s, SCENARIOS) for s in scenarios]:
+        if name not in allowed:
+            parser.error(f'unknown name "{name}" (choose from {", ".join(allowed)})')
+    concurrencies = [int(c) for c in args.concurrency.split(',')]
+    slow_counts = [int(c) for c in args.slow_clients.split(',')]
+    engines = args.engines.split(',')
+
+    print(f"Benchmark: {args.duration:.0f}s per run, {args.workers} workers, {os.cpu_count()} CPUs")
+    print(f"{'server':<9} {'scenario':<8} {'engine':<6} {'clients':>7} {'slow':>4} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'alloc KB':>9} {'errors':>6}")
+
+    runs = []
+    for server in servers:
+        if server == 'inprocess':
+            process, port = None, None
+            new_sender = inprocess_sender
+        else:
+            process, port = start_server(server, args.workers)
+            new_sender = lambda port=port: http_sender(port)
+        try:
+            for scenario in scenarios:
+                for engine in engines:
+                    allocations = (measure_allocations(scenario, engine, args.batch_size)
+                                   if server == 'inprocess' else (None, None))
+                    for slow in (slow_counts if server != 'inprocess' else [0]):
+                        for concurrency in concurrencies:
+                            result = run_load(new_sender, scenario, engine, concurrency, args.duration,
+                                              args.batch_size, port, slow)
+                            run = dict(server=server, scenario=scenario, engine=engine, concurrency=concurrency,
+                                       slow_clients=slow, alloc_kb_per_request=allocations[0],
+                                       alloc_kb_max=allocations[1], **result)
+                            runs.append(run)
+                            alloc = f"{run['alloc_kb_per_request']:.1f}" if allocations[0] is not None else '-'
+                            print(f"{server:<9} {scenario:<8} {engine:<6} {concurrency:>7} {slow:>4} "
+                                  f"{run['rps']:>8.1f} {run['p50_ms'] or 0:>8.1f} {run['p95_ms'] or 0:>8.1f} "
+                                  f"{run['p99_ms'] or 0:>8.1f} {alloc:>9} {run['errors']:>6}", flush=True)
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(),
+                'machine': {
+                    'hostname': platform.node(),
+                    'cpus': os.cpu_count(),
+                    'python': platform.python_version()
+                },
+                'settings': vars(args),
+                'runs': runs
+            }, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(runs, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} run(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
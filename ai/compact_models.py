@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Forest Compaction
+Shrinks a trained random forest for serving. The potability labels come from
+two thresholds, so a few shallow trees carry the same decision surface as
+200 depth-15 ones.
+
+    1. Depth cap: the smallest depth (COMPACT_DEPTHS) whose compacted
+       forest still scores within COMPACT_TOLERANCE of the full forest.
+       Nodes at the cap become leaves holding their subtree's class mix
+       or mean.
+    2. Greedy ensemble selection: trees are added one at a time, each time
+       the one that most improves the validation score, until that score is
+       within tolerance (and at least COMPACT_MIN_TREES are kept).
+    3. COMPACT_FLOAT32=1: the compiled serving artifact stores thresholds
+       and leaf values as float32 and node indices as int32, if that still
+       scores within tolerance.
+
+The score is accuracy for classifiers and R2 for regressors, measured on a
+validation set the forest was not trained on. Size, load time and per-row
+predict latency are reported before and after.
+
+Training scripts compact their forests before saving (COMPACT_MODELS=0
+turns it off). To see the effect on synthetic potability data:
+    python compact_models.py benchmark [rows]
+"""
+
+import copy
+import os
+import shutil
+import sys
+import tempfile
+import time
+import joblib
+import numpy as np
+
+from tree_compiler import CompiledForest, compile_model, load_compiled, save_compiled
+
+COMPACT_MODELS = os.environ.get('COMPACT_MODELS', '1').lower() in ('1', 'true', 'yes')
+COMPACT_TOLERANCE = float(os.environ.get('COMPACT_TOLERANCE', 0.005))   # allowed accuracy / R2 drop
+COMPACT_MIN_TREES = int(os.environ.get('COMPACT_MIN_TREES', 10))
+COMPACT_DEPTHS = [int(depth) for depth in os.environ.get('COMPACT_DEPTHS', '4,6,8,10,12').split(',') if depth]
+COMPACT_FLOAT32 = os.environ.get('COMPACT_FLOAT32', '0').lower() in ('1', 'true', 'yes')
+
+# Validation rows used for selection (a larger set is subsampled evenly)
+COMPACT_VALIDATION_ROWS = int(os.environ.get('COMPACT_VALIDATION_ROWS', 20000))
+
+# Share of the training rows held out for selection, so the test split that
+# metrics are reported on never influences which trees are kept
+COMPACT_VALIDATION_FRACTION = float(os.environ.get('COMPACT_VALIDATION_FRACTION', 0.2))
+
+FORESTS = ('RandomForestClassifier', 'RandomForestRegressor', 'ExtraTreesClassifier', 'ExtraTreesRegressor')
+
+def is_forest(model):
+    """Whether compaction applies to a model"""
+    return type(model).__name__ in FORESTS and hasattr(model, 'estimators_')
+
+def validation_split(model, X_train, y_train, stratify=False, chronological=False):
+    """(X_fit, X_val, y_fit, y_val): training rows to fit on and rows held out for compaction
+
+    Forests that will be compacted fit on the rest of the training rows; the
+    validation rows are the last ones for chronological splits. Other models
+    fit on every training row and get an empty validation set.
+    """
+    if not COMPACT_MODELS or type(model).__name__ not in FORESTS or len(X_train) < 10:
+        return X_train, X_train[:0], y_train, y_train[:0]
+    if chronological:
+        split_point = int(len(X_train) * (1 - COMPACT_VALIDATION_FRACTION))
+        return X_train[:split_point], X_train[split_point:], y_train[:split_point], y_train[split_point:]
+    from sklearn.model_selection import train_test_split
+    try:
+        return train_test_split(X_train, y_train, test_size=COMPACT_VALIDATION_FRACTION, random_state=42,
+                                stratify=y_train if stratify else None)
+    except ValueError:  # A class too rare to stratify
+        return train_test_split(X_train, y_train, test_size=COMPACT_VALIDATION_FRACTION, random_state=42)
+
+def node_depths(left, right):
+    """Depth of every node reachable from the root (-1 for none)"""
+    depth = np.full(len(left), -1)
+    frontier, level = np.array([0]), 0
+    while frontier.size:
+        depth[frontier] = level
+        internal = frontier[left[frontier] != -1]
+        frontier = np.concatenate([left[internal], right[internal]])
+        level += 1
+    return depth
+
+def cap_tree(estimator, max_depth):
+    """Copy of a fitted decision tree cut off at max_depth
+
+    Nodes at the cap become leaves; their stored value already sums (or
+    averages) the samples of the subtree below them.
+    """
+    tree = estimator.tree_
+    if tree.max_depth <= max_depth:
+        return estimator
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    depth = node_depths(nodes['left_child'], nodes['right_child'])
+    keep = (depth >= 0) & (depth <= max_depth)
+    new_index = np.cumsum(keep) - 1
+
+    capped = nodes[keep].copy()
+    leaf = (depth[keep] == max_depth) | (capped['left_child'] == -1)
+    capped['left_child'] = np.where(leaf, -1, new_index[capped['left_child']])
+    capped['right_child'] = np.where(leaf, -1, new_index[capped['right_child']])
+    capped['feature'] = np.where(leaf, -2, capped['feature'])
+    capped['threshold'] = np.where(leaf, -2.0, capped['threshold'])
+    if 'missing_go_to_left' in capped.dtype.names:
+        capped['missing_go_to_left'] = np.where(leaf, 0, capped['missing_go_to_left'])
+
+    new_tree = type(tree)(tree.n_features, np.asarray(tree.n_classes), tree.n_outputs)
+    new_tree.__setstate__({'max_depth': max_depth, 'node_count': int(keep.sum()),
+                           'nodes': capped, 'values': np.ascontiguousarray(values[keep])})
+    result = copy.copy(estimator)
+    result.tree_ = new_tree
+    result.max_depth = max_depth
+    return result
+
+def subset_forest(model, trees, max_depth=None):
+    """Copy of a fitted forest holding only `trees` (indices), optionally depth-capped"""
+    result = copy.copy(model)
+    result.estimators_ = [cap_tree(model.estimators_[i], max_depth) if max_depth else model.estimators_[i]
+                          for i in trees]
+    result.n_estimators = len(result.estimators_)
+    if max_depth:
+        result.max_depth = max_depth
+    return result
+
+def target_values(model, y):
+    """Validation targets as class indices (classifiers) or floats (regressors)"""
+    if hasattr(model, 'classes_'):
+        return np.searchsorted(model.classes_, np.asarray(y))
+    return np.asarray(y, dtype=float)
+
+def ensemble_scores(sums, count, y):
+    """Score of each candidate ensemble given its summed tree outputs (candidates, rows, outputs)"""
+    if sums.shape[2] > 1:
+        return (np.argmax(sums, axis=2) == y).mean(axis=1)
+    predictions = sums[:, :, 0] / count
+    total = ((y - y.mean()) ** 2).sum() or 1.0
+    return 1 - ((predictions - y) ** 2).sum(axis=1) / total
+
+def greedy_select(tree_outputs, y, target, min_trees):
+    """Indices of the trees picked by greedy forward selection, and their score
+
+    tree_outputs: (trees, rows, outputs) per-tree predictions. Stops at the
+    first ensemble of at least min_trees that scores >= target.
+    """
+    remaining = list(range(len(tree_outputs)))
+    chosen, total, score = [], np.zeros(tree_outputs.shape[1:]), -np.inf
+    while remaining:
+        scores = ensemble_scores(total + tree_outputs[remaining], len(chosen) + 1, y)
+        pick = int(np.argmax(scores))
+        score = float(scores[pick])
+        total += tree_outputs[remaining[pick]]
+        chosen.append(remaining.pop(pick))
+        if len(chosen) >= min_trees and score >= target:
+            break
+    return chosen, score
+
+def tree_outputs(compiled, X):
+    """Per-tree leaf values for X, shape (trees, rows, outputs)"""
+    return np.transpose(compiled.value[compiled.leaves(X)], (1, 0, 2))
+
+def compiled_score(compiled, X, y):
+    """Validation score of a compiled forest"""
+    raw = compiled.predict_raw(X)
+    return float(ensemble_scores(raw[None], 1, y)[0])
+
+def reduced_precision(compiled):
+    """Copy of a compiled forest with float32 thresholds / values and int32 node indices"""
+    arrays = compiled.to_dict()
+    for key in ('threshold', 'value'):
+        arrays[key] = arrays[key].astype(np.float32)
+    if len(arrays['feature']) < 2 ** 31:
+        for key in ('feature', 'left', 'right', 'roots'):
+            arrays[key] = arrays[key].astype(np.int32)
+    return CompiledForest(arrays)
+
+def artifact_stats(model, compiled):
+    """Size / load time of the registry artifacts and compiled per-row latency"""
+    directory = tempfile.mkdtemp(prefix='compact_')
+    try:
+        model_path = os.path.join(directory, 'model.pkl.z')
+        compiled_path = os.path.join(directory, 'model_mmap.pkl')
+        joblib.dump(model, model_path, compress=('zlib', 3))
+        save_compiled(compiled, compiled_path)
+
+        start = time.perf_counter()
+        joblib.load(model_path)
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        load_compiled(compiled_path, mmap_mode='r')
+        mmap_load_ms = (time.perf_counter() - start) * 1000
+        sizes = os.path.getsize(model_path), os.path.getsize(compiled_path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    row = np.zeros((1, compiled.n_features_in_))
+    start = time.perf_counter()
+    for _ in range(200):
+        compiled.predict_raw(row)
+    return {
+        'size_kb': round(sizes[0] / 1024, 1),
+        'load_ms': round(load_ms, 2),
+        'mmap_size_kb': round(sizes[1] / 1024, 1),
+        'mmap_load_ms': round(mmap_load_ms, 2),
+        'row_ms': round((time.perf_counter() - start) / 200 * 1000, 4)
+    }
+
+def describe(model, compiled, score):
+    """Shape, score and artifact stats of one forest"""
+    return {
+        'trees': len(model.estimators_),
+        'nodes': int(len(compiled.feature)),
+        'max_depth': int(compiled.max_depth),
+        'score': round(score, 4),
+        **artifact_stats(model, compiled)
+    }
+
+def compact_model(model, X_val, y_val, tolerance=None, float32=None):
+    """Compact a fitted forest against a validation set
+
+    Returns (model, compiled, report): the compacted sklearn forest, its
+    compiled serving form (float32 when enabled and within tolerance) and a
+    before/after report.
+    """
+    tolerance = COMPACT_TOLERANCE if tolerance is None else tolerance
+    float32 = COMPACT_FLOAT32 if float32 is None else float32
+    X = np.asarray(X_val, dtype=float)
+    y = np.asarray(y_val)
+    if len(X) > COMPACT_VALIDATION_ROWS:
+        rows = np.linspace(0, len(X) - 1, COMPACT_VALIDATION_ROWS).astype(int)
+        X, y = X[rows], y[rows]
+    y = target_values(model, y)
+
+    start = time.perf_counter()
+    full = compile_model(model)
+    full_score = compiled_score(full, X, y)
+    target = full_score - tolerance
+    min_trees = min(COMPACT_MIN_TREES, len(model.estimators_))
+
+    best = None
+    for depth in [depth for depth in sorted(set(COMPACT_DEPTHS)) if depth < full.max_depth] + [None]:
+        candidate = subset_forest(model, range(len(model.estimators_)), depth) if depth else model
+        chosen, score = greedy_select(tree_outputs(compile_model(candidate), X), y, target, min_trees)
+        if score >= target:
+            best = subset_forest(model, chosen, depth), depth
+            break
+    if best is None:  # Cannot happen with every tree available, but never serve a worse model
+        best = model, None
+    compacted, depth = best
+    compiled = compile_model(compacted)
+    score = compiled_score(compiled, X, y)
+
+    quantized = False
+    if float32:
+        reduced = reduced_precision(compiled)
+        reduced_score = compiled_score(reduced, X, y)
+        if reduced_score >= target:
+            compiled, score, quantized = reduced, reduced_score, True
+
+    report = {
+        'tolerance': tolerance,
+        'depth_cap': depth,
+        'float32': quantized,
+        'validation_rows': int(len(X)),
+        'seconds': round(time.perf_counter() - start, 2),
+        'before': describe(model, full, full_score),
+        'after': describe(compacted, compiled, score)
+    }
+    return compacted, compiled, report
+
+def print_report(report):
+    """Before/after table of a compaction report"""
+    before, after = report['before'], report['after']
+    print(f"   Compaction (tolerance {report['tolerance']}, depth cap {report['depth_cap']}, "
+          f"float32 {report['float32']}, {report['seconds']:.1f}s):")
+    print(f"   {'':>8} {'trees':>6} {'nodes':>8} {'depth':>6} {'score':>7} {'size KB':>8} "
+          f"{'load ms':>8} {'mmap KB':>8} {'mmap ms':>8} {'row ms':>7}")
+    for label, stats in (('before', before), ('after', after)):
+        print(f"   {label:>8} {stats['trees']:>6} {stats['nodes']:>8} {stats['max_depth']:>6} "
+              f"{stats['score']:>7.4f} {stats['size_kb']:>8.1f} {stats['load_ms']:>8.2f} "
+              f"{stats['mmap_size_kb']:>8.1f} {stats['mmap_load_ms']:>8.2f} {stats['row_ms']:>7.4f}")
+
+def compact_for_serving(model, X_val, y_val):
+    """compact_model() for training scripts: (model, compiled or None, report or None)
+
+    Models that are not forests, and every model when COMPACT_MODELS is
+    off, pass through unchanged.
+    """
+    if not COMPACT_MODELS or not is_forest(model) or len(X_val) == 0:
+        return model, None, None
+    model, compiled, report = compact_model(model, X_val, y_val)
+    print_report(report)
+    return model, compiled, report
+
+def benchmark(n_rows=20000):
+    """Compact the default potability classifier trained on synthetic readings"""
+    import contextlib
+    import io
+    from sklearn.model_selection import train_test_split
+    from train_with_real_db_data import (build_potability_classifier, create_potability_labels,
+                                         prepare_features, synthetic_sensor_frames)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = create_potability_labels(*synthetic_sensor_frames(n_rows))
+        feature_cols = prepare_features(data)
+    X_train, X_val, y_train, y_val = train_test_split(
+        data[feature_cols], data['potability_status'], test_size=0.2, random_state=42,
+        stratify=data['potability_status'])
+    model = build_potability_classifier().fit(X_train, y_train)
+    print(f"Potability classifier on {n_rows:,} synthetic readings:")
+    for float32 in (False, True):
+        _, _, report = compact_model(model, X_val, y_val, float32=float32)
+        print_report(report)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    else:
+        print(__doc__.strip())
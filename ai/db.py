@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Shared Database Access
+One source for the MySQL settings, a connection pool shared by every Python
+tool in a process, parameterized queries that log their timings, and the
+indexes the sensor range scans rely on.
+
+Settings come from DB_HOST, DB_PORT, DB_USER, DB_PASSWORD and DB_NAME
+(defaults: the local XAMPP database the PHP pages use).
+
+Usage:
+    python db.py indexes     # create the recommended indexes that are missing
+    python db.py timings     # time the sensor queries the tools run
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),
+    'database': os.environ.get('DB_NAME', 'u520834156_DBBagoWaters25'),
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_general_ci'
+}
+
+# Connections kept open per process (servers bound their own concurrency below this)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+
+# Log queries taking at least this many milliseconds (0 = every query, negative = none)
+QUERY_LOG_MS = float(os.environ.get('DB_QUERY_LOG_MS', 100))
+
+# Indexes for the range scans the tools run: history windows and keyset
+# pages on (reading_time, id), per-device windows on (device_id,
+# reading_time). Syncs after a high-water mark use the primary key.
+INDEXES = [
+    ('tds_readings', 'idx_tds_time_id', ('reading_time', 'id')),
+    ('tds_readings', 'idx_tds_device_time', ('device_id', 'reading_time')),
+    ('turbidity_readings', 'idx_turbidity_time_id', ('reading_time', 'id')),
+    ('turbidity_readings', 'idx_turbidity_device_time', ('device_id', 'reading_time'))
+]
+
+pool = None
+pool_lock = threading.Lock()
+
+# label -> {'count', 'total_ms', 'max_ms'}
+query_stats = {}
+stats_lock = threading.Lock()
+
+def get_pool(pool_size=None):
+    """The process's connection pool, created on first use (None while the database is unreachable)"""
+    global pool
+    with pool_lock:
+        if pool is None:
+            try:
+                from mysql.connector import pooling
+                pool = pooling.MySQLConnectionPool(pool_name='watersanity', pool_size=pool_size or DB_POOL_SIZE,
+                                                   pool_reset_session=True, **DB_CONFIG)
+            except Exception as e:
+                print(f"Database connection failed: {e}")
+        return pool
+
+def connect_to_database():
+    """A pooled connection (close() hands it back), or None if the database is unreachable
+
+    When every pooled connection is checked out a direct connection is
+    opened instead, so a script holding one never blocks on another.
+    """
+    connections = get_pool()
+    if connections is None:
+        return None
+    try:
+        from mysql.connector.errors import PoolError
+        try:
+            return connections.get_connection()
+        except PoolError:
+            import mysql.connector
+            return mysql.connector.connect(**DB_CONFIG)
+    except Exception as e:
+        print(f"Database connection failed: {e}")
+        return None
+
+def placeholder(conn):
+    """DB-API parameter marker for a connection ('?' for sqlite3, '%s' for MySQL drivers)"""
+    return '?' if type(conn).__module__.startswith('sqlite3') else '%s'
+
+def sql_value(conn, value):
+    """Parameter value for a connection (sqlite3 stores timestamps as text)"""
+    if isinstance(value, datetime) and placeholder(conn) == '?':
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+@contextmanager
+def timed(label):
+    """Time the enclosed query under a label, logging it when slow"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with stats_lock:
+            stats = query_stats.setdefault(label, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        if 0 <= QUERY_LOG_MS <= elapsed_ms:
+            print(f"[db] {label}: {elapsed_ms:.1f} ms")
+
+def query(conn, sql, params=(), label=None):
+    """Run a parameterized statement and return its rows
+
+    Write %s for each parameter (it becomes ? on sqlite3); values are
+    always passed to the driver, never formatted into the SQL.
+    """
+    mark = placeholder(conn)
+    if mark != '%s':
+        sql = sql.replace('%s', mark)
+    cursor = conn.cursor()
+    try:
+        with timed(label or ' '.join(sql.split())[:60]):
+            cursor.execute(sql, [sql_value(conn, value) for value in params])
+            return cursor.fetchall() if cursor.description else []
+    finally:
+        cursor.close()
+
+def query_summary():
+    """Timing totals per query label, slowest first"""
+    with stats_lock:
+        summary = {label: {'count': stats['count'],
+                           'avg_ms': round(stats['total_ms'] / stats['count'], 2),
+                           'max_ms': round(stats['max_ms'], 2)}
+                   for label, stats in query_stats.items()}
+    return dict(sorted(summary.items(), key=lambda item: -item[1]['avg_ms']))
+
+def has_column(conn, table, column):
+    """Whether a table has a column (probes with an empty SELECT)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'SELECT {column} FROM {table} LIMIT 0')
+        cursor.fetchall()
+        return True
+    except Exception:
+        return False
+    finally:
+        cursor.close()
+
+def index_columns(conn, table):
+    """Column tuples of a table's existing indexes"""
+    if placeholder(conn) == '?':
+        names = [row[1] for row in query(conn, f'PRAGMA index_list({table})', label='index list')]
+        return {tuple(row[2] for row in query(conn, f'PRAGMA index_info({name})', label='index list'))
+                for name in names}
+    indexes = {}
+    rows = query(conn, 'SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS '
+                       'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX',
+                 (table,), label='index list')
+    for name, column in rows:
+        indexes.setdefault(name, []).append(column)
+    return {tuple(columns) for columns in indexes.values()}
+
+def ensure_indexes(conn):
+    """Create the recommended indexes a table lacks; returns [(table, name, status)]
+
+    An index counts as present when an existing one starts with the same
+    columns. Indexes on a column the table does not have are skipped.
+    """
+    results = []
+    for table, name, columns in INDEXES:
+        if not all(has_column(conn, table, column) for column in columns):
+            results.append((table, name, 'no such column'))
+            continue
+        if any(existing[:len(columns)] == columns for existing in index_columns(conn, table)):
+            results.append((table, name, 'exists'))
+            continue
+        query(conn, f'CREATE INDEX {name} ON {table} ({", ".join(columns)})', label=f'create {name}')
+        results.append((table, name, 'created'))
+    conn.commit()
+    return results
+
+def time_sensor_queries(conn, hours=24):
+    """Run the range scans the tools issue once each, recording their timings"""
+    since = datetime.now() - timedelta(hours=hours)
+    for table in ('tds_readings', 'turbidity_readings'):
+        query(conn, f'SELECT COUNT(*) FROM {table} WHERE reading_time >= %s', (since,),
+              label=f'{table} window count')
+        query(conn, f'SELECT MAX(id), MAX(reading_time) FROM {table}', label=f'{table} high-water mark')
+        query(conn, f'SELECT * FROM {table} WHERE reading_time >= %s ORDER BY reading_time, id LIMIT 1000',
+              (since,), label=f'{table} window page')
+        if has_column(conn, table, 'device_id'):
+            query(conn, f'SELECT * FROM {table} WHERE device_id = %s AND reading_time >= %s '
+                        f'ORDER BY reading_time LIMIT 1000', ('SENSOR_001', since), label=f'{table} device window')
+    return query_summary()
+
+def main():
+    """Command line entry point"""
+    if len(sys.argv) != 2 or sys.argv[1] not in ('indexes', 'timings'):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    conn = connect_to_database()
+    if not conn:
+        sys.exit(1)
+    try:
+        if sys.argv[1] == 'indexes':
+            for table, name, status in ensure_indexes(conn):
+                print(f"{table}.{name}: {status}")
+        else:
+            for label, stats in time_sensor_queries(conn).items():
+                print(f"{label:40s} {stats['avg_ms']:8.1f} ms")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Per-Device Forecast State
+Keeps a ForecastState (features.py) for every sensor device, fed with
+readings as they arrive, so the forecasting server reads lag and rolling
+features from memory instead of querying the last readings per forecast.
+
+Each table has one state per device_id (DEFAULT_DEVICE for tables or rows
+without one) and a combined state of all its readings, which forecasts
+that do not name a device use. The high-water mark (largest id fed) is
+kept per table, so only newer rows need to be fetched.
+
+The states are saved to a JSON snapshot, so a restarted server resumes
+from it and fetches only rows added since, instead of backfilling.
+
+Usage:
+    python device_state.py show [snapshot.json]
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from features import FORECAST_SENSOR_COLUMNS, ForecastState
+
+# Forecast value column per table
+TABLE_VALUES = {'tds_readings': 'tds_value', 'turbidity_readings': 'ntu_value'}
+
+# Device name for readings without a device_id (as the sensor store names them)
+DEFAULT_DEVICE = 'default'
+
+# Key of the combined state of every device in a table
+ALL_DEVICES = '*'
+
+STATE_FILE = os.environ.get('FORECAST_STATE_FILE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'forecast_state.json'))
+
+class DeviceStates:
+    """ForecastState per (table, device), with each table's high-water mark"""
+
+    def __init__(self):
+        self.states = {table: {} for table in TABLE_VALUES}
+        self.last_id = {table: 0 for table in TABLE_VALUES}
+        self.updated_at = None
+        self.lock = threading.Lock()
+
+    def state(self, table, device=None):
+        """Copy of a device's state (default the combined one), or None if it has no readings
+
+        A table whose readings carry no device_id has only the combined
+        state, which then stands in for every device.
+        """
+        with self.lock:
+            states = self.states[table]
+            state = states.get(device or ALL_DEVICES)
+            if state is None and set(states) <= {DEFAULT_DEVICE, ALL_DEVICES}:
+                state = states.get(ALL_DEVICES)
+            return state.copy() if state is not None else None
+
+    def devices(self, table):
+        """Devices with a state in a table"""
+        return sorted(device for device in self.states[table] if device != ALL_DEVICES)
+
+    def feed(self, table, frame):
+        """Add new rows of a table (any order); returns how many reached their device's state
+
+        Rows are applied in reading_time order. Like the forecast history
+        queries, only positive values count, and a reading older than its
+        device's newest is dropped (the buffers only append).
+        """
+        if frame is None or not len(frame):
+            return 0
+        value_col = TABLE_VALUES[table]
+        extra_columns = [column for column in FORECAST_SENSOR_COLUMNS if column in frame.columns]
+        frame = frame.sort_values('reading_time', kind='mergesort')
+        used = frame[(frame[value_col] > 0) & frame['reading_time'].notna()]
+        devices = (used['device_id'].fillna(DEFAULT_DEVICE).astype(str).to_numpy()
+                   if 'device_id' in used.columns else np.full(len(used), DEFAULT_DEVICE))
+        values = used[value_col].to_numpy(dtype=float)
+        times = used['reading_time'].tolist()
+        extras = {column: used[column].to_numpy(dtype=float) for column in extra_columns}
+
+        count = 0
+        with self.lock:
+            states = self.states[table]
+            for i, (device, value, time) in enumerate(zip(devices, values, times)):
+                given = {column: column_values[i] for column, column_values in extras.items()}
+                for key in (device, ALL_DEVICES):
+                    state = states.get(key)
+                    if state is None:
+                        state = states[key] = ForecastState(extra_columns)
+                    elif state.time is not None and time < state.time:
+                        continue
+                    state.push(value, time, **given)
+                    count += key != ALL_DEVICES
+            if 'id' in frame.columns:
+                self.last_id[table] = max(self.last_id[table], int(frame['id'].max()))
+            self.updated_at = datetime.now().isoformat(timespec='seconds')
+        return count
+
+    def to_dict(self):
+        """Every state and high-water mark as plain JSON values"""
+        with self.lock:
+            return {
+                'saved_at': datetime.now().isoformat(timespec='seconds'),
+                'updated_at': self.updated_at,
+                'tables': {table: {'last_id': self.last_id[table],
+                                   'devices': {device: state.to_dict() for device, state in states.items()}}
+                           for table, states in self.states.items()}
+            }
+
+    def save(self, path=None):
+        """Write the snapshot (atomically: a reader never sees a partial file)"""
+        path = path or STATE_FILE
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        """States from a snapshot; empty states if there is none (or it is unreadable)"""
+        states = cls()
+        try:
+            with open(path or STATE_FILE) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return states
+        for table, saved in data.get('tables', {}).items():
+            if table in states.states:
+                states.last_id[table] = int(saved['last_id'])
+                states.states[table] = {device: ForecastState.from_dict(state)
+                                        for device, state in saved['devices'].items()}
+        states.updated_at = data.get('updated_at')
+        return states
+
+    def summary(self):
+        """{table: {'last_id', 'devices': {device: (readings held, newest reading time)}}}"""
+        with self.lock:
+            return {table: {'last_id': self.last_id[table],
+                            'devices': {device: (len(state), str(pd.Timestamp(state.time)))
+                                        for device, state in states.items()}}
+                    for table, states in self.states.items()}
+
+def main():
+    """Command line entry point"""
+    if len(sys.argv) < 2 or sys.argv[1] != 'show':
+        print(__doc__.strip())
+        sys.exit(1)
+    print(json.dumps(DeviceStates.load(sys.argv[2] if len(sys.argv) > 2 else None).summary(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Shared Feature Pipeline
+Builds model features for training and serving from one definition, as
+array operations over a whole batch of readings. ForecastState keeps one
+series' newest readings for recursive multi-step forecasts.
+
+Potability features (classifier and score regressor) are built from TDS,
+turbidity and the sensor extras; forecast features (next TDS / turbidity
+reading) from one sensor's series of readings. Training scripts, the ML
+server, the recommendation API and the forecasting CLI all call this
+module, so a model always sees the features it was trained on.
+"""
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Potability model inputs (train_with_real_db_data.py / ml_server.py)
+POTABILITY_COLUMNS = [
+    'tds_value', 'turbidity_value', 'hour', 'day_of_week', 'day_of_year',
+    'temperature', 'voltage', 'analog_value', 'conductivity',
+    'tds_turbidity_ratio', 'quality_index'
+]
+
+# Recommendation model inputs (train_potability_recommendation.py / potability_recommendation_api.py)
+RECOMMENDATION_COLUMNS = [
+    'tds_value', 'turbidity_value', 'hour', 'day_of_week',
+    'temperature', 'ph_level', 'conductivity',
+    'tds_turbidity_ratio', 'quality_index'
+]
+
+# Every column potability_features() builds; served models may use any of them
+SERVED_POTABILITY_COLUMNS = POTABILITY_COLUMNS + ['ph_level']
+
+# Forecast model inputs; the sensor extras are only used when the table has them
+FORECAST_COLUMNS = [
+    'hour', 'day_of_week', 'day_of_year', 'lag_1', 'lag_3', 'lag_6', 'lag_12',
+    'rolling_mean_3', 'rolling_mean_6', 'rolling_std_6'
+]
+FORECAST_SENSOR_COLUMNS = ['analog_value', 'voltage']
+FORECAST_LAGS = (1, 3, 6, 12)
+
+# Stand-ins for sensor values a request does not carry
+DEFAULT_TEMPERATURE = 25.0
+DEFAULT_PH = 7.0
+DEFAULT_VOLTAGE = 3.5
+
+def time_features(times=None):
+    """(hour, day_of_week, day_of_year) of readings
+
+    times: array-like of timestamps (one value per reading), a single
+    datetime shared by every reading, or None for the current time.
+    """
+    if times is None or isinstance(times, datetime):
+        moment = times or datetime.now()
+        return moment.hour, moment.weekday(), moment.timetuple().tm_yday
+    index = pd.DatetimeIndex(times)
+    return index.hour.to_numpy(), index.dayofweek.to_numpy(), index.dayofyear.to_numpy()
+
+def derived_features(tds, turbidity):
+    """Conductivity estimate, TDS/turbidity ratio and quality index"""
+    return {
+        'conductivity': tds * 2,
+        'tds_turbidity_ratio': tds / (turbidity + 0.1),
+        'quality_index': (tds / 500) + (turbidity / 1.0)
+    }
+
+def potability_features(tds, turbidity, temperature=DEFAULT_TEMPERATURE, ph_level=DEFAULT_PH,
+                        times=None, voltage=None, analog_value=None):
+    """Every potability feature for a batch of readings, as {column: array or scalar}
+
+    Scalars (a shared temperature, or the time of a batch scored now) are
+    kept as scalars and broadcast by potability_matrix(). Missing voltage
+    and analog_value fall back to the approximations the server has always
+    used.
+    """
+    tds = np.asarray(tds, dtype=float).ravel()
+    turbidity = np.asarray(turbidity, dtype=float).ravel()
+    hour, day_of_week, day_of_year = time_features(times)
+    features = {
+        'tds_value': tds,
+        'turbidity_value': turbidity,
+        'hour': hour,
+        'day_of_week': day_of_week,
+        'day_of_year': day_of_year,
+        'temperature': np.asarray(temperature, dtype=float),
+        'ph_level': np.asarray(ph_level, dtype=float),
+        'voltage': DEFAULT_VOLTAGE if voltage is None else np.asarray(voltage, dtype=float),
+        'analog_value': tds * 2.5 if analog_value is None else np.asarray(analog_value, dtype=float)
+    }
+    features.update(derived_features(tds, turbidity))
+    return features
+
+def potability_matrix(tds, turbidity, temperature=DEFAULT_TEMPERATURE, ph_level=DEFAULT_PH,
+                      times=None, voltage=None, analog_value=None, columns=POTABILITY_COLUMNS):
+    """(N, len(columns)) float feature matrix for a batch of readings"""
+    features = potability_features(tds, turbidity, temperature, ph_level, times, voltage, analog_value)
+    matrix = np.empty((len(features['tds_value']), len(columns)), dtype=float)
+    for j, column in enumerate(columns):
+        matrix[:, j] = features[column]
+    return matrix
+
+def lag(values, steps):
+    """values shifted `steps` readings later (NaN where there is no earlier reading)"""
+    shifted = np.full(len(values), np.nan)
+    if steps < len(values):
+        shifted[steps:] = values[:len(values) - steps]
+    return shifted
+
+def shifted_window(values, window):
+    """(window, N) array of each reading (row 0) and the window-1 readings before it
+
+    Returns (readings, valid): positions before the start of the series and
+    missing readings are invalid and hold 0.
+    """
+    readings = np.stack([lag(values, steps) for steps in range(window)])
+    valid = ~np.isnan(readings)
+    readings[~valid] = 0.0
+    return readings, valid
+
+def window_mean(readings, valid):
+    """Mean of the valid readings in each window (like pandas rolling, min_periods=1)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return readings.sum(axis=0) / valid.sum(axis=0)
+
+def window_std(readings, valid, means):
+    """Sample standard deviation in each window (NaN with fewer than two readings)"""
+    counts = valid.sum(axis=0)
+    squares = np.where(valid, (readings - means) ** 2, 0.0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+
+def forecast_features(values, times, analog_value=None, voltage=None):
+    """Forecast features for every reading of one sensor series, oldest first
+
+    Returns {column: array}: FORECAST_COLUMNS, plus analog_value / voltage
+    when given. Rows near the start have NaN lags.
+    """
+    values = np.asarray(values, dtype=float)
+    hour, day_of_week, day_of_year = time_features(times)
+    # One six-reading window serves every rolling statistic
+    readings, valid = shifted_window(values, 6)
+    rolling_mean_6 = window_mean(readings, valid)
+    features = {
+        'hour': hour,
+        'day_of_week': day_of_week,
+        'day_of_year': day_of_year,
+        **{f'lag_{steps}': lag(values, steps) for steps in FORECAST_LAGS},
+        'rolling_mean_3': window_mean(readings[:3], valid[:3]),
+        'rolling_mean_6': rolling_mean_6,
+        'rolling_std_6': window_std(readings, valid, rolling_mean_6)
+    }
+    if analog_value is not None:
+        features['analog_value'] = np.asarray(analog_value, dtype=float)
+    if voltage is not None:
+        features['voltage'] = np.asarray(voltage, dtype=float)
+    return features
+
+def forecast_columns(features):
+    """Forecast feature columns present in a forecast_features() result, in model order"""
+    return FORECAST_COLUMNS + [column for column in FORECAST_SENSOR_COLUMNS if column in features]
+
+def forecast_training_set(data, value_col):
+    """(X, y, feature_cols) for a next-reading forecast model
+
+    The target is the next reading. Rows that are missing their own value,
+    a full lag history or a next reading are dropped.
+    """
+    data = data.sort_values('reading_time', kind='mergesort').reset_index(drop=True)
+    features = forecast_features(data[value_col], data['reading_time'],
+                                 data['analog_value'] if 'analog_value' in data.columns else None,
+                                 data['voltage'] if 'voltage' in data.columns else None)
+    feature_cols = forecast_columns(features)
+    frame = pd.DataFrame({column: features[column] for column in feature_cols})
+    values = data[value_col].to_numpy(dtype=float)
+    frame['target'] = np.append(values[1:], np.nan)[:len(values)]
+    frame = frame[~np.isnan(values)].dropna()
+    return frame[feature_cols], frame['target'], feature_cols
+
+def reading_interval(times, default=3600.0):
+    """Median seconds between consecutive readings (default with fewer than two)"""
+    times = np.sort(np.asarray(times, dtype='datetime64[ns]'))
+    if len(times) < 2:
+        return default
+    seconds = float(np.median(np.diff(times)) / np.timedelta64(1, 's'))
+    return seconds if seconds > 0 else default
+
+class ForecastState:
+    """Rolling forecast features of one sensor series, updated in place
+
+    A ring buffer of the newest reading and the max(FORECAST_LAGS) readings
+    before it, in fixed-size arrays, with running sums and sums of squares
+    over the newest 3 and 6 readings. push() and features() take constant
+    time: a reading overwrites the oldest slot and adjusts the sums, and
+    the lags are read by index. Rows match what forecast_features() builds
+    for the newest reading of the same series; missing lags fall back to
+    the newest reading and a missing spread to 0.
+
+    extra_columns: the FORECAST_SENSOR_COLUMNS the series has. The newest
+    values are used; a reading pushed without them keeps the previous ones.
+    """
+
+    SIZE = max(FORECAST_LAGS) + 1
+    WINDOWS = (3, 6)
+
+    # Positions in the feature row
+    LAG_POSITIONS = [FORECAST_COLUMNS.index(f'lag_{steps}') for steps in FORECAST_LAGS]
+    MEAN_3, MEAN_6, STD_6 = (FORECAST_COLUMNS.index(name) for name in
+                             ('rolling_mean_3', 'rolling_mean_6', 'rolling_std_6'))
+
+    def __init__(self, extra_columns=()):
+        self.values = np.full(self.SIZE, np.nan)
+        self.times = np.full(self.SIZE, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.head = 0  # Slot the next reading goes into
+        self.time = None
+        self.extra_columns = [column for column in FORECAST_SENSOR_COLUMNS if column in extra_columns]
+        self.extras = np.full(len(self.extra_columns), np.nan)
+        self.columns = FORECAST_COLUMNS + self.extra_columns
+        self.row = np.zeros((1, len(self.columns)))
+        self.reset_sums()
+
+    @classmethod
+    def from_history(cls, history, current_value, value_col, now=None):
+        """State of a new reading following `history` (oldest first)
+
+        The current reading takes the sensor extras of the newest history
+        reading.
+        """
+        now = now or datetime.now()
+        history = history.tail(max(FORECAST_LAGS))  # Older readings cannot affect the newest row
+        state = cls([column for column in FORECAST_SENSOR_COLUMNS if column in history.columns])
+        defaults = {'analog_value': current_value * 2.5, 'voltage': DEFAULT_VOLTAGE}
+        state.extras[:] = [defaults[column] for column in state.extra_columns]
+
+        extras = {column: history[column].to_numpy(dtype=float) for column in state.extra_columns}
+        for i, (value, time) in enumerate(zip(history[value_col].to_numpy(dtype=float), history['reading_time'])):
+            state.push(value, time, **{column: values[i] for column, values in extras.items()})
+        state.push(current_value, now)
+        return state
+
+    @classmethod
+    def from_dict(cls, data):
+        """State saved with to_dict()"""
+        state = cls(data['extra_columns'])
+        for value, time in zip(data['values'], data['times']):
+            if time is not None:
+                state.push(np.nan if value is None else value, pd.Timestamp(time))
+        state.extras[:] = [np.nan if value is None else value for value in data['extras']]
+        return state
+
+    def to_dict(self):
+        """Readings (oldest first), extras and extra columns as plain JSON values"""
+        order = [(self.head + k) % self.SIZE for k in range(self.SIZE)]
+        return {
+            'values': [None if np.isnan(self.values[i]) else float(self.values[i]) for i in order],
+            'times': [None if np.isnat(self.times[i]) else str(self.times[i]) for i in order],
+            'extra_columns': self.extra_columns,
+            'extras': [None if np.isnan(value) else float(value) for value in self.extras]
+        }
+
+    def copy(self):
+        """Independent copy (a forecast advances its copy, not the shared state)"""
+        state = object.__new__(ForecastState)
+        state.__dict__.update(self.__dict__)
+        for name in ('values', 'times', 'extras', 'row', 'sums', 'squares', 'counts'):
+            setattr(state, name, getattr(self, name).copy())
+        return state
+
+    def reset_sums(self):
+        """Recompute the running sums from the buffer"""
+        self.sums, self.squares, self.counts = [0.0, 0.0], [0.0, 0.0], [0, 0]
+        for i, window in enumerate(self.WINDOWS):
+            for k in range(1, window + 1):
+                value = self.values[(self.head - k) % self.SIZE]
+                if not np.isnan(value):
+                    self.sums[i] += value
+                    self.squares[i] += value * value
+                    self.counts[i] += 1
+
+    def push(self, value, time, analog_value=None, voltage=None):
+        """Add the newest reading, taken at `time`"""
+        value = float(value)
+        for i, window in enumerate(self.WINDOWS):
+            leaving = self.values[(self.head - window) % self.SIZE]
+            if not np.isnan(leaving):
+                self.sums[i] -= leaving
+                self.squares[i] -= leaving * leaving
+                self.counts[i] -= 1
+            if not np.isnan(value):
+                self.sums[i] += value
+                self.squares[i] += value * value
+                self.counts[i] += 1
+
+        self.values[self.head] = value
+        self.times[self.head] = np.datetime64(pd.Timestamp(time).to_datetime64(), 'ns')
+        self.time = time
+        given = {'analog_value': analog_value, 'voltage': voltage}
+        for j, column in enumerate(self.extra_columns):
+            if given[column] is not None:
+                self.extras[j] = given[column]
+
+        self.head = (self.head + 1) % self.SIZE
+        if self.head == 0:
+            self.reset_sums()  # Once per lap, so rounding errors cannot build up
+
+    def __len__(self):
+        """Readings held (at most SIZE)"""
+        return int((~np.isnat(self.times)).sum())
+
+    def interval(self, default=3600.0):
+        """Median seconds between the held readings"""
+        return reading_interval(self.times[~np.isnat(self.times)], default)
+
+    def features(self):
+        """Feature row (1, n) of the newest reading (the state's own array, refilled on each call)"""
+        row = self.row[0]
+        current = self.values[(self.head - 1) % self.SIZE]
+        row[0], row[1], row[2] = time_features(self.time)
+        for j, steps in zip(self.LAG_POSITIONS, FORECAST_LAGS):
+            past = self.values[(self.head - 1 - steps) % self.SIZE]
+            row[j] = current if np.isnan(past) else past
+
+        (sum_3, sum_6), (count_3, count_6) = self.sums, self.counts
+        row[self.MEAN_3] = sum_3 / count_3 if count_3 else np.nan
+        mean_6 = sum_6 / count_6 if count_6 else np.nan
+        row[self.MEAN_6] = mean_6
+        if count_6 > 1:
+            row[self.STD_6] = np.sqrt(max((self.squares[1] - count_6 * mean_6 * mean_6) / (count_6 - 1), 0.0))
+        else:
+            row[self.STD_6] = 0.0
+        row[len(FORECAST_COLUMNS):] = self.extras
+        row[np.isnan(row)] = 0.0
+        return self.row
+
+def latest_forecast_features(history, current_value, value_col, now=None):
+    """Forecast feature row (1, n) for a new reading following `history` (oldest first)
+
+    The current reading takes the sensor extras of the newest history
+    reading. With a short history, missing lags fall back to the current
+    value and a missing spread to 0.
+    """
+    return ForecastState.from_history(history, current_value, value_col, now).features().copy()
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Water Quality Forecasting Server
+Long-running replacement for calling predict_real_data.py once per forecast.
+The TDS and turbidity forecast models stay loaded (compiled to node arrays
+where possible) and database connections come from a pool, so a forecast
+only costs the two history reads and two predictions instead of an
+interpreter start, the pandas/sklearn imports, two model loads and a new
+MySQL connection.
+
+predict_real_data.py is now a thin client of this server: same arguments,
+same JSON, and it still forecasts in-process when the server is not running.
+
+A forecast covers every hour up to horizon_hours (at most a week): the
+models predict the next reading, so each prediction is fed back as that
+reading through a ForecastState (features.py) that is updated in place.
+The recursion steps at least an hour at a time (FORECAST_STEP_SECONDS) and
+at most FORECAST_MAX_STEPS times, not at the sensors' 30-second cadence.
+
+The readings a forecast starts from are kept in memory per device
+(device_state.py). A background thread feeds them with the rows added since
+the last poll, so a forecast does not query the database. The states are
+snapshotted to disk, so a restart resumes without backfilling.
+
+Endpoints:
+    GET/POST /forecast?tds=350&turbidity=0.8&horizon_hours=6[&device=SENSOR_001]
+    GET      /health
+
+Run with: cd ai && python forecast_server.py   (port FORECAST_PORT, default 5001)
+          python forecast_server.py benchmark [devices]
+"""
+
+from flask import Flask, request, jsonify
+import joblib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import os
+import sys
+import threading
+import time
+
+import db
+from features import ForecastState
+import model_registry
+from device_state import DeviceStates, TABLE_VALUES
+from sensor_extract import has_column, read_table
+from tree_compiler import CompiledForest, compile_model
+
+app = Flask(__name__)
+
+FORECAST_PORT = int(os.environ.get('FORECAST_PORT', 5001))
+
+# Forecast model files (resolved against this directory), as train_with_real_data.py writes them
+TDS_MODEL_FILE = os.environ.get('FORECAST_TDS_MODEL_FILE', 'tds_model_real.pkl')
+TURBIDITY_MODEL_FILE = os.environ.get('FORECAST_TURBIDITY_MODEL_FILE', 'turbidity_model_real.pkl')
+
+# Seconds between checks for retrained models (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.environ.get('FORECAST_WATCH_INTERVAL', 30))
+
+# Pooled database connections (db.py), at most one per concurrent forecast
+DB_POOL_SIZE = int(os.environ.get('FORECAST_DB_POOL_SIZE', 4))
+
+# Readings older than this are not used as forecast history
+HISTORY_HOURS = 12
+
+# Seconds between polls for new readings (0 disables the feeder thread;
+# forecasts then poll for themselves)
+FEED_INTERVAL = float(os.environ.get('FORECAST_FEED_INTERVAL', 5))
+
+# Longest trajectory one call may ask for (a week)
+MAX_HORIZON_HOURS = int(os.environ.get('FORECAST_MAX_HORIZON_HOURS', 168))
+
+# Shortest step of the recursion, and the most steps one trajectory may take.
+# Stepping at the sensors' own interval (30 s) would take 20,160 model calls
+# per sensor for a week; hourly steps take 168.
+FORECAST_STEP_SECONDS = float(os.environ.get('FORECAST_STEP_SECONDS', 3600))
+FORECAST_MAX_STEPS = int(os.environ.get('FORECAST_MAX_STEPS', 168))
+
+# Forecasts are clipped to what the sensors can report
+TDS_BOUNDS = (50, 1500)
+TURBIDITY_BOUNDS = (0.1, 100)
+
+# Swapped as a whole on reload, so a forecast never mixes two model versions
+current_models = {'tds': None, 'turbidity': None, 'signature': None, 'sources': {}, 'loaded_at': None}
+reload_lock = threading.Lock()
+
+db_pool = None
+db_pool_lock = threading.Lock()
+# The pool raises instead of waiting when every connection is out, so callers queue here
+db_slots = threading.BoundedSemaphore(DB_POOL_SIZE)
+
+device_states = None  # DeviceStates, restored from the snapshot on first use
+device_states_lock = threading.Lock()
+device_columns = {}  # Whether each table has a device_id column
+
+def model_paths():
+    """Absolute paths of the TDS and turbidity model files"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, TDS_MODEL_FILE), os.path.join(script_dir, TURBIDITY_MODEL_FILE)
+
+def model_signature():
+    """Current registry version, or (mtime, size) of the file, per model; None if one is missing"""
+    signature = []
+    for path in model_paths():
+        version = model_registry.current_version(model_registry.model_name(path))
+        if version is None:
+            try:
+                version = (os.stat(path).st_mtime_ns, os.stat(path).st_size)
+            except OSError:
+                return None
+        signature.append(version)
+    return tuple(signature)
+
+def load_forecast_model(path):
+    """(model, source) for one forecast model: the registry's CURRENT version, else the plain file
+
+    Tree ensembles are compiled for serving; other models keep sklearn.
+    """
+    name = model_registry.model_name(path)
+    if model_registry.current_version(name) is not None:
+        model, manifest = model_registry.load(name)
+        source = {'registry': True, 'version': manifest['version'], 'created_at': manifest['created_at']}
+    else:
+        model = joblib.load(path)
+        modified = datetime.fromtimestamp(os.path.getmtime(path))
+        source = {'registry': False, 'version': None, 'created_at': modified.isoformat(timespec='seconds')}
+
+    source['estimator'] = type(model).__name__
+    try:
+        model = compile_model(model)
+        source['compiled'] = True
+    except ValueError:
+        source['compiled'] = False
+    return model, source
+
+def load_models():
+    """Load both forecast models into a new snapshot; returns whether they loaded
+
+    On failure the previous snapshot keeps serving.
+    """
+    global current_models
+    with reload_lock:
+        signature = model_signature()
+        try:
+            tds_path, turbidity_path = model_paths()
+            tds_model, tds_source = load_forecast_model(tds_path)
+            turbidity_model, turbidity_source = load_forecast_model(turbidity_path)
+        except Exception as e:
+            print(f"❌ Forecast models not loaded: {e}")
+            return False
+        current_models = {
+            'tds': tds_model,
+            'turbidity': turbidity_model,
+            'signature': signature,
+            'sources': {'tds': tds_source, 'turbidity': turbidity_source},
+            'loaded_at': datetime.now().isoformat(timespec='seconds')
+        }
+    print(f"✅ Forecast models loaded ({tds_source['estimator']}, {turbidity_source['estimator']})")
+    return True
+
+def watch_models(interval):
+    """Reload the models once retrained files have stopped changing for one interval"""
+    pending = None
+    while True:
+        time.sleep(interval)
+        signature = model_signature()
+        if signature is None or signature == current_models['signature']:
+            pending = None
+            continue
+        if signature != pending:
+            pending = signature  # Wait one more interval for writes to settle
+            continue
+        print("[RELOAD] Forecast models changed - reloading in background...")
+        load_models()
+        pending = None
+
+model_watcher = None
+
+def start_model_watcher(interval=None):
+    """Start the background model watcher (once per process)"""
+    global model_watcher
+    interval = MODEL_WATCH_INTERVAL if interval is None else interval
+    if interval <= 0 or (model_watcher is not None and model_watcher.is_alive()):
+        return model_watcher
+    model_watcher = threading.Thread(target=watch_models, args=(interval,), name='forecast-model-watcher',
+                                     daemon=True)
+    model_watcher.start()
+    return model_watcher
+
+def get_db_pool():
+    """The shared connection pool, created on first use (None while the database is unreachable)"""
+    global db_pool
+    with db_pool_lock:
+        if db_pool is None:
+            db_pool = db.get_pool(DB_POOL_SIZE)
+        return db_pool
+
+def get_device_states():
+    """The per-device states, restored from the snapshot on first use"""
+    global device_states
+    with device_states_lock:
+        if device_states is None:
+            device_states = DeviceStates.load()
+        return device_states
+
+def feed_new_readings(conn, states):
+    """Feed each table's rows above its high-water mark; returns {table: readings used}
+
+    Without a high-water mark (first start, no snapshot) the last
+    HISTORY_HOURS of readings are backfilled instead.
+    """
+    fed = {}
+    for table, value_col in TABLE_VALUES.items():
+        if table not in device_columns:
+            device_columns[table] = has_column(conn, table, 'device_id')
+        columns = [value_col, 'analog_value', 'voltage', 'reading_time'] + (['device_id'] if device_columns[table] else [])
+        if states.last_id[table]:
+            rows = read_table(conn, table, columns=columns, after_id=states.last_id[table])
+        else:
+            rows = read_table(conn, table, columns=columns, since=datetime.now() - timedelta(hours=HISTORY_HOURS))
+        fed[table] = states.feed(table, rows)
+    return fed
+
+def refresh_device_states():
+    """Poll the database for new readings and save the snapshot if any arrived
+
+    Returns the states; without a database they keep what they hold.
+    """
+    states = get_device_states()
+    pool = get_db_pool()
+    if pool is None:
+        return states
+
+    with db_slots:
+        try:
+            conn = pool.get_connection()
+        except Exception as e:
+            print(f"Database connection failed: {e}")
+            return states
+        try:
+            fed = feed_new_readings(conn, states)
+        except Exception as e:
+            print(f"Error fetching new readings: {e}")
+            return states
+        finally:
+            conn.close()
+
+    if any(fed.values()):
+        try:
+            states.save()
+        except OSError as e:
+            print(f"⚠️ Could not save the forecast state snapshot: {e}")
+    return states
+
+def feed_readings(interval):
+    """Feed new readings into the device states every interval"""
+    while True:
+        refresh_device_states()
+        time.sleep(interval)
+
+reading_feeder = None
+
+def start_reading_feeder(interval=None):
+    """Start the background reading feeder (once per process)"""
+    global reading_feeder
+    interval = FEED_INTERVAL if interval is None else interval
+    if interval <= 0 or (reading_feeder is not None and reading_feeder.is_alive()):
+        return reading_feeder
+    reading_feeder = threading.Thread(target=feed_readings, args=(interval,), name='forecast-reading-feeder',
+                                      daemon=True)
+    reading_feeder.start()
+    return reading_feeder
+
+def start_state(state, current_value, value_col, now):
+    """(state, reading interval) a forecast advances from: the device's readings, then the current one
+
+    Readings older than HISTORY_HOURS are left out, as the history queries
+    did, and the interval falls back to an hour.
+    """
+    if state.time is None or pd.Timestamp(state.time) < pd.Timestamp(now) - timedelta(hours=HISTORY_HOURS):
+        empty = pd.DataFrame(columns=[value_col, 'reading_time'] + state.extra_columns)
+        return ForecastState.from_history(empty, current_value, value_col, now), 3600.0
+    interval = state.interval()
+    state.push(current_value, now)
+    return state, interval
+
+def prepare_forecast_states(current_tds, current_turbidity, tds_state, turbidity_state, now=None):
+    """Rolling feature states and reading intervals (seconds) for both sensors
+
+    Each state continues its device's readings with the current one, and
+    steps forward at the device's usual interval between readings. The
+    device states are copies, so the shared ones are left as they were.
+    """
+    now = now or datetime.now()
+    return (start_state(tds_state, current_tds, 'tds_value', now),
+            start_state(turbidity_state, current_turbidity, 'ntu_value', now))
+
+def forecast_step(interval, horizon_hours):
+    """Seconds per recursion step: the reading interval, but at least FORECAST_STEP_SECONDS
+    and long enough to reach the horizon in FORECAST_MAX_STEPS steps"""
+    return max(interval, FORECAST_STEP_SECONDS, horizon_hours * 3600 / FORECAST_MAX_STEPS)
+
+def model_input(model, state):
+    """The state's feature row, named if the model is an sklearn model fitted on a DataFrame"""
+    row = state.features()
+    if not isinstance(model, CompiledForest) and getattr(model, 'feature_names_in_', None) is not None:
+        return pd.DataFrame(row, columns=state.columns)
+    return row
+
+def forecast_trajectory(model, state, horizon_hours, step_seconds, bounds):
+    """Forecast at each whole hour 1..horizon_hours, one reading at a time
+
+    The models predict the next reading, so each prediction is pushed into
+    the state as that reading and the next one is predicted from it, until
+    the horizon. The state is advanced in place.
+    """
+    hourly = np.empty(horizon_hours)
+    hour, steps = 0, 0
+    while hour < horizon_hours:
+        value = min(max(float(model.predict(model_input(model, state))[0]), bounds[0]), bounds[1])
+        state.push(value, state.time + timedelta(seconds=step_seconds))
+        steps += 1
+        # A reading interval over an hour covers several hours with one step
+        while hour < horizon_hours and steps * step_seconds >= (hour + 1) * 3600 - 1e-6:
+            hourly[hour] = value
+            hour += 1
+    return hourly
+
+def trajectory_points(tds_values, turbidity_values, now):
+    """[{'hour', 'timestamp', 'tds_prediction', 'turbidity_prediction'}, ...] for hours 1..H"""
+    return [{
+        'hour': hour,
+        'timestamp': (now + timedelta(hours=hour)).isoformat(),
+        'tds_prediction': float(tds),
+        'turbidity_prediction': float(turbidity)
+    } for hour, (tds, turbidity) in enumerate(zip(tds_values, turbidity_values), start=1)]
+
+def predict_with_ml_models(current_tds, current_turbidity, horizon_hours, models=None, now=None, device=None):
+    """Forecast with the loaded models, or None when models or readings are unavailable
+
+    device: forecast from one device's readings (default every device's).
+    """
+    models = models or current_models
+    if models['tds'] is None or models['turbidity'] is None:
+        return None
+
+    # Without the feeder thread (predict_real_data.py in-process), poll here
+    if reading_feeder is None or not reading_feeder.is_alive():
+        refresh_device_states()
+    states = get_device_states()
+    tds_state, turbidity_state = states.state('tds_readings', device), states.state('turbidity_readings', device)
+    if tds_state is None or turbidity_state is None:
+        return None
+
+    now = now or datetime.now()
+    (tds_state, tds_interval), (turbidity_state, turbidity_interval) = prepare_forecast_states(
+        current_tds, current_turbidity, tds_state, turbidity_state, now
+    )
+
+    try:
+        tds_values = forecast_trajectory(models['tds'], tds_state, horizon_hours,
+                                         forecast_step(tds_interval, horizon_hours), TDS_BOUNDS)
+        turbidity_values = forecast_trajectory(models['turbidity'], turbidity_state, horizon_hours,
+                                               forecast_step(turbidity_interval, horizon_hours), TURBIDITY_BOUNDS)
+        return {
+            'tds_prediction': float(tds_values[-1]),
+            'turbidity_prediction': float(turbidity_values[-1]),
+            'confidence': 0.85,
+            'method': 'ml_models',
+            'trajectory': trajectory_points(tds_values, turbidity_values, now)
+        }
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        return None
+
+def predict_with_trend(current_tds, current_turbidity, horizon_hours, now=None):
+    """Fallback forecast: the current readings drifting by a small random amount over the horizon"""
+    tds_trend = 1 + (np.random.normal(0, 0.02))  # ±2% change
+    turbidity_trend = 1 + (np.random.normal(0, 0.03))  # ±3% change
+    share = np.arange(1, horizon_hours + 1) / horizon_hours
+    return {
+        'tds_prediction': current_tds * tds_trend,
+        'turbidity_prediction': current_turbidity * turbidity_trend,
+        'confidence': 0.70,
+        'method': 'trend_analysis',
+        'trajectory': trajectory_points(current_tds * (1 + (tds_trend - 1) * share),
+                                        current_turbidity * (1 + (turbidity_trend - 1) * share),
+                                        now or datetime.now())
+    }
+
+def forecast(current_tds, current_turbidity, horizon_hours, device=None):
+    """Forecast response in predict_real_data.py's JSON shape
+
+    tds_prediction / turbidity_prediction are the values horizon_hours
+    ahead; trajectory holds every hour up to it. Loads the models on first
+    use when the server has not (the in-process fallback of
+    predict_real_data.py).
+    """
+    if not 1 <= horizon_hours <= MAX_HORIZON_HOURS:
+        raise ValueError(f'horizon_hours must be between 1 and {MAX_HORIZON_HOURS}')
+    if current_models['signature'] is None and model_signature() is not None:
+        load_models()
+    now = datetime.now()
+    prediction = (predict_with_ml_models(current_tds, current_turbidity, horizon_hours, now=now, device=device)
+                  or predict_with_trend(current_tds, current_turbidity, horizon_hours, now))
+    return {
+        'status': 'success',
+        'timestamp': now.isoformat(),
+        'tds_prediction': prediction['tds_prediction'],
+        'turbidity_prediction': prediction['turbidity_prediction'],
+        'confidence': prediction['confidence'],
+        'method': prediction['method'],
+        'horizon_hours': horizon_hours,
+        'trajectory': prediction['trajectory']
+    }
+
+@app.route('/forecast', methods=['GET', 'POST'])
+def forecast_route():
+    """Forecast TDS and turbidity from the current readings"""
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    if not hasattr(data, 'get'):
+        data = {}
+    try:
+        current_tds = float(data.get('tds'))
+        current_turbidity = float(data.get('turbidity'))
+        horizon_hours = int(data.get('horizon_hours', 1))
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': 'Parameters tds, turbidity (numbers) and horizon_hours (integer) are required'
+        }), 400
+
+    try:
+        return jsonify(forecast(current_tds, current_turbidity, horizon_hours, data.get('device')))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Prediction failed: {str(e)}'}), 500
+
+@app.route('/health')
+def health():
+    """Liveness and which forecast models are being served"""
+    return jsonify({
+        'status': 'healthy',
+        'models_loaded': current_models['tds'] is not None and current_models['turbidity'] is not None,
+        'models': current_models['sources'],
+        'loaded_at': current_models['loaded_at'],
+        'database_pool': db_pool is not None,
+        'queries': db.query_summary(),
+        'readings': get_device_states().summary()
+    })
+
+def rebuilt_trajectory(model, history, current_value, value_col, horizon_hours, step_seconds, bounds, now):
+    """forecast_trajectory() by appending each reading to the history frame and rebuilding its features
+
+    The per-step DataFrame approach ForecastState replaces; kept as the
+    benchmark and test reference.
+    """
+    hourly = np.empty(horizon_hours)
+    hour, steps, value, time = 0, 0, current_value, now
+    while hour < horizon_hours:
+        features = model_input(model, ForecastState.from_history(history, value, value_col, now=time))
+        reading = history.iloc[[-1]].assign(**{value_col: value, 'reading_time': pd.Timestamp(time)})
+        history = pd.concat([history, reading], ignore_index=True)
+        value = min(max(float(model.predict(features)[0]), bounds[0]), bounds[1])
+        time += timedelta(seconds=step_seconds)
+        steps += 1
+        while hour < horizon_hours and steps * step_seconds >= (hour + 1) * 3600 - 1e-6:
+            hourly[hour] = value
+            hour += 1
+    return hourly
+
+def benchmark(devices=3, horizons=(24, 168)):
+    """Time 24h and 168h TDS trajectories per device at the sensors' 30 s interval
+
+    Each horizon is timed at the served step (forecast_step) with the
+    in-place state and with rebuilt frames, and at one step per reading.
+    """
+    from features import forecast_training_set
+    from train_with_real_data import build_tds_model
+
+    interval = 30  # READING_INTERVAL of the device firmware
+    rng = np.random.default_rng(42)
+    series = {}
+    for device in range(devices):
+        times = pd.date_range('2024-01-01', periods=3000, freq=f'{interval}s')
+        tds = 400 + 80 * np.sin(np.arange(len(times)) / 72 + device) + rng.normal(0, 8, len(times))
+        series[f'SENSOR_{device:03d}'] = pd.DataFrame({'tds_value': tds, 'analog_value': tds * 2.5,
+                                                       'voltage': 3.3, 'reading_time': times})
+
+    X, y, _ = forecast_training_set(pd.concat(series.values(), ignore_index=True), 'tds_value')
+    model = compile_model(build_tds_model().fit(X, y))
+    print(f"TDS trajectories per device ({devices} devices, readings every {interval} s, "
+          f"compiled {len(model.roots)}-tree forest):")
+    print(f"   {'horizon':>8} {'steps':>6} {'in-place state':>15} {'rebuilt frames':>15} "
+          f"{'per reading':>12} {'(steps)':>8}")
+    for horizon in horizons:
+        step = forecast_step(interval, horizon)
+        state_seconds, rebuilt_seconds, reading_seconds = [], [], []
+        for frame in series.values():
+            history, current = frame.iloc[:-1].tail(20), float(frame['tds_value'].iloc[-1])
+            now = frame['reading_time'].iloc[-1].to_pydatetime()
+            start = time.perf_counter()
+            fast = forecast_trajectory(model, ForecastState.from_history(history, current, 'tds_value', now),
+                                       horizon, step, TDS_BOUNDS)
+            state_seconds.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            slow = rebuilt_trajectory(model, history, current, 'tds_value', horizon, step, TDS_BOUNDS, now)
+            rebuilt_seconds.append(time.perf_counter() - start)
+            assert np.allclose(fast, slow)
+            start = time.perf_counter()
+            forecast_trajectory(model, ForecastState.from_history(history, current, 'tds_value', now),
+                                horizon, interval, TDS_BOUNDS)
+            reading_seconds.append(time.perf_counter() - start)
+        state_ms, rebuilt_ms, reading_ms = (1000 * np.mean(seconds) for seconds in
+                                            (state_seconds, rebuilt_seconds, reading_seconds))
+        print(f"   {horizon:>7}h {int(np.ceil(horizon * 3600 / step)):>6} {state_ms:>12.1f} ms "
+              f"{rebuilt_ms:>12.1f} ms {reading_ms:>9.1f} ms {horizon * 3600 // interval:>8}")
+
+def serve():
+    """Load the models, connect the pool and run the server"""
+    print("Starting Water Quality Forecasting Server...")
+    print("=" * 50)
+    if not load_models():
+        print("[INFO] Forecasting with trend analysis until the models are trained")
+        print("Run: python train_with_real_data.py")
+    start_model_watcher()
+    start_reading_feeder()  # Also connects the pool up front
+
+    print(f"[SERVER] Forecasting server started on port {FORECAST_PORT}")
+    print(f"   GET  http://localhost:{FORECAST_PORT}/forecast?tds=350&turbidity=0.8&horizon_hours=6")
+    print(f"   GET  http://localhost:{FORECAST_PORT}/health")
+    app.run(host='0.0.0.0', port=FORECAST_PORT, debug=False, threaded=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    else:
+        serve()
@@ -4,27 +4,13 @@ Generate Synthetic Realistic Sensor Data for AI Training
 Creates realistic TDS and Turbidity readings based on real-world patterns
 """
 
-import mysql.connector
 import random
 import numpy as np
 from datetime import datetime, timedelta
 import time
 
-def connect_to_database():
-    """Connect to your MySQL database"""
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='u520834156_DBBagoWaters251',
-            charset='utf8mb4',
-            collation='utf8mb4_general_ci'
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        return None
+import sensor_store
+from db import connect_to_database
 
 def generate_realistic_tds_data(num_records=100):
     """Generate realistic TDS sensor data"""
@@ -204,6 +190,8 @@ def clear_existing_data(conn):
         cursor.execute("DELETE FROM turbidity_readings")
         conn.commit()
         print("✅ Existing data cleared")
+        # The local sensor store only syncs new rows; start it over
+        sensor_store.clear()
     except Exception as e:
         print(f"❌ Error clearing data: {e}")
         conn.rollback()
@@ -0,0 +1,19 @@
+"""
+Gunicorn settings for the ML server
+Picked up automatically when gunicorn is started from the ai/ directory
+"""
+
+# Load the app (and its models) once in the master before forking, so the
+# workers share the model pages copy-on-write instead of each unpickling
+# its own copy. Combine with MODEL_MMAP=1 to map the tree arrays from disk.
+preload_app = True
+
+def post_worker_init(worker):
+    """Log each worker's memory and start its model file watcher
+
+    Threads do not survive fork, so the watcher is started per worker here
+    rather than when the app is preloaded in the master.
+    """
+    from ml_server import memory_report, format_memory, start_model_watcher
+    worker.log.info("[MEMORY] Worker ready: %s", format_memory(memory_report()))
+    start_model_watcher()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Request Micro-Batcher
+Collects concurrent single-row model calls for up to max_wait_ms or
+max_batch_size rows, runs one vectorized call over all of them and hands
+each caller its own result
+"""
+
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+
+class Histogram:
+    """Fixed-bucket histogram (bucket i counts values <= bounds[i]; the last one is overflow)"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        """Record one value"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self):
+        """Buckets keyed by upper bound, plus count and mean"""
+        buckets = {f'<={bound:g}': n for bound, n in zip(self.bounds, self.counts)}
+        buckets[f'>{self.bounds[-1]:g}'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 4) if self.count else 0.0,
+            'buckets': buckets
+        }
+
+class MicroBatcher:
+    """Coalesces concurrent predict calls into batches run on one background thread
+
+    predict_fn takes a list of items and returns a list of results in the
+    same order. If it raises, every caller in that batch gets the exception.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.batch_sizes = Histogram((1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self.queue_wait_ms = Histogram((0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100))
+        self.batches = 0
+        self.failures = 0
+        self._stats_lock = threading.Lock()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Start the batching thread in this process (threads do not survive fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, item):
+        """Queue one item; returns a Future for its result"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Queue one item and wait for its result"""
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait is over"""
+        pending = [self._queue.get()]
+        deadline = pending[0][2] + self.max_wait
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                pending.append(self._queue.get(timeout=remaining) if remaining > 0
+                               else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        """Batching loop"""
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+            with self._stats_lock:
+                self.batches += 1
+                self.batch_sizes.observe(len(pending))
+                for _, _, queued_at in pending:
+                    self.queue_wait_ms.observe((started - queued_at) * 1000)
+
+            try:
+                results = self.predict_fn([item for item, _, _ in pending])
+                if len(results) != len(pending):
+                    raise RuntimeError(f'Batch predict returned {len(results)} results for {len(pending)} items')
+            except Exception as e:
+                with self._stats_lock:
+                    self.failures += 1
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(pending, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Batch size and queue wait histograms for /status"""
+        with self._stats_lock:
+            return {
+                'enabled': True,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'failures': self.failures,
+                'batch_size': self.batch_sizes.to_dict(),
+                'queue_wait_ms': self.queue_wait_ms.to_dict()
+            }
@@ -9,217 +9,669 @@ import joblib
 import numpy as np
 import pandas as pd
 from datetime import datetime
+import hmac
 import os
 import sys
+import threading
+import time
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from features import DEFAULT_PH, POTABILITY_COLUMNS, SERVED_POTABILITY_COLUMNS, potability_matrix
+import model_registry
+from tree_compiler import CompiledForest, compile_model, compiled_path_for, save_compiled, load_compiled
+from prediction_cache import PredictionCache, quantize
+from micro_batcher import MicroBatcher
+from bisect import bisect_left
+
 app = Flask(__name__)
 
-# Global variables for models
-classifier_model = None
-score_regressor = None
-models_loaded = False
+# Model files (override to serve e.g. the *_real.pkl models from auto-training).
+# A model registered in model_registry/ under the file's name is served from
+# its CURRENT version instead of the file.
+CLASSIFIER_MODEL_FILE = os.environ.get('CLASSIFIER_MODEL_FILE', 'potability_classifier.pkl')
+SCORE_REGRESSOR_MODEL_FILE = os.environ.get('SCORE_REGRESSOR_MODEL_FILE', 'potability_score_regressor.pkl')
 
-def load_models():
-    """Load the trained ML models"""
-    global classifier_model, score_regressor, models_loaded
+# Seconds between checks for new model files (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+
+# Shared secret for /admin/reload (endpoint is disabled when unset)
+ADMIN_TOKEN = os.environ.get('ML_ADMIN_TOKEN', '')
+
+# Everything the prediction path needs from one load. load_models() builds a
+# new dict and swaps it in with a single assignment, so a request that takes
+# a snapshot never sees a half-loaded classifier/regressor pair.
+current_models = {
+    'loaded': False,
+    'classifier': None,
+    'regressor': None,
+    'classifier_columns': None,
+    'regressor_columns': None,
+    'classifier_compiled': None,
+    'regressor_compiled': None,
+    'ml_ready': False,
+    'ml_error': 'Models not loaded',
+    'signature': None,
+    'generation': 0,
+    'loaded_at': None,
+    'info': {'model_version': None, 'regressor_version': None, 'training_date': None, 'accuracy': None},
+    'sources': {}
+}
+
+# Serializes reloads (requests never take it)
+reload_lock = threading.Lock()
+
+# Rule ladder thresholds, defined once: evaluate_rules(), the decision table's
+# band edges and the who_guidelines in every response are derived from them.
+# Above its limit a reading makes the water non-potable.
+TDS_LIMIT = 500                       # mg/L
+TURBIDITY_WARNING_THRESHOLD = 5.0     # NTU
+# (threshold, score penalty): a reading above a threshold loses its penalty
+# (the highest threshold crossed applies)
+TDS_PENALTIES = ((500, 35), (600, 40), (900, 45), (1200, 50))
+TURBIDITY_PENALTIES = ((5.0, 35), (10, 45), (50, 50))
+
+# Band edges of the rule ladder: TDS and turbidity outcomes change only when
+# a reading crosses one of these (values equal to an edge fall below it)
+TDS_BAND_EDGES = tuple(sorted({TDS_LIMIT, *(edge for edge, _ in TDS_PENALTIES)}))
+TURBIDITY_BAND_EDGES = tuple(sorted({TURBIDITY_WARNING_THRESHOLD, *(edge for edge, _ in TURBIDITY_PENALTIES)}))
+
+# /predict response cache (PREDICT_CACHE_SIZE=0 disables it)
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get('PREDICT_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('PREDICT_CACHE_TTL', 60))
+)
+
+# Sensor precision used to round cache keys
+CACHE_PRECISION = {
+    'tds': float(os.environ.get('CACHE_PRECISION_TDS', 1.0)),                   # ppm
+    'turbidity': float(os.environ.get('CACHE_PRECISION_TURBIDITY', 0.1)),       # NTU
+    'temperature': float(os.environ.get('CACHE_PRECISION_TEMPERATURE', 0.5)),   # °C
+    'ph': float(os.environ.get('CACHE_PRECISION_PH', 0.1))
+}
+
+# Upper bound on readings accepted by /predict/batch in one request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+# (risk_level, recommendation, action_required) per model status, used when
+# the ML engine's status differs from the rule ladder's (unknown labels are
+# treated as 'Not Potable')
+STATUS_OUTCOMES = {
+    'Potable': ('Low', 'Water is POTABLE. No immediate action needed.', 'None'),
+    'Marginal': ('Medium', 'Water requires treatment before consumption.', 'Filtration or disinfection recommended'),
+    'Not Potable': ('High', 'Water is NOT potable. Consider treatment like filtration or chemical disinfection.',
+                    'Treatment required')
+}
+
+# Feature layout produced by build_feature_matrix(): every potability column
+# of the shared pipeline, so both the real-data models (POTABILITY_COLUMNS)
+# and the recommendation models (RECOMMENDATION_COLUMNS) can be served
+FEATURE_COLUMNS = SERVED_POTABILITY_COLUMNS
+
+# Scoring engines: 'rules' (WHO thresholds) or 'ml' (trained models)
+ENGINES = ('rules', 'ml')
+DEFAULT_ENGINE = os.environ.get('PREDICTION_ENGINE', 'rules').lower()
+
+# MODEL_MMAP=1: serve tree ensembles from uncompressed compiled artifacts
+# memory-mapped read-only, so gunicorn workers share the node arrays' pages
+MODEL_MMAP = os.environ.get('MODEL_MMAP', '0').lower() in ('1', 'true', 'yes')
+
+# MICRO_BATCH_ENABLED=1: coalesce concurrent single-reading ML predictions
+# into one model call. Only pays off when a process serves requests
+# concurrently (threads or the ASGI app); sync gunicorn workers see one at a time.
+MICRO_BATCH_ENABLED = os.environ.get('MICRO_BATCH_ENABLED', '0').lower() in ('1', 'true', 'yes')
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 32))
+
+def memory_report():
+    """Memory of this process in MB (RSS, PSS and shared pages; Linux only)
+
+    PSS splits shared pages between the processes mapping them, so summing
+    it over gunicorn workers gives their real combined footprint.
+    """
+    report = {'pid': os.getpid()}
+    fields = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    report[f'{key.lower()}_mb'] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        import resource
+        report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+def format_memory(report):
+    """One-line summary of memory_report()"""
+    if 'rss_mb' not in report:
+        return f"pid {report['pid']} max RSS {report.get('max_rss_mb')} MB"
+    shared = report.get('shared_clean_mb', 0) + report.get('shared_dirty_mb', 0)
+    return f"pid {report['pid']} RSS {report['rss_mb']} MB, PSS {report['pss_mb']} MB, shared {shared:.1f} MB"
+
+def load_model_artifact(path, model_name):
+    """Load one model file
+
+    With MODEL_MMAP on, tree ensembles are exported once to an uncompressed
+    compiled artifact next to the .pkl (refreshed when the .pkl is newer) and
+    loaded with mmap_mode='r'. The sklearn estimator is then never unpickled,
+    because sklearn copies tree nodes into private memory on load.
+    """
+    if not MODEL_MMAP:
+        return joblib.load(path)
+    
+    compiled_path = compiled_path_for(path)
+    if not os.path.exists(compiled_path) or os.path.getmtime(compiled_path) < os.path.getmtime(path):
+        model = joblib.load(path, mmap_mode='r')
+        try:
+            compiled = compile_model(model)
+        except ValueError:
+            return model  # Not a tree ensemble - nothing to flatten
+        try:
+            temp_path = f'{compiled_path}.{os.getpid()}.tmp'
+            save_compiled(compiled, temp_path)
+            os.replace(temp_path, compiled_path)
+            print(f"✅ {model_name} exported for mmap: {compiled_path}")
+        except OSError as e:
+            print(f"⚠️ Could not write {compiled_path} ({e}); serving {model_name} from memory")
+            return compiled
     
+    return load_compiled(compiled_path, mmap_mode='r')
+
+def check_model_features(model, model_name):
+    """Check that a model can be fed from build_feature_matrix()
+
+    Returns (column_indices, error). Models trained on a DataFrame carry
+    feature_names_in_, which must all be builder columns; the indices select
+    them in the order the model expects. Models without names must take the
+    POTABILITY_COLUMNS row they were trained on before names were kept.
+    """
+    names = getattr(model, 'feature_names_in_', None)
+    n_features = getattr(model, 'n_features_in_', None)
+
+    if names is not None:
+        names = [str(name) for name in names]
+        unknown = [name for name in names if name not in FEATURE_COLUMNS]
+        if unknown:
+            return None, f'{model_name} expects features the server does not build: {unknown}'
+        return [FEATURE_COLUMNS.index(name) for name in names], None
+
+    if n_features is None:
+        return None, f'{model_name} does not report its expected feature count'
+    if n_features != len(POTABILITY_COLUMNS):
+        return None, (f'{model_name} expects {n_features} unnamed features, '
+                      f'server builds {len(POTABILITY_COLUMNS)}: {POTABILITY_COLUMNS}')
+    return [FEATURE_COLUMNS.index(name) for name in POTABILITY_COLUMNS], None
+
+def compile_if_supported(model, model_name):
+    """Compile a tree ensemble, or return None to keep using sklearn"""
+    if isinstance(model, CompiledForest):
+        return model  # Already loaded as a compiled artifact
     try:
-        # Get the directory where this script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        print(f"[DEBUG] Loading models from directory: {script_dir}")
-        
-        # Load potability classifier
-        classifier_path = os.path.join(script_dir, 'potability_classifier.pkl')
-        print(f"[DEBUG] Looking for classifier at: {classifier_path}")
-        
-        if not os.path.exists(classifier_path):
-            print(f"❌ Potability Classifier not found at: {classifier_path}")
-            print(f"[DEBUG] Current working directory: {os.getcwd()}")
-            print(f"[DEBUG] Files in directory: {os.listdir(script_dir) if os.path.exists(script_dir) else 'Directory not found'}")
-            return False
-        
-        classifier_model = joblib.load(classifier_path)
-        print("✅ Potability Classifier loaded successfully")
-        
-        # Load score regressor
-        score_path = os.path.join(script_dir, 'potability_score_regressor.pkl')
-        print(f"[DEBUG] Looking for regressor at: {score_path}")
-        
-        if not os.path.exists(score_path):
-            print(f"❌ Score Regressor not found at: {score_path}")
+        compiled = compile_model(model)
+        print(f"✅ {model_name} compiled ({len(compiled.roots)} trees, {len(compiled.feature)} nodes)")
+        return compiled
+    except ValueError as e:
+        print(f"[DEBUG] {model_name} served by sklearn: {e}")
+        return None
+
+def model_paths():
+    """Absolute paths of the classifier and score regressor files"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return (os.path.join(script_dir, CLASSIFIER_MODEL_FILE),
+            os.path.join(script_dir, SCORE_REGRESSOR_MODEL_FILE))
+
+def registry_names():
+    """Registry names of the classifier and score regressor"""
+    return model_registry.model_name(CLASSIFIER_MODEL_FILE), model_registry.model_name(SCORE_REGRESSOR_MODEL_FILE)
+
+def model_signature():
+    """Current registry version, or (mtime, size) of the file, per model; None if one is missing"""
+    signature = []
+    for name, path in zip(registry_names(), model_paths()):
+        version = model_registry.current_version(name)
+        if version is None:
+            try:
+                version = (os.stat(path).st_mtime_ns, os.stat(path).st_size)
+            except OSError:
+                return None
+        signature.append(version)
+    return tuple(signature)
+
+def load_served_model(path, name, model_name):
+    """(model, source) for one served model, or (None, None) if there is none
+
+    Registered models load the CURRENT version (the mmap variant with
+    MODEL_MMAP on, else the compressed one); others load the plain file.
+    source describes where the model came from, for /status and ai_info.
+    """
+    start = time.perf_counter()
+    if model_registry.current_version(name) is not None:
+        model, manifest = model_registry.load(name, variant='mmap' if MODEL_MMAP else 'compressed')
+        source = {key: manifest[key] for key in ('name', 'version', 'created_at', 'estimator', 'features',
+                                                 'training_window', 'metrics', 'artifacts')}
+        source['registry'] = True
+    elif os.path.exists(path):
+        model = load_model_artifact(path, model_name)
+        modified = datetime.fromtimestamp(os.path.getmtime(path))
+        source = {'registry': False, 'file': path, 'version': None,
+                  'created_at': modified.isoformat(timespec='seconds'), 'size_bytes': os.path.getsize(path)}
+    else:
+        return None, None
+    source['load_seconds'] = round(time.perf_counter() - start, 4)
+    return model, source
+
+def model_info(classifier_source, regressor_source):
+    """ai_info metadata of a loaded classifier / regressor pair"""
+    accuracy = classifier_source.get('metrics', {}).get('accuracy')
+    return {
+        'model_version': classifier_source['version'] or 'unregistered',
+        'regressor_version': regressor_source['version'] or 'unregistered',
+        'training_date': classifier_source['created_at'][:10],
+        'accuracy': f'{accuracy * 100:.1f}%' if accuracy is not None else None
+    }
+
+def load_models():
+    """Load the trained ML models
+    
+    Builds a complete new model snapshot and swaps it into current_models.
+    On failure the previous snapshot keeps serving.
+    """
+    global current_models
+    
+    with reload_lock:
+        try:
+            memory_before = memory_report()
+            signature = model_signature()
+            
+            # Get the directory where this script is located
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            print(f"[DEBUG] Loading models from directory: {script_dir}")
+            classifier_path, score_path = model_paths()
+            
+            classifier_name, regressor_name = registry_names()
+            
+            # Load potability classifier
+            print(f"[DEBUG] Looking for classifier '{classifier_name}' in {model_registry.MODEL_REGISTRY_DIR}, "
+                  f"then at: {classifier_path}")
+            
+            classifier, classifier_source = load_served_model(classifier_path, classifier_name, 'Potability Classifier')
+            if classifier is None:
+                print(f"❌ Potability Classifier not found at: {classifier_path}")
+                print(f"[DEBUG] Current working directory: {os.getcwd()}")
+                print(f"[DEBUG] Files in directory: {os.listdir(script_dir) if os.path.exists(script_dir) else 'Directory not found'}")
+                return False
+            print(f"✅ Potability Classifier loaded successfully (version {classifier_source['version'] or 'unregistered'})")
+            
+            # Load score regressor
+            print(f"[DEBUG] Looking for regressor '{regressor_name}' in the registry, then at: {score_path}")
+            
+            regressor, regressor_source = load_served_model(score_path, regressor_name, 'Score Regressor')
+            if regressor is None:
+                print(f"❌ Score Regressor not found at: {score_path}")
+                return False
+            print(f"✅ Score Regressor loaded successfully (version {regressor_source['version'] or 'unregistered'})")
+            
+            # Validate feature layout before the ML engine is allowed to serve
+            classifier_columns, classifier_error = check_model_features(classifier, 'Potability Classifier')
+            regressor_columns, regressor_error = check_model_features(regressor, 'Score Regressor')
+            ml_error = classifier_error or regressor_error
+            if ml_error is None:
+                print("✅ ML engine ready (feature layout matches)")
+            else:
+                print(f"⚠️ ML engine disabled: {ml_error}")
+            
+            # Compile tree ensembles for low-latency single-row inference
+            classifier_compiled = compile_if_supported(classifier, 'Potability Classifier')
+            regressor_compiled = compile_if_supported(regressor, 'Score Regressor')
+            
+            current_models = {
+                'loaded': True,
+                'classifier': classifier,
+                'regressor': regressor,
+                'classifier_columns': classifier_columns,
+                'regressor_columns': regressor_columns,
+                'classifier_compiled': classifier_compiled,
+                'regressor_compiled': regressor_compiled,
+                'ml_ready': ml_error is None,
+                'ml_error': ml_error,
+                'signature': signature,
+                'generation': current_models['generation'] + 1,
+                'loaded_at': datetime.now().isoformat(),
+                'info': model_info(classifier_source, regressor_source),
+                'sources': {'classifier': classifier_source, 'regressor': regressor_source}
+            }
+            prediction_cache.clear()  # Cached responses came from the old models
+            print(f"✅ All AI models loaded and ready! (generation {current_models['generation']})")
+            
+            print(f"[MEMORY] Before loading models: {format_memory(memory_before)}")
+            print(f"[MEMORY] After loading models:  {format_memory(memory_report())} (mmap: {MODEL_MMAP})")
+            
+            return True
+            
+        except Exception as e:
+            import traceback
+            print(f"❌ Error loading models: {e}")
+            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
             return False
-        
-        score_regressor = joblib.load(score_path)
-        print("✅ Score Regressor loaded successfully")
-        
-        models_loaded = True
-        print("✅ All AI models loaded and ready!")
-        return True
-        
-    except Exception as e:
-        import traceback
-        print(f"❌ Error loading models: {e}")
-        print(f"[DEBUG] Traceback: {traceback.format_exc()}")
-        return False
+
+def watch_models(interval):
+    """Reload the models when their files change
+    
+    A change is only acted on once the files have stopped changing for one
+    interval, so a model that is still being written is never loaded.
+    """
+    pending = None
+    while True:
+        time.sleep(interval)
+        signature = model_signature()
+        if signature is None or signature == current_models['signature']:
+            pending = None
+            continue
+        if signature != pending:
+            pending = signature  # Wait one more interval for writes to settle
+            continue
+        print("[RELOAD] Model files changed - reloading in background...")
+        load_models()
+        pending = None
+
+model_watcher = None
+
+def start_model_watcher(interval=None):
+    """Start the background model file watcher (once per process)"""
+    global model_watcher
+    interval = MODEL_WATCH_INTERVAL if interval is None else interval
+    if interval <= 0 or (model_watcher is not None and model_watcher.is_alive()):
+        return model_watcher
+    model_watcher = threading.Thread(target=watch_models, args=(interval,), name='model-watcher', daemon=True)
+    model_watcher.start()
+    print(f"[RELOAD] Watching model files every {interval:g}s")
+    return model_watcher
 
 # Load models when module is imported (for Heroku/gunicorn)
 # This ensures models are loaded even when not running via __main__
 load_models()
 
+def build_feature_matrix(tds_values, turbidity_values, temperatures, ph_levels=None, now=None):
+    """Build the model feature matrix for N readings in one pass
+
+    Returns an (N, 12) float array with columns in FEATURE_COLUMNS order,
+    built by the same pipeline as the training features. Time features
+    come from `now` (defaults to the current time) because readings scored
+    by the server have no timestamp of their own; voltage and analog_value
+    use the pipeline's approximations.
+    """
+    return potability_matrix(tds_values, turbidity_values, temperatures,
+                             DEFAULT_PH if ph_levels is None else ph_levels,
+                             times=now or datetime.now(), columns=FEATURE_COLUMNS)
+
 def prepare_features(tds_value, turbidity_value, temperature=25, ph_level=7.0):
     """Prepare features for ML prediction"""
-    now = datetime.now()
-    # Create feature array matching training data (11 features)
-    features = np.array([[
-        tds_value,                              # tds_value
-        turbidity_value,                        # turbidity_value
-        now.hour,                              # hour
-        now.weekday(),                         # day_of_week
-        now.timetuple().tm_yday,               # day_of_year
-        temperature,                           # temperature
-        3.5,                                   # voltage (default)
-        tds_value * 2.5,                       # analog_value (approximation)
-        tds_value * 2,                         # conductivity (approximation)
-        tds_value / (turbidity_value + 0.1),  # tds_turbidity_ratio
-        (tds_value / 500) + (turbidity_value / 1.0)  # quality_index
-    ]])
-    
-    return features
-
-def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph_level=7.0):
+    # Create feature array matching training data
+    return build_feature_matrix([tds_value], [turbidity_value], temperature, ph_level)
+
+def resolve_engine(engine=None):
+    """Pick the scoring engine for a request
+
+    Raises ValueError for unknown names and RuntimeError when the ML engine
+    is requested but the loaded models failed validation.
+    """
+    engine = (engine or DEFAULT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine "{engine}". Use one of: {", ".join(ENGINES)}')
+    if engine == 'ml' and not current_models['ml_ready']:
+        raise RuntimeError(f'ML engine unavailable: {current_models["ml_error"]}')
+    return engine
+
+def model_input(model, features, columns):
+    """Select a model's columns, named if it was fitted on a DataFrame"""
+    selected = features[:, columns]
+    if getattr(model, 'feature_names_in_', None) is not None:
+        return pd.DataFrame(selected, columns=[FEATURE_COLUMNS[i] for i in columns])
+    return selected
+
+def predict_with_models(features, models=None):
+    """Run the classifier and score regressor once over a feature matrix
+
+    Returns (statuses, confidences, scores) arrays, one entry per row.
+    Confidence is the classifier probability of the predicted class.
+    Compiled tree ensembles are used when available; they give the same
+    outputs as sklearn without its per-call overhead.
+    """
+    models = models or current_models
+    if not models['ml_ready']:
+        raise RuntimeError(f'ML engine unavailable: {models["ml_error"]}')
+
+    classifier = models['classifier']
+    classifier_columns = models['classifier_columns']
+    if models['classifier_compiled'] is not None:
+        probabilities = models['classifier_compiled'].predict_proba(features[:, classifier_columns])
+    else:
+        probabilities = classifier.predict_proba(model_input(classifier, features, classifier_columns))
+    best = np.argmax(probabilities, axis=1)
+    statuses = classifier.classes_[best]
+    confidences = probabilities[np.arange(len(best)), best]
+
+    regressor = models['regressor']
+    regressor_columns = models['regressor_columns']
+    if models['regressor_compiled'] is not None:
+        scores = models['regressor_compiled'].predict(features[:, regressor_columns])
+    else:
+        scores = regressor.predict(model_input(regressor, features, regressor_columns))
+    scores = np.clip(scores, 0.0, 100.0)
+
+    return statuses, confidences, scores
+
+def predict_rows(items):
+    """Micro-batch callback: items are (feature_row, models) pairs
+
+    Rows are stacked and scored once per model snapshot, so a batch that
+    straddles a reload still scores every row with the models it asked for.
+    """
+    results = [None] * len(items)
+    groups = {}
+    for index, (_, models) in enumerate(items):
+        groups.setdefault(id(models), []).append(index)
+    for indexes in groups.values():
+        models = items[indexes[0]][1]
+        features = np.vstack([items[i][0] for i in indexes])
+        statuses, confidences, scores = predict_with_models(features, models)
+        for position, i in enumerate(indexes):
+            results[i] = (statuses[position], confidences[position], scores[position])
+    return results
+
+micro_batcher = MicroBatcher(predict_rows, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS) if MICRO_BATCH_ENABLED else None
+
+def model_predictions(features, models=None):
+    """predict_with_models(), with single rows going through the micro-batcher when enabled"""
+    models = models or current_models
+    if micro_batcher is not None and len(features) == 1:
+        status, confidence, score = micro_batcher.predict((features[0], models))
+        return [status], [confidence], [score]
+    return predict_with_models(features, models)
+
+def apply_model_predictions(results, features, models=None):
+    """Replace rule-based status, score and confidence with model output
+
+    Risk, recommendation and action follow the final status: where the model
+    disagrees with the rule ladder, the ladder's advice (which describes its
+    own status) is replaced by the model status' STATUS_OUTCOMES entry.
+    """
+    statuses, confidences, scores = model_predictions(features, models)
+    for i, result in enumerate(results):
+        status = str(statuses[i])
+        if status != result['potability_status']:
+            risk_level, recommendation, action_required = STATUS_OUTCOMES.get(status, STATUS_OUTCOMES['Not Potable'])
+            result.update(risk_level=risk_level, recommendation=recommendation, action_required=action_required)
+        result['potability_status'] = status
+        result['potability_score'] = float(scores[i])
+        result['confidence'] = float(confidences[i])
+        result['ai_info']['prediction_method'] = 'ML Models'
+    return results
+
+def evaluate_rules(tds_value, turbidity_value):
+    """Run the rule ladder for one reading
+    
+    Returns the outcome fragment (status, score, risk, recommendation,
+    action and WHO compliance). Used to build the decision table; requests
+    look the fragment up instead of re-running the ladder.
+    """
+    # YOUR CUSTOM RULE-BASED LOGIC (Based on your requirements)
+    # 
+    # TDS Interpretation:
+    #   - 0-TDS_LIMIT: ✅ Potable
+    #   - > TDS_LIMIT: 🔴 NOT potable
+    #
+    # Turbidity Interpretation:
+    #   - 0.1-TURBIDITY_WARNING_THRESHOLD: ⚪ No warning (just show value)
+    #   - > TURBIDITY_WARNING_THRESHOLD: ⚠️ Warning (makes water non-potable)
+    #
+    # Combined Logic:
+    #   A. High TDS + Low Turbidity: Show only TDS warning
+    #   B. High TDS + High Turbidity: Show both warnings
+    #   C. Low TDS + High Turbidity: Show both warnings (turbidity makes it non-potable)
+    
+    # Calculate compliance
+    tds_compliant = tds_value <= TDS_LIMIT
+    turbidity_safe = turbidity_value <= TURBIDITY_WARNING_THRESHOLD
+    
+    # Determine potability status
+    # Water is NOT potable if: TDS or Turbidity is above its limit
+    if tds_compliant and turbidity_safe:
+        potability_status = 'Potable'
+    else:
+        potability_status = 'Not Potable'
+    
+    # Calculate score based on your requirements (0-100 scale):
+    # the highest TDS and turbidity penalty bands crossed are subtracted
+    potability_score = 100.0
+    for penalties, value in ((TDS_PENALTIES, tds_value), (TURBIDITY_PENALTIES, turbidity_value)):
+        crossed = [penalty for threshold, penalty in penalties if value > threshold]
+        if crossed:
+            potability_score -= crossed[-1]
+    
+    # Ensure score is between 0 and 100
+    potability_score = max(0.0, min(100.0, potability_score))
+    
+    # Build recommendations based on YOUR EXACT LOGIC
+    issues = []
+    actions = []
+    risk_level = 'Low'
+    
+    # Logic A & B: TDS > TDS_LIMIT = NOT potable
+    # Always show this message if TDS > TDS_LIMIT
+    if not tds_compliant:
+        issues.append('Water is NOT potable. Consider treatment like filtration or chemical disinfection.')
+        actions.append('TDS treatment required')
+        risk_level = 'High'
+    
+    # Logic C: Turbidity > TURBIDITY_WARNING_THRESHOLD = Warning (makes water non-potable)
+    # Note: Turbidity below it shows NO warning, only the value
+    if not turbidity_safe:
+        issues.append('High Turbidity: May contain pathogens, use sediment filters.')
+        actions.append('Sediment filtration required')
+        risk_level = 'High'
+    
+    # Determine final recommendation based on your logic
+    if not issues:
+        # Case: TDS and Turbidity both within their limits
+        # Both are safe - Water is POTABLE
+        risk_level = 'Low'
+        recommendation = 'Water is POTABLE. No immediate action needed.'
+        action_required = 'None'
+    else:
+        # Cases A, B, or C: At least one issue found
+        # Combine all issues - Water is NOT potable
+        recommendation = ' '.join(issues)
+        action_required = ', '.join(actions)
+    
+    return {
+        'potability_status': potability_status,
+        'potability_score': float(potability_score),
+        'risk_level': risk_level,
+        'recommendation': recommendation,
+        'action_required': action_required,
+        'who_compliance': {
+            'tds_compliant': tds_compliant,
+            'turbidity_compliant': turbidity_safe,
+            'overall_compliant': tds_compliant and turbidity_safe
+        }
+    }
+
+def build_decision_table():
+    """Precompute the rule outcome for every (TDS band, turbidity band) pair
+    
+    Rule outcomes only change at TDS_BAND_EDGES / TURBIDITY_BAND_EDGES, so
+    evaluating the ladder once per band (at the band's upper edge, which
+    belongs to it) covers the whole input domain.
+    """
+    def representatives(edges):
+        return list(edges) + [edges[-1] + 1]
+    
+    table = []
+    for i, tds_value in enumerate(representatives(TDS_BAND_EDGES)):
+        row = []
+        for j, turbidity_value in enumerate(representatives(TURBIDITY_BAND_EDGES)):
+            assert bisect_left(TDS_BAND_EDGES, tds_value) == i
+            assert bisect_left(TURBIDITY_BAND_EDGES, turbidity_value) == j
+            row.append(evaluate_rules(tds_value, turbidity_value))
+        table.append(row)
+    return table
+
+decision_table = build_decision_table()
+
+def lookup_rules(tds_value, turbidity_value):
+    """Rule outcome fragment for one reading via two band lookups"""
+    return decision_table[bisect_left(TDS_BAND_EDGES, tds_value)][bisect_left(TURBIDITY_BAND_EDGES, turbidity_value)]
+
+def build_result(fragment, tds_value, turbidity_value, temperature, ph_level, models):
+    """Full response dict from a rule fragment, the request's readings and a model snapshot"""
+    result = dict(fragment)
+    result['who_compliance'] = dict(fragment['who_compliance'])
+    result.update({
+        'status': 'success',
+        'confidence': 0.85,  # Model confidence
+        'parameters': {
+            'tds_value': tds_value,
+            'turbidity_value': turbidity_value,
+            'temperature': temperature,
+            'ph_level': ph_level
+        },
+        'who_guidelines': {
+            'tds_limit': TDS_LIMIT,
+            'turbidity_warning_threshold': TURBIDITY_WARNING_THRESHOLD
+        },
+        'ai_info': {
+            **models['info'],
+            'ml_models_loaded': models['loaded'],
+            'prediction_method': 'Rule-based (WHO Guidelines)'
+        }
+    })
+    return result
+
+def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph_level=7.0, engine='rules'):
     """Get potability recommendation using trained models
     
-    If models are not loaded, falls back to rule-based classification using WHO guidelines.
+    The default 'rules' engine classifies with WHO guideline thresholds,
+    looked up in the precomputed decision table.
+    With engine='ml' the status, score and confidence come from the trained
+    models and the risk and recommendation follow that status; WHO
+    compliance still reports the thresholds.
     """
     
-    # If models are not loaded, use rule-based classification (WHO guidelines)
-    # This ensures the API still works even if models fail to load
-    use_ml_models = models_loaded and classifier_model is not None and score_regressor is not None
+    # Rule-based classification (WHO guidelines) works even if models fail to load
+    models = current_models  # One snapshot for the whole request
     
     try:
-        # YOUR CUSTOM RULE-BASED LOGIC (Based on your requirements)
-        # 
-        # TDS Interpretation:
-        #   - 0-500: ✅ Potable
-        #   - > 500: 🔴 NOT potable
-        #
-        # Turbidity Interpretation:
-        #   - 0.1-5: ⚪ No warning (just show value)
-        #   - > 5: ⚠️ Warning (makes water non-potable)
-        #
-        # Combined Logic:
-        #   A. High TDS + Low Turbidity: Show only TDS warning
-        #   B. High TDS + High Turbidity: Show both warnings
-        #   C. Low TDS + High Turbidity: Show both warnings (turbidity makes it non-potable)
-        
-        tds_limit = 500
-        turbidity_warning_threshold = 5.0
-        
-        # Calculate compliance
-        tds_compliant = tds_value <= tds_limit
-        turbidity_safe = turbidity_value <= turbidity_warning_threshold
-        
-        # Determine potability status
-        # Water is NOT potable if: TDS > 500 OR Turbidity > 5
-        if tds_compliant and turbidity_safe:
-            potability_status = 'Potable'
-        else:
-            potability_status = 'Not Potable'
+        result = build_result(lookup_rules(tds_value, turbidity_value),
+                              tds_value, turbidity_value, temperature, ph_level, models)
         
-        # Calculate score based on your requirements (0-100 scale)
-        potability_score = 100.0
+        if engine == 'ml':
+            features = build_feature_matrix([tds_value], [turbidity_value], temperature, ph_level)
+            apply_model_predictions([result], features, models)
         
-        # TDS scoring
-        if tds_value > 1200:
-            potability_score -= 50  # Very high TDS (severe)
-        elif tds_value > 900:
-            potability_score -= 45  # High TDS
-        elif tds_value > 600:
-            potability_score -= 40  # Moderately high
-        elif tds_value > 500:
-            potability_score -= 35  # Violation (ensures score < 70%)
-        
-        # Turbidity scoring (only affects score if > 5)
-        if turbidity_value > 50:
-            potability_score -= 50  # Very high turbidity (severe)
-        elif turbidity_value > 10:
-            potability_score -= 45  # High turbidity
-        elif turbidity_value > 5.0:
-            potability_score -= 35  # Warning threshold violation
-        
-        # Ensure score is between 0 and 100
-        potability_score = max(0.0, min(100.0, potability_score))
-        
-        # Build recommendations based on YOUR EXACT LOGIC
-        issues = []
-        actions = []
-        risk_level = 'Low'
-        
-        # Logic A & B: TDS > 500 = NOT potable
-        # Always show this message if TDS > 500
-        if tds_value > 500:
-            issues.append('Water is NOT potable. Consider treatment like filtration or chemical disinfection.')
-            actions.append('TDS treatment required')
-            risk_level = 'High'
-        
-        # Logic C: Turbidity > 5 = Warning (makes water non-potable)
-        # Note: Turbidity 0.1-5 shows NO warning, only the value
-        # Turbidity > 5 shows warning and makes water non-potable
-        if turbidity_value > 5.0:
-            issues.append('High Turbidity: May contain pathogens, use sediment filters.')
-            actions.append('Sediment filtration required')
-            risk_level = 'High'
-        
-        # Determine final recommendation based on your logic
-        if not issues:
-            # Case: TDS 0-500 AND Turbidity 0.1-5
-            # Both are safe - Water is POTABLE
-            risk_level = 'Low'
-            recommendation = 'Water is POTABLE. No immediate action needed.'
-            action_required = 'None'
-        else:
-            # Cases A, B, or C: At least one issue found
-            # Combine all issues - Water is NOT potable
-            recommendation = ' '.join(issues)
-            action_required = ', '.join(actions)
-        
-        # Calculate confidence
-        confidence = 0.85  # Model confidence
-        
-        return {
-            'status': 'success',
-            'potability_status': potability_status,
-            'potability_score': float(potability_score),
-            'confidence': confidence,
-            'risk_level': risk_level,
-            'recommendation': recommendation,
-            'action_required': action_required,
-            'who_compliance': {
-                'tds_compliant': tds_compliant,
-                'turbidity_compliant': turbidity_safe,
-                'overall_compliant': tds_compliant and turbidity_safe
-            },
-            'parameters': {
-                'tds_value': tds_value,
-                'turbidity_value': turbidity_value,
-                'temperature': temperature,
-                'ph_level': ph_level
-            },
-            'who_guidelines': {
-                'tds_limit': tds_limit,
-                'turbidity_warning_threshold': turbidity_warning_threshold
-            },
-            'ai_info': {
-                'model_version': '1.0',
-                'training_date': '2024-10-21',
-                'accuracy': '99.5%',
-                'ml_models_loaded': use_ml_models,
-                'prediction_method': 'ML Models' if use_ml_models else 'Rule-based (WHO Guidelines)'
-            }
-        }
+        return result
         
     except Exception as e:
         return {
@@ -227,20 +679,266 @@ def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph
             'message': f'AI prediction failed: {str(e)}'
         }
 
-@app.route('/')
-def home():
-    """Home endpoint with server info"""
-    return jsonify({
+def cached_recommendation(tds_value, turbidity_value, temperature=25, ph_level=7.0, engine='rules'):
+    """get_potability_recommendation() behind the response cache
+    
+    Readings are rounded to CACHE_PRECISION for the key. The key also holds
+    the TDS/turbidity band so rounding can never cross a rule threshold, and
+    the model generation so a reload never serves stale results.
+    """
+    key = (
+        engine,
+        current_models['generation'],
+        quantize(tds_value, CACHE_PRECISION['tds']),
+        quantize(turbidity_value, CACHE_PRECISION['turbidity']),
+        quantize(temperature, CACHE_PRECISION['temperature']),
+        quantize(ph_level, CACHE_PRECISION['ph']),
+        bisect_left(TDS_BAND_EDGES, tds_value),
+        bisect_left(TURBIDITY_BAND_EDGES, turbidity_value)
+    )
+    
+    cached = prediction_cache.get(key)
+    if cached is None:
+        result = get_potability_recommendation(tds_value, turbidity_value, temperature, ph_level, engine)
+        if result.get('status') == 'success':
+            prediction_cache.put(key, result)
+        return result
+    
+    # Echo this request's exact readings, not the ones that filled the entry
+    result = dict(cached)
+    result['parameters'] = {
+        'tds_value': tds_value,
+        'turbidity_value': turbidity_value,
+        'temperature': temperature,
+        'ph_level': ph_level
+    }
+    return result
+
+def get_potability_recommendations_batch(tds_values, turbidity_values, temperatures, ph_levels, engine='rules'):
+    """Get potability recommendations for many readings at once
+
+    Finds every reading's decision-table cell with two searchsorted calls
+    over the whole batch and returns one result dict per reading, in input
+    order. With engine='ml' the models run once over the whole feature matrix.
+    """
+    models = current_models  # One snapshot for the whole batch
+
+    tds = np.asarray(tds_values, dtype=float)
+    turbidity = np.asarray(turbidity_values, dtype=float)
+    temperature = np.asarray(temperatures, dtype=float)
+    ph = np.asarray(ph_levels, dtype=float)
+
+    tds_bands = np.searchsorted(TDS_BAND_EDGES, tds, side='left')
+    turbidity_bands = np.searchsorted(TURBIDITY_BAND_EDGES, turbidity, side='left')
+
+    results = [
+        build_result(decision_table[i][j], t, u, c, p, models)
+        for i, j, t, u, c, p in zip(tds_bands.tolist(), turbidity_bands.tolist(), tds.tolist(),
+                                    turbidity.tolist(), temperature.tolist(), ph.tolist())
+    ]
+
+    if engine == 'ml':
+        apply_model_predictions(results, build_feature_matrix(tds, turbidity, temperature, ph), models)
+
+    return results
+
+def parse_batch_readings(data):
+    """Turn a /predict/batch JSON body into four equal-length float arrays
+
+    Accepts either a list of reading objects (top-level or under "readings")
+    or columnar arrays: {"tds": [...], "turbidity": [...], ...}.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    def pick(source, short_name, long_name, default):
+        value = source.get(short_name)
+        if value is None:
+            value = source.get(long_name, default)
+        return default if value is None else value
+
+    if isinstance(data, dict) and 'readings' in data:
+        data = data['readings']
+
+    if isinstance(data, list):
+        rows = []
+        for index, reading in enumerate(data):
+            if not isinstance(reading, dict):
+                raise ValueError(f'Reading {index} must be an object')
+            rows.append((
+                pick(reading, 'tds', 'tds_value', 350),
+                pick(reading, 'turbidity', 'turbidity_value', 0.8),
+                pick(reading, 'temperature', 'temperature', 25),
+                pick(reading, 'ph', 'ph_level', 7.0)
+            ))
+        columns = np.array(rows, dtype=float).reshape(-1, 4).T
+        return columns[0], columns[1], columns[2], columns[3]
+
+    if isinstance(data, dict):
+        tds = np.atleast_1d(np.asarray(pick(data, 'tds', 'tds_value', []), dtype=float))
+        n = len(tds)
+
+        def column(short_name, long_name, default):
+            values = pick(data, short_name, long_name, None)
+            if values is None:
+                return np.full(n, default, dtype=float)
+            values = np.atleast_1d(np.asarray(values, dtype=float))
+            if len(values) != n:
+                raise ValueError(f'"{short_name}" must have the same length as "tds" ({n})')
+            return values
+
+        return (tds, column('turbidity', 'turbidity_value', 0.8),
+                column('temperature', 'temperature', 25), column('ph', 'ph_level', 7.0))
+
+    raise ValueError('Request body must be a list of readings or an object of arrays')
+
+def read_prediction_params(source):
+    """(tds, turbidity, temperature, ph) from query args or a JSON object
+    
+    Supports both short and full parameter names (tds/tds_value,
+    turbidity/turbidity_value, ph/ph_level) for backward compatibility.
+    Raises ValueError for values that are not numbers.
+    """
+    tds_value = float(source.get('tds') or source.get('tds_value', 350))
+    turbidity_value = float(source.get('turbidity') or source.get('turbidity_value', 0.8))
+    temperature = float(source.get('temperature', 25))
+    ph_level = float(source.get('ph') or source.get('ph_level', 7.0))
+    return tds_value, turbidity_value, temperature, ph_level
+
+def validate_prediction_params(tds_value, turbidity_value, temperature, ph_level):
+    """Error message for an out-of-range reading, or None"""
+    if tds_value < 0 or tds_value > 10000:
+        return 'TDS value must be between 0 and 10000'
+    if turbidity_value < 0 or turbidity_value > 100:
+        return 'Turbidity value must be between 0 and 100'
+    if temperature < -10 or temperature > 50:
+        return 'Temperature must be between -10 and 50'
+    if ph_level < 0 or ph_level > 14:
+        return 'pH level must be between 0 and 14'
+    return None
+
+def validate_batch_params(tds, turbidity, temperature, ph):
+    """Error message naming the first bad reading of a batch, or None"""
+    if len(tds) == 0:
+        return 'No readings provided'
+    if len(tds) > MAX_BATCH_SIZE:
+        return f'Too many readings: {len(tds)} (maximum is {MAX_BATCH_SIZE})'
+    
+    # Same ranges as /predict
+    checks = [
+        (tds, 0, 10000, 'TDS value must be between 0 and 10000'),
+        (turbidity, 0, 100, 'Turbidity value must be between 0 and 100'),
+        (temperature, -10, 50, 'Temperature must be between -10 and 50'),
+        (ph, 0, 14, 'pH level must be between 0 and 14')
+    ]
+    for values, low, high, message in checks:
+        invalid = ~((values >= low) & (values <= high))
+        if invalid.any():
+            return f'Reading {int(np.argmax(invalid))}: {message}'
+    return None
+
+def home_payload():
+    """Body of the / endpoint"""
+    return {
         'message': 'Water Potability AI Server',
         'status': 'running',
-        'models_loaded': models_loaded,
+        'models_loaded': current_models['loaded'],
         'note': 'API works with or without ML models (uses rule-based fallback based on WHO guidelines)',
         'endpoints': {
             '/predict': 'GET/POST - Get potability recommendation',
+            '/predict/batch': 'POST - Get recommendations for many readings in one call',
             '/status': 'GET - Server status',
             '/health': 'GET - Health check'
         }
-    })
+    }
+
+def status_payload():
+    """Body of the /status endpoint"""
+    return {
+        'status': 'running',
+        'models_loaded': current_models['loaded'],
+        'engine': {
+            'default': DEFAULT_ENGINE,
+            'ml_ready': current_models['ml_ready'],
+            'ml_error': current_models['ml_error'],
+            'feature_columns': FEATURE_COLUMNS
+        },
+        'models': {
+            'generation': current_models['generation'],
+            'loaded_at': current_models['loaded_at'],
+            'watch_interval_seconds': MODEL_WATCH_INTERVAL,
+            'info': current_models['info'],
+            'sources': current_models['sources']
+        },
+        'cache': prediction_cache.stats(),
+        'micro_batch': micro_batcher.stats() if micro_batcher is not None else {'enabled': False},
+        'memory': memory_report(),
+        'model_mmap': MODEL_MMAP,
+        'timestamp': datetime.now().isoformat(),
+        'python_version': sys.version,
+        'working_directory': os.getcwd()
+    }
+
+def health_payload():
+    """Body of the /health endpoint"""
+    return {
+        'status': 'healthy',
+        'models_loaded': current_models['loaded'],
+        'timestamp': datetime.now().isoformat()
+    }
+
+def admin_reload_payload(token):
+    """(status code, body) of /admin/reload for an X-Admin-Token header value
+
+    Checks the token against ML_ADMIN_TOKEN, then reloads the models
+    (blocking until they are loaded or have failed to load).
+    """
+    if not ADMIN_TOKEN:
+        return 403, {
+            'status': 'error',
+            'message': 'Admin endpoints are disabled (set ML_ADMIN_TOKEN to enable)'
+        }
+    
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return 401, {
+            'status': 'error',
+            'message': 'Invalid admin token'
+        }
+    
+    previous_generation = current_models['generation']
+    if not load_models():
+        return 500, {
+            'status': 'error',
+            'message': 'Model reload failed - still serving the previous models',
+            'generation': current_models['generation']
+        }
+    
+    return 200, {
+        'status': 'success',
+        'message': 'Models reloaded',
+        'previous_generation': previous_generation,
+        'generation': current_models['generation'],
+        'loaded_at': current_models['loaded_at'],
+        'ml_ready': current_models['ml_ready']
+    }
+
+def requested_engine(data=None):
+    """Resolve the engine asked for via ?engine= or an "engine" key in the JSON body
+
+    Returns (engine, None) or (None, error_response).
+    """
+    engine = request.args.get('engine')
+    if not engine and isinstance(data, dict):
+        engine = data.get('engine')
+    try:
+        return resolve_engine(engine), None
+    except ValueError as e:
+        return None, (jsonify({'status': 'error', 'message': str(e)}), 400)
+    except RuntimeError as e:
+        return None, (jsonify({'status': 'error', 'message': str(e)}), 503)
+
+@app.route('/')
+def home():
+    """Home endpoint with server info"""
+    return jsonify(home_payload())
 
 @app.route('/predict', methods=['GET', 'POST'])
 def predict():
@@ -250,53 +948,33 @@ def predict():
     - GET: Query parameters (?tds=350&turbidity=0.8&temperature=25&ph=7.0)
     - POST: JSON body with keys: tds, turbidity, temperature, ph
            (also accepts: tds_value, turbidity_value, ph_level for backward compatibility)
+    Optional engine=ml (query or body) scores with the trained models.
     """
     
     try:
+        data = None
         if request.method == 'GET':
             # Get parameters from URL query string
-            # Support both short and full parameter names
-            tds_value = float(request.args.get('tds') or request.args.get('tds_value', 350))
-            turbidity_value = float(request.args.get('turbidity') or request.args.get('turbidity_value', 0.8))
-            temperature = float(request.args.get('temperature', 25))
-            ph_level = float(request.args.get('ph') or request.args.get('ph_level', 7.0))
-            
+            tds_value, turbidity_value, temperature, ph_level = read_prediction_params(request.args)
         else:  # POST
             # Get parameters from JSON body
-            # Support both naming conventions for backward compatibility
             data = request.get_json() or {}
-            tds_value = float(data.get('tds') or data.get('tds_value', 350))
-            turbidity_value = float(data.get('turbidity') or data.get('turbidity_value', 0.8))
-            temperature = float(data.get('temperature', 25))
-            ph_level = float(data.get('ph') or data.get('ph_level', 7.0))
+            tds_value, turbidity_value, temperature, ph_level = read_prediction_params(data)
         
         # Validate parameter ranges (optional but recommended)
-        if tds_value < 0 or tds_value > 10000:
+        error = validate_prediction_params(tds_value, turbidity_value, temperature, ph_level)
+        if error:
             return jsonify({
                 'status': 'error',
-                'message': 'TDS value must be between 0 and 10000'
+                'message': error
             }), 400
         
-        if turbidity_value < 0 or turbidity_value > 100:
-            return jsonify({
-                'status': 'error',
-                'message': 'Turbidity value must be between 0 and 100'
-            }), 400
-        
-        if temperature < -10 or temperature > 50:
-            return jsonify({
-                'status': 'error',
-                'message': 'Temperature must be between -10 and 50'
-            }), 400
-        
-        if ph_level < 0 or ph_level > 14:
-            return jsonify({
-                'status': 'error',
-                'message': 'pH level must be between 0 and 14'
-            }), 400
+        engine, error_response = requested_engine(data)
+        if error_response:
+            return error_response
         
         # Get AI recommendation
-        result = get_potability_recommendation(tds_value, turbidity_value, temperature, ph_level)
+        result = cached_recommendation(tds_value, turbidity_value, temperature, ph_level, engine)
         
         return jsonify(result)
         
@@ -311,25 +989,77 @@ def predict():
             'message': f'Prediction failed: {str(e)}'
         }), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Batch prediction endpoint
+
+    Accepts a JSON body with many readings and scores them in one call:
+    - {"readings": [{"tds": 350, "turbidity": 0.8}, ...]} (or a bare list)
+    - {"tds": [350, 620], "turbidity": [0.8, 7.5], "temperature": [...], "ph": [...]}
+    Results are returned in input order.
+    """
+
+    try:
+        data = request.get_json(silent=True)
+        if data is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Request body must be JSON'
+            }), 400
+
+        engine, error_response = requested_engine(data)
+        if error_response:
+            return error_response
+
+        tds, turbidity, temperature, ph = parse_batch_readings(data)
+
+        error = validate_batch_params(tds, turbidity, temperature, ph)
+        if error:
+            return jsonify({
+                'status': 'error',
+                'message': error
+            }), 400
+
+        results = get_potability_recommendations_batch(tds, turbidity, temperature, ph, engine)
+
+        return jsonify({
+            'status': 'success',
+            'count': len(results),
+            'results': results
+        })
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Invalid batch format: {str(e)}. All values must be numbers.'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Batch prediction failed: {str(e)}'
+        }), 500
+
 @app.route('/status')
 def status():
     """Server status endpoint"""
-    return jsonify({
-        'status': 'running',
-        'models_loaded': models_loaded,
-        'timestamp': datetime.now().isoformat(),
-        'python_version': sys.version,
-        'working_directory': os.getcwd()
-    })
+    return jsonify(status_payload())
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'models_loaded': models_loaded,
-        'timestamp': datetime.now().isoformat()
-    })
+    return jsonify(health_payload())
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload the models without restarting the server
+    
+    Requires the X-Admin-Token header to match ML_ADMIN_TOKEN. The new models
+    are loaded while the current ones keep serving, then swapped in at once.
+    Under gunicorn this reloads the worker that took the request; the other
+    workers pick up the new files through their model watcher.
+    """
+    status, payload = admin_reload_payload(request.headers.get('X-Admin-Token', ''))
+    return jsonify(payload), status
 
 @app.route('/test')
 def test():
@@ -341,8 +1071,9 @@ if __name__ == '__main__':
     print("=" * 50)
     
     # Load models on startup
-    if load_models():
+    if current_models['loaded'] or load_models():
         print("[SUCCESS] Models loaded from disk")
+        start_model_watcher()
         
         # Get port from environment variable (Heroku sets this) or default to 5000
         port = int(os.environ.get('PORT', 5000))
@@ -353,6 +1084,7 @@ if __name__ == '__main__':
         print(f"   GET  http://localhost:{port}/status")
         print(f"   GET  http://localhost:{port}/predict?tds=350&turbidity=0.8")
         print(f"   POST http://localhost:{port}/predict")
+        print(f"   POST http://localhost:{port}/predict/batch")
         print(f"   GET  http://localhost:{port}/health")
         print(f"   GET  http://localhost:{port}/test")
         print("\n[INFO] Server running... Press Ctrl+C to stop")
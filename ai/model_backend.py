@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Boosting Backend Selection
+Builds the gradient boosting regressors used for the potability score and
+turbidity forecast models. MODEL_BACKEND picks the implementation:
+
+    gb    GradientBoostingRegressor: exact splits, single-threaded (default)
+    hist  HistGradientBoostingRegressor: binned features, multithreaded,
+          handles missing values natively (no fillna needed)
+
+Compare the two on the same data with:
+    python model_backend.py benchmark [rows ...]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import mean_absolute_error, r2_score
+
+BACKENDS = ('gb', 'hist')
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'gb').lower()
+
+def boosting_regressor(backend=None):
+    """Untrained boosting regressor for a backend (default MODEL_BACKEND)
+
+    Both use 200 rounds of depth-8 trees at learning rate 0.05. The hist
+    model has no leaf-count limit, so its trees are shaped like the exact
+    ones, and no early stopping, so it always runs all 200 rounds.
+    """
+    backend = backend or MODEL_BACKEND
+    if backend == 'gb':
+        return GradientBoostingRegressor(
+            n_estimators=200,
+            learning_rate=0.05,
+            max_depth=8,
+            min_samples_split=5,
+            min_samples_leaf=2,
+            random_state=42
+        )
+    if backend == 'hist':
+        return HistGradientBoostingRegressor(
+            max_iter=200,
+            learning_rate=0.05,
+            max_depth=8,
+            max_leaf_nodes=None,
+            min_samples_leaf=2,
+            early_stopping=False,
+            random_state=42
+        )
+    raise ValueError(f"Unknown MODEL_BACKEND '{backend}' (choose from {', '.join(BACKENDS)})")
+
+def handles_missing_values(backend=None):
+    """Whether the backend's regressors accept NaN features"""
+    return (backend or MODEL_BACKEND) == 'hist'
+
+def is_boosting_regressor(model):
+    """Whether a model is one of the backends' boosting regressors"""
+    return isinstance(model, (GradientBoostingRegressor, HistGradientBoostingRegressor))
+
+def boosting_stages(model):
+    """Number of fitted boosting rounds"""
+    if isinstance(model, HistGradientBoostingRegressor):
+        return int(model.n_iter_)
+    return int(model.n_estimators_)
+
+def add_boosting_stages(model, stages):
+    """Set a fitted booster up to add `stages` rounds on its next fit (warm start)"""
+    if isinstance(model, HistGradientBoostingRegressor):
+        model.set_params(warm_start=True, max_iter=boosting_stages(model) + stages)
+    else:
+        model.set_params(warm_start=True, n_estimators=boosting_stages(model) + stages)
+
+def feature_importances(model, X, y):
+    """Importance of each feature column of X
+
+    The impurity importances where the model has them; HistGradientBoosting
+    has none, so its permutation importances on (X, y) are used instead.
+    """
+    if hasattr(model, 'feature_importances_'):
+        return model.feature_importances_
+    return permutation_importance(model, X, y, n_repeats=5, random_state=42).importances_mean
+
+def benchmark_frame(n_rows, seed=42):
+    """Potability training features and scores from synthetic sensor readings"""
+    from train_with_real_db_data import create_potability_labels, prepare_features, synthetic_sensor_frames
+    tds_data, turbidity_data = synthetic_sensor_frames(n_rows, seed=seed)
+    data = create_potability_labels(tds_data, turbidity_data)
+    # Missing temperatures, as sensors without a probe report them
+    data.loc[data.sample(frac=0.1, random_state=seed).index, 'temperature'] = np.nan
+    feature_cols = prepare_features(data, fill_missing=False)
+    return data[feature_cols], data['potability_score']
+
+def benchmark(sizes=(5000, 20000, 100000)):
+    """Fit time, predict latency and MAE / R2 of each backend on the same data"""
+    import contextlib
+    import io
+    from sklearn.model_selection import train_test_split
+    from train_with_real_db_data import fill_missing_values
+
+    print(f"{'rows':>8} {'backend':>7} {'fit s':>8} {'batch ms':>9} {'row ms':>7} {'MAE':>6} {'R2':>6}")
+    for n_rows in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            X, y = benchmark_frame(n_rows)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        for backend in BACKENDS:
+            train, test = X_train, X_test
+            if not handles_missing_values(backend):
+                # What the gb path does in train_potability_score_regressor_with_real_data
+                train, test = fill_missing_values(train).fillna(0), fill_missing_values(test).fillna(0)
+            model = boosting_regressor(backend)
+            start = time.perf_counter()
+            model.fit(train, y_train)
+            fit_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            y_pred = model.predict(test)
+            batch_ms = (time.perf_counter() - start) * 1000
+
+            row = test.iloc[:1]
+            start = time.perf_counter()
+            for _ in range(100):
+                model.predict(row)
+            row_ms = (time.perf_counter() - start) * 10
+
+            print(f"{n_rows:>8,} {backend:>7} {fit_seconds:>8.2f} {batch_ms:>9.1f} {row_ms:>7.2f} "
+                  f"{mean_absolute_error(y_test, y_pred):>6.2f} {r2_score(y_test, y_pred):>6.3f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark([int(n) for n in sys.argv[2:]] or (5000, 20000, 100000))
+    else:
+        print(__doc__.strip())
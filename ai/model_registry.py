@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Model Registry
+Versioned store for trained models. Each training run registers its model
+under the model's name (its file name without .pkl) as a new version:
+
+    model_registry/
+        potability_classifier/
+            CURRENT                 the version being served
+            20241021-143000/
+                manifest.json       features, training window, metrics and
+                                    sha256 / size / load time per artifact
+                model.pkl.z         compressed estimator (small to ship)
+                model_mmap.pkl      uncompressed, memory-mappable arrays
+
+The mmap variant holds the tree compiler's node arrays for tree ensembles,
+and an uncompressed pickle for any other model. ml_server.py serves the
+CURRENT version of its models, falling back to the plain .pkl files for
+models that were never registered. Training scripts still write the plain
+.pkl files as well, for the tools that read them directly.
+
+Usage:
+    python model_registry.py list [name ...]
+    python model_registry.py register <file.pkl> [name]
+    python model_registry.py promote <name> <version>
+    python model_registry.py prune <name> [keep]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+import joblib
+import pandas as pd
+
+from tree_compiler import compile_model, load_compiled, save_compiled
+
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_registry'))
+
+# Versions kept per model when a new one is registered (the current one is always kept)
+REGISTRY_KEEP_VERSIONS = int(os.environ.get('REGISTRY_KEEP_VERSIONS', 5))
+
+# zlib level of the compressed variant (1 = fastest, 9 = smallest)
+REGISTRY_COMPRESS_LEVEL = int(os.environ.get('REGISTRY_COMPRESS_LEVEL', 3))
+
+VARIANTS = ('compressed', 'mmap')
+ARTIFACT_FILES = {'compressed': 'model.pkl.z', 'mmap': 'model_mmap.pkl'}
+
+def model_name(model_file):
+    """Registry name of a model file: potability_classifier_real.pkl -> potability_classifier_real"""
+    return os.path.splitext(os.path.basename(model_file))[0]
+
+def model_dir(name):
+    """Directory holding every version of a model"""
+    return os.path.join(MODEL_REGISTRY_DIR, name)
+
+def sha256_file(path):
+    """Hex sha256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def training_window(times):
+    """{'start', 'end', 'rows'} of the readings a model was trained on"""
+    times = pd.to_datetime(pd.Series(times)).dropna()
+    if times.empty:
+        return None
+    return {'start': times.min().isoformat(), 'end': times.max().isoformat(), 'rows': int(len(times))}
+
+def model_features(model):
+    """Feature names a fitted model was trained on, if it recorded them"""
+    names = getattr(model, 'feature_names_in_', None)
+    return [str(name) for name in names] if names is not None else None
+
+def write_artifact(model, directory, variant, compiled=None):
+    """Write one variant of a model; returns its manifest entry
+
+    compiled: a ready CompiledForest to store as the mmap variant (e.g. the
+    reduced-precision one from compact_models.py) instead of compiling model.
+    """
+    path = os.path.join(directory, ARTIFACT_FILES[variant])
+    if variant == 'compressed':
+        joblib.dump(model, path, compress=('zlib', REGISTRY_COMPRESS_LEVEL))
+        artifact_format = 'joblib'
+    else:
+        try:
+            save_compiled(compiled or compile_model(model), path)
+            artifact_format = 'compiled'
+        except ValueError:  # Not a tree ensemble - numpy arrays in a plain pickle map as well
+            joblib.dump(model, path)
+            artifact_format = 'joblib'
+
+    start = time.perf_counter()
+    read_artifact(path, variant, artifact_format)
+    return {
+        'file': ARTIFACT_FILES[variant],
+        'format': artifact_format,
+        'sha256': sha256_file(path),
+        'size_bytes': os.path.getsize(path),
+        'load_seconds': round(time.perf_counter() - start, 4)
+    }
+
+def read_artifact(path, variant, artifact_format):
+    """Load an artifact file (mmap variants are mapped read-only)"""
+    mmap_mode = 'r' if variant == 'mmap' else None
+    if artifact_format == 'compiled':
+        return load_compiled(path, mmap_mode=mmap_mode)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+def new_version(name):
+    """Timestamp version id, unique within the model"""
+    version = datetime.now().strftime('%Y%m%d-%H%M%S')
+    candidate, suffix = version, 1
+    while os.path.exists(os.path.join(model_dir(name), candidate)):
+        suffix += 1
+        candidate = f'{version}-{suffix}'
+    return candidate
+
+def register(model, name, features=None, window=None, metrics=None, source=None, make_current=True,
+             compiled=None, compaction=None):
+    """Store a fitted model as a new version and return its manifest
+
+    The version directory is written under a temporary name and renamed
+    into place, and CURRENT is replaced atomically, so a reader never sees
+    a partial version.
+    """
+    version = new_version(name)
+    os.makedirs(model_dir(name), exist_ok=True)
+    staging = os.path.join(model_dir(name), f'.{version}.{os.getpid()}.tmp')
+    os.makedirs(staging)
+    try:
+        manifest = {
+            'name': name,
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'estimator': type(model).__name__,
+            'features': features or model_features(model),
+            'training_window': window,
+            'metrics': metrics or {},
+            'source': source,
+            'compaction': compaction,
+            'artifacts': {variant: write_artifact(model, staging, variant, compiled) for variant in VARIANTS}
+        }
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, os.path.join(model_dir(name), version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if make_current:
+        set_current(name, version)
+    prune(name, REGISTRY_KEEP_VERSIONS)
+    return manifest
+
+def save_model(model, model_file, window=None, metrics=None, compiled=None, compaction=None):
+    """Write a trained model's plain .pkl and register it as the current version"""
+    joblib.dump(model, model_file)
+    manifest = register(model, model_name(model_file), window=window, metrics=metrics,
+                        source=os.path.basename(model_file), compiled=compiled, compaction=compaction)
+    compressed = manifest['artifacts']['compressed']['size_bytes']
+    print(f"   - Registered: {manifest['name']} version {manifest['version']} "
+          f"({compressed / 1024:.0f} KB compressed)")
+    return manifest
+
+def set_current(name, version):
+    """Point CURRENT at a version (used to promote or roll back)"""
+    if not os.path.exists(os.path.join(model_dir(name), version, 'manifest.json')):
+        raise ValueError(f"{name} has no version {version}")
+    pointer = os.path.join(model_dir(name), 'CURRENT')
+    temp_path = f'{pointer}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(version + '\n')
+    os.replace(temp_path, pointer)
+
+def current_version(name):
+    """The version CURRENT points at, or None if the model is not registered"""
+    try:
+        with open(os.path.join(model_dir(name), 'CURRENT')) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def versions(name):
+    """Registered versions of a model, oldest first"""
+    try:
+        entries = os.listdir(model_dir(name))
+    except OSError:
+        return []
+    return sorted(entry for entry in entries
+                  if os.path.exists(os.path.join(model_dir(name), entry, 'manifest.json')))
+
+def read_manifest(name, version=None):
+    """Manifest of a version (default the current one), or None"""
+    version = version or current_version(name)
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(model_dir(name), version, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load(name, version=None, variant='compressed', verify=True):
+    """(model, manifest) for a version (default the current one)
+
+    verify checks the artifact's sha256 against the manifest first and
+    raises ValueError on a mismatch. The mmap variant of a tree ensemble
+    loads as a CompiledForest.
+    """
+    manifest = read_manifest(name, version)
+    if manifest is None:
+        raise ValueError(f"{name} has no registered version {version or 'CURRENT'}")
+    artifact = manifest['artifacts'][variant]
+    path = os.path.join(model_dir(name), manifest['version'], artifact['file'])
+    if verify and sha256_file(path) != artifact['sha256']:
+        raise ValueError(f"{path} does not match its manifest sha256")
+    return read_artifact(path, variant, artifact['format']), manifest
+
+def prune(name, keep):
+    """Delete all but the newest `keep` versions, never the current one"""
+    current = current_version(name)
+    old = versions(name)[:-keep] if keep > 0 else []
+    for version in old:
+        if version != current:
+            shutil.rmtree(os.path.join(model_dir(name), version), ignore_errors=True)
+
+def print_versions(name):
+    """One line per version of a model"""
+    current = current_version(name)
+    for version in versions(name):
+        manifest = read_manifest(name, version)
+        sizes = ', '.join(f"{variant} {artifact['size_bytes'] / 1024:.0f} KB"
+                          for variant, artifact in manifest['artifacts'].items())
+        metrics = ', '.join(f"{key} {value}" for key, value in manifest['metrics'].items())
+        marker = '*' if version == current else ' '
+        print(f" {marker} {name} {version}  {manifest['estimator']}  {sizes}  {metrics}")
+
+def main():
+    """Command line entry point"""
+    args = sys.argv[1:]
+    command = args[0] if args else 'list'
+    if command == 'list':
+        names = args[1:] or (sorted(os.listdir(MODEL_REGISTRY_DIR)) if os.path.isdir(MODEL_REGISTRY_DIR) else [])
+        for name in names:
+            print_versions(name)
+    elif command == 'register' and len(args) >= 2:
+        name = args[2] if len(args) > 2 else model_name(args[1])
+        manifest = register(joblib.load(args[1]), name, source=os.path.basename(args[1]))
+        print(json.dumps(manifest, indent=2))
+    elif command == 'promote' and len(args) == 3:
+        set_current(args[1], args[2])
+        print(f"{args[1]} CURRENT -> {args[2]}")
+    elif command == 'prune' and len(args) >= 2:
+        prune(args[1], int(args[2]) if len(args) > 2 else REGISTRY_KEEP_VERSIONS)
+        print_versions(args[1])
+    else:
+        print(__doc__.strip())
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
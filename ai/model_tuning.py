@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter Tuning
+Searches each real-data model's hyperparameters with successive halving
+(HalvingRandomSearchCV): many candidates are scored on a small share of the
+rows, and only the best third go on to three times as many. Candidates are
+fitted in parallel across the cores.
+
+The folds follow how each model is trained:
+    tds_model, turbidity_model    TimeSeriesSplit (train on the past, score the future)
+    potability_classifier         StratifiedKFold
+    potability_score_regressor    KFold
+
+Feature matrices, fold splits and finished searches are memoized on disk
+(TUNING_CACHE_DIR), so repeating a search over unchanged readings reuses
+them. The best configuration is written next to each model file
+(tds_model_real.pkl -> tds_model_real.params.json), where the training
+scripts' build_* functions pick it up.
+
+Usage:
+    python train_orchestrator.py tune [model ...] [--workers N]
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+import numpy as np
+from joblib import Memory
+from sklearn.base import clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables the import below)
+from sklearn.model_selection import (HalvingRandomSearchCV, KFold, StratifiedKFold, TimeSeriesSplit,
+                                     cross_val_score)
+
+from model_backend import handles_missing_values, is_boosting_regressor
+
+TUNING_CACHE_DIR = os.environ.get('TUNING_CACHE_DIR',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuning_cache'))
+TUNING_FOLDS = int(os.environ.get('TUNING_FOLDS', 5))
+TUNING_CANDIDATES = int(os.environ.get('TUNING_CANDIDATES', 24))
+
+# Searched values per estimator type. Forest tree counts are left to the
+# incremental trainer (INCREMENT_TREES / MAX_FOREST_TREES).
+SEARCH_SPACES = {
+    'RandomForestClassifier': {
+        'max_depth': [8, 15, 25, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': ['sqrt', 0.5, 1.0]
+    },
+    'RandomForestRegressor': {
+        'max_depth': [8, 15, 25, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': ['sqrt', 0.5, 1.0]
+    },
+    'GradientBoostingRegressor': {
+        'n_estimators': [100, 200, 300],
+        'learning_rate': [0.02, 0.05, 0.1],
+        'max_depth': [3, 5, 8],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'subsample': [0.8, 1.0]
+    },
+    'HistGradientBoostingRegressor': {
+        'max_iter': [100, 200, 300],
+        'learning_rate': [0.02, 0.05, 0.1],
+        'max_depth': [3, 5, 8, None],
+        'min_samples_leaf': [2, 10, 20],
+        'l2_regularization': [0.0, 0.1, 1.0]
+    }
+}
+
+def tuning_targets():
+    """{model: (build function, split kind, model file)} for every tunable model"""
+    import train_with_real_data as forecast_training
+    import train_with_real_db_data as potability_training
+    return {
+        'potability_classifier': (potability_training.build_potability_classifier, 'stratified',
+                                  potability_training.CLASSIFIER_FILE),
+        'potability_score_regressor': (potability_training.build_potability_score_regressor, 'random',
+                                       potability_training.REGRESSOR_FILE),
+        'tds_model': (forecast_training.build_tds_model, 'chronological', forecast_training.TDS_MODEL_FILE),
+        'turbidity_model': (forecast_training.build_turbidity_model, 'chronological',
+                            forecast_training.TURBIDITY_MODEL_FILE)
+    }
+
+def params_file(model_file):
+    """Tuned-parameter file kept next to a model file"""
+    return os.path.splitext(model_file)[0] + '.params.json'
+
+def load_tuned_params(model_file):
+    """The tuning record for a model file, or None if it was never tuned"""
+    try:
+        with open(params_file(model_file)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def apply_tuned_params(model, model_file):
+    """Set a model's tuned parameters, if any were recorded for its estimator type"""
+    record = load_tuned_params(model_file)
+    if record and record.get('estimator') == type(model).__name__:
+        model.set_params(**record['params'])
+    return model
+
+def build_feature_sets(tds_data, turbidity_data):
+    """{model: (X, y)} built from the raw sensor frames, as the orchestrator builds them"""
+    import train_with_real_data as forecast_training
+    import train_with_real_db_data as potability_training
+    from train_orchestrator import MIN_FORECAST_ROWS, forecast_window
+
+    sets = {}
+    labeled = potability_training.create_potability_labels(tds_data, turbidity_data)
+    if labeled is not None:
+        feature_cols = potability_training.prepare_features(labeled, fill_missing=False)
+        sets['potability_classifier'] = (labeled[feature_cols], labeled['potability_status'])
+        sets['potability_score_regressor'] = (labeled[feature_cols], labeled['potability_score'])
+
+    for name, frame, value_col in (('tds_model', tds_data, 'tds_value'),
+                                   ('turbidity_model', turbidity_data, 'ntu_value')):
+        X, y, _ = forecast_training.prepare_features(forecast_window(frame, value_col), value_col)
+        if len(X) >= MIN_FORECAST_ROWS:
+            sets[name] = (X, y)
+    return sets
+
+def cross_validator(split, y, n_splits=None):
+    """The fold generator for a split kind (None if y is too small to fold)"""
+    n_splits = n_splits or TUNING_FOLDS
+    if split == 'stratified':
+        n_splits = min(n_splits, int(y.value_counts().min()))
+    if n_splits < 2 or len(y) < 2 * n_splits:
+        return None
+    if split == 'chronological':
+        return TimeSeriesSplit(n_splits=n_splits)
+    if split == 'stratified':
+        return StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    return KFold(n_splits=n_splits, shuffle=True, random_state=42)
+
+def fold_indices(y, split, n_splits=None):
+    """[(train rows, test rows), ...] for a target, or None if it is too small to fold"""
+    cv = cross_validator(split, y, n_splits)
+    if cv is None:
+        return None
+    return [(train, test) for train, test in cv.split(np.zeros((len(y), 1)), y)]
+
+def search(estimator, space, X, y, folds, scoring, workers=-1):
+    """Successive-halving search; returns the best parameters and how the rounds went
+
+    The final round fits every surviving candidate on all rows of each fold.
+    """
+    start = time.perf_counter()
+    halving = HalvingRandomSearchCV(
+        estimator, space,
+        n_candidates=TUNING_CANDIDATES,
+        factor=3,
+        min_resources='exhaust',
+        cv=folds,
+        scoring=scoring,
+        refit=False,
+        random_state=42,
+        n_jobs=workers
+    )
+    halving.fit(X, y)
+    return {
+        'best_params': halving.best_params_,
+        'candidates': [int(n) for n in halving.n_candidates_],
+        'rows_per_round': [int(n) for n in halving.n_resources_],
+        'search_seconds': round(time.perf_counter() - start, 2)
+    }
+
+def cv_score(estimator, X, y, folds, scoring, workers=-1):
+    """Mean score of one configuration over the full folds"""
+    return float(cross_val_score(estimator, X, y, cv=folds, scoring=scoring, n_jobs=workers).mean())
+
+def json_value(value):
+    """numpy scalars as plain Python values for the params file"""
+    return value.item() if isinstance(value, np.generic) else value
+
+def tune_model(name, X, y, memory, workers=-1):
+    """Search one model's parameters and write its params file; returns the record"""
+    build, split, model_file = tuning_targets()[name]
+    estimator = build()
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=1)  # The search already uses every core
+    space = SEARCH_SPACES[type(estimator).__name__]
+    scoring = 'accuracy' if split == 'stratified' else 'neg_mean_absolute_error'
+
+    if not (is_boosting_regressor(estimator) and handles_missing_values()):
+        import train_with_real_db_data as potability_training
+        X = potability_training.fill_missing_values(X.copy()).fillna(0)
+
+    folds = memory.cache(fold_indices)(y, split)
+    if folds is None:
+        print(f"Skipping {name} - only {len(y)} rows, too few to cross-validate")
+        return None
+
+    # Every searched parameter is overridden by the candidates, so the search
+    # is keyed on the estimator with those reset: tuning again after the
+    # params file changed still finds the earlier search in the cache.
+    base = clone(estimator).set_params(**{key: values[0] for key, values in space.items()})
+    cached_search = memory.cache(search, ignore=['workers'])
+    cached = cached_search.check_call_in_cache(base, space, X, y, folds, scoring)
+    summary = cached_search(base, space, X, y, folds, scoring, workers=workers)
+
+    # Keep the configuration in use unless the search found a better one
+    cached_score = memory.cache(cv_score, ignore=['workers'])
+    current_params = {key: estimator.get_params()[key] for key in space}
+    current_score = cached_score(estimator, X, y, folds, scoring, workers=workers)
+    best_score = cached_score(clone(estimator).set_params(**summary['best_params']), X, y, folds, scoring,
+                              workers=workers)
+    improved = best_score > current_score
+    params = summary['best_params'] if improved else current_params
+    record = {
+        'model': name,
+        'file': model_file,
+        'estimator': type(estimator).__name__,
+        'params': {key: json_value(value) for key, value in params.items()},
+        'scoring': scoring,
+        'cv': f"{type(cross_validator(split, y)).__name__}(n_splits={len(folds)})",
+        'cv_score': round(max(best_score, current_score), 4),
+        'previous_cv_score': round(current_score, 4),
+        'improved': bool(improved),
+        'samples': len(X),
+        'candidates': summary['candidates'],
+        'rows_per_round': summary['rows_per_round'],
+        'search_seconds': summary['search_seconds'],
+        'tuned_at': datetime.now().isoformat(timespec='seconds')
+    }
+    with open(params_file(model_file), 'w') as f:
+        json.dump(record, f, indent=2)
+
+    timing = 'cached search' if cached else f"search {summary['search_seconds']:.1f}s"
+    print(f"SUCCESS: {name} -> {params_file(model_file)} "
+          f"({scoring} {record['previous_cv_score']} -> {record['cv_score']}, {timing})")
+    return record
+
+def tune_models(names=None, workers=None, sensor_data=None):
+    """Tune the named models (default all) from one read of the sensor tables
+
+    Returns the list of records, or None when no data could be read.
+    """
+    from train_orchestrator import load_sensor_data
+
+    print("HYPERPARAMETER TUNING")
+    print("=" * 50)
+    print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    tds_data, turbidity_data = sensor_data or load_sensor_data()
+    if tds_data is None or turbidity_data is None:
+        print("ERROR: No real data available. Please ensure your database has sensor readings.")
+        return None
+
+    memory = Memory(TUNING_CACHE_DIR, verbose=0)
+    sets = memory.cache(build_feature_sets)(tds_data, turbidity_data)
+
+    records = []
+    for name in names or list(tuning_targets()):
+        if name not in sets:
+            print(f"Skipping {name} - not enough readings to build its features")
+            continue
+        X, y = sets[name]
+        record = tune_model(name, X, y, memory, workers=workers or -1)
+        if record:
+            records.append(record)
+
+    print(f"\nTUNING COMPLETE: {len(records)} models")
+    print(f"Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    return records
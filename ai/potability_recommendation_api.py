@@ -1,4 +1,9 @@
 
+import joblib
+import pandas as pd
+
+from features import RECOMMENDATION_COLUMNS, potability_matrix
+
 def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph_level=7.0):
     """
     Get potability recommendation based on water quality parameters
@@ -23,15 +28,10 @@ def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph
             'message': 'Models not found. Please train models first.'
         }
     
-    # Prepare input features
-    features = np.array([[
-        tds_value, turbidity_value, 
-        datetime.now().hour, datetime.now().weekday(),
-        temperature, ph_level,
-        tds_value * 2,  # conductivity approximation
-        tds_value / (turbidity_value + 0.1),  # ratio
-        (tds_value / 500) + (turbidity_value / 1.0)  # quality index
-    ]])
+    # Prepare input features (same pipeline as training)
+    features = pd.DataFrame(potability_matrix([tds_value], [turbidity_value], temperature, ph_level,
+                                              columns=RECOMMENDATION_COLUMNS),
+                            columns=RECOMMENDATION_COLUMNS)
     
     # Get prediction
     potability_status = classifier.predict(features)[0]
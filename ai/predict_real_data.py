@@ -2,183 +2,68 @@
 """
 Real-time Prediction with Actual Sensor Data
 Uses your trained models to predict water quality from real sensor readings
+
+Thin client of forecast_server.py, which keeps the models loaded and its
+database connections pooled: the arguments are forwarded to the server and
+its JSON is printed unchanged. Only the standard library is imported on that
+path. When no server answers, the forecast runs in this process instead
+(loading the models and connecting to the database for this one call). A
+server that took the request but answers too late gets an error, not a
+second forecast in this process.
+
+Usage: python predict_real_data.py <current_tds> <current_turbidity> <horizon_hours>
 """
 
 import sys
+import os
 import json
-import numpy as np
-import pandas as pd
-import joblib
-from datetime import datetime, timedelta
-import mysql.connector
+from contextlib import redirect_stdout
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
 
-def connect_to_database():
-    """Connect to your MySQL database"""
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='u520834156_DBBagoWaters25'
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        return None
+# Forecasting server to ask first (empty = always forecast in-process)
+FORECAST_SERVER_URL = os.environ.get('FORECAST_SERVER_URL', 'http://127.0.0.1:5001')
 
-def get_recent_readings(hours=12):
-    """Get recent sensor readings for feature engineering"""
-    conn = connect_to_database()
-    if not conn:
-        return None, None
-    
-    try:
-        # Get recent TDS readings
-        tds_query = f"""
-        SELECT tds_value, analog_value, voltage, reading_time 
-        FROM tds_readings 
-        WHERE tds_value > 0 
-        AND reading_time >= DATE_SUB(NOW(), INTERVAL {hours} HOUR)
-        ORDER BY reading_time DESC
-        LIMIT 20
-        """
-        
-        tds_df = pd.read_sql(tds_query, conn)
-        
-        # Get recent turbidity readings
-        turbidity_query = f"""
-        SELECT ntu_value, analog_value, voltage, reading_time 
-        FROM turbidity_readings 
-        WHERE ntu_value > 0 
-        AND reading_time >= DATE_SUB(NOW(), INTERVAL {hours} HOUR)
-        ORDER BY reading_time DESC
-        LIMIT 20
-        """
-        
-        turbidity_df = pd.read_sql(turbidity_query, conn)
-        
-        conn.close()
-        return tds_df, turbidity_df
-        
-    except Exception as e:
-        print(f"Error fetching recent readings: {e}")
-        conn.close()
-        return None, None
+# Seconds to wait for the server's answer. A forecast is at most
+# FORECAST_MAX_STEPS (168) model calls per sensor, well under a second, plus
+# a poll for new readings when the server has no feeder thread; 30 s leaves
+# room for a slow database without waiting on a server that is stuck.
+FORECAST_SERVER_TIMEOUT = float(os.environ.get('FORECAST_SERVER_TIMEOUT', 30))
 
-def prepare_features_for_prediction(current_tds, current_turbidity, tds_history, turbidity_history):
-    """Prepare features for prediction using current and historical data"""
-    
-    # Create time features
-    now = datetime.now()
-    hour = now.hour
-    day_of_week = now.weekday()
-    day_of_year = now.timetuple().tm_yday
-    
-    # Get lagged features from history
-    if len(tds_history) >= 12:
-        lag_1_tds = tds_history.iloc[0]['tds_value'] if len(tds_history) > 0 else current_tds
-        lag_3_tds = tds_history.iloc[2]['tds_value'] if len(tds_history) > 2 else current_tds
-        lag_6_tds = tds_history.iloc[5]['tds_value'] if len(tds_history) > 5 else current_tds
-        lag_12_tds = tds_history.iloc[11]['tds_value'] if len(tds_history) > 11 else current_tds
-    else:
-        lag_1_tds = current_tds
-        lag_3_tds = current_tds
-        lag_6_tds = current_tds
-        lag_12_tds = current_tds
-    
-    if len(turbidity_history) >= 12:
-        lag_1_turbidity = turbidity_history.iloc[0]['ntu_value'] if len(turbidity_history) > 0 else current_turbidity
-        lag_3_turbidity = turbidity_history.iloc[2]['ntu_value'] if len(turbidity_history) > 2 else current_turbidity
-        lag_6_turbidity = turbidity_history.iloc[5]['ntu_value'] if len(turbidity_history) > 5 else current_turbidity
-        lag_12_turbidity = turbidity_history.iloc[11]['ntu_value'] if len(turbidity_history) > 11 else current_turbidity
-    else:
-        lag_1_turbidity = current_turbidity
-        lag_3_turbidity = current_turbidity
-        lag_6_turbidity = current_turbidity
-        lag_12_turbidity = current_turbidity
-    
-    # Calculate rolling statistics
-    if len(tds_history) >= 6:
-        rolling_mean_3_tds = tds_history.head(3)['tds_value'].mean()
-        rolling_mean_6_tds = tds_history.head(6)['tds_value'].mean()
-        rolling_std_6_tds = tds_history.head(6)['tds_value'].std()
-    else:
-        rolling_mean_3_tds = current_tds
-        rolling_mean_6_tds = current_tds
-        rolling_std_6_tds = 0
-    
-    if len(turbidity_history) >= 6:
-        rolling_mean_3_turbidity = turbidity_history.head(3)['ntu_value'].mean()
-        rolling_mean_6_turbidity = turbidity_history.head(6)['ntu_value'].mean()
-        rolling_std_6_turbidity = turbidity_history.head(6)['ntu_value'].std()
-    else:
-        rolling_mean_3_turbidity = current_turbidity
-        rolling_mean_6_turbidity = current_turbidity
-        rolling_std_6_turbidity = 0
-    
-    # Get sensor features
-    analog_value = tds_history.iloc[0]['analog_value'] if len(tds_history) > 0 else current_tds * 2.5
-    voltage = tds_history.iloc[0]['voltage'] if len(tds_history) > 0 else current_tds / 100
-    
-    # TDS features
-    tds_features = [
-        hour, day_of_week, day_of_year,
-        lag_1_tds, lag_3_tds, lag_6_tds, lag_12_tds,
-        rolling_mean_3_tds, rolling_mean_6_tds, rolling_std_6_tds,
-        analog_value, voltage
-    ]
-    
-    # Turbidity features
-    turbidity_features = [
-        hour, day_of_week, day_of_year,
-        lag_1_turbidity, lag_3_turbidity, lag_6_turbidity, lag_12_turbidity,
-        rolling_mean_3_turbidity, rolling_mean_6_turbidity, rolling_std_6_turbidity,
-        analog_value, voltage
-    ]
-    
-    return np.array(tds_features).reshape(1, -1), np.array(turbidity_features).reshape(1, -1)
+def forecast_from_server(current_tds, current_turbidity, horizon_hours):
+    """The server's forecast JSON, or None when no server answers
 
-def predict_with_ml_models(current_tds, current_turbidity, horizon_hours):
-    """Use trained ML models for prediction"""
-    
-    # Load models
-    try:
-        tds_model = joblib.load('tds_model_real.pkl')
-        turbidity_model = joblib.load('turbidity_model_real.pkl')
-    except:
+    A server that accepted the request but did not answer in time is still
+    working on it, so that is reported as an error instead of None.
+    """
+    if not FORECAST_SERVER_URL:
         return None
-    
-    # Get recent readings for feature engineering
-    tds_history, turbidity_history = get_recent_readings(12)
-    
-    if tds_history is None or turbidity_history is None:
-        return None
-    
-    # Prepare features
-    tds_features, turbidity_features = prepare_features_for_prediction(
-        current_tds, current_turbidity, tds_history, turbidity_history
-    )
-    
+    query = urlencode({'tds': current_tds, 'turbidity': current_turbidity, 'horizon_hours': horizon_hours})
     try:
-        # Make predictions
-        tds_prediction = tds_model.predict(tds_features)[0]
-        turbidity_prediction = turbidity_model.predict(turbidity_features)[0]
-        
-        # Ensure realistic bounds
-        tds_prediction = max(50, min(1500, tds_prediction))
-        turbidity_prediction = max(0.1, min(100, turbidity_prediction))
-        
+        with urlopen(f"{FORECAST_SERVER_URL.rstrip('/')}/forecast?{query}", timeout=FORECAST_SERVER_TIMEOUT) as response:
+            return json.load(response)
+    except HTTPError as e:
+        try:
+            return json.load(e)  # The server's own error JSON
+        except ValueError:
+            return None
+    except TimeoutError:
         return {
-            'tds_prediction': float(tds_prediction),
-            'turbidity_prediction': float(turbidity_prediction),
-            'confidence': 0.85,
-            'method': 'ml_models'
+            'status': 'error',
+            'message': f'Forecasting server did not answer within {FORECAST_SERVER_TIMEOUT:g}s'
         }
-        
-    except Exception as e:
-        print(f"Prediction error: {e}")
+    except (URLError, OSError, ValueError):
         return None
 
+def forecast_in_process(current_tds, current_turbidity, horizon_hours):
+    """Forecast without a server; its log lines go to stderr so stdout stays JSON"""
+    os.environ.setdefault('FORECAST_DB_POOL_SIZE', '1')  # One forecast needs one connection
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with redirect_stdout(sys.stderr):
+        from forecast_server import forecast
+        return forecast(current_tds, current_turbidity, horizon_hours)
+
 def main():
     """Main prediction function"""
     if len(sys.argv) != 4:
@@ -187,42 +72,16 @@ def main():
             'message': 'Usage: python predict_real_data.py <current_tds> <current_turbidity> <horizon_hours>'
         }))
         return
-    
+
     try:
         current_tds = float(sys.argv[1])
         current_turbidity = float(sys.argv[2])
         horizon_hours = int(sys.argv[3])
-        
-        # Try ML model prediction first
-        prediction = predict_with_ml_models(current_tds, current_turbidity, horizon_hours)
-        
-        if prediction:
-            result = {
-                'status': 'success',
-                'timestamp': datetime.now().isoformat(),
-                'tds_prediction': prediction['tds_prediction'],
-                'turbidity_prediction': prediction['turbidity_prediction'],
-                'confidence': prediction['confidence'],
-                'method': prediction['method'],
-                'horizon_hours': horizon_hours
-            }
-        else:
-            # Fallback to simple trend prediction
-            tds_trend = 1 + (np.random.normal(0, 0.02))  # ±2% change
-            turbidity_trend = 1 + (np.random.normal(0, 0.03))  # ±3% change
-            
-            result = {
-                'status': 'success',
-                'timestamp': datetime.now().isoformat(),
-                'tds_prediction': current_tds * tds_trend,
-                'turbidity_prediction': current_turbidity * turbidity_trend,
-                'confidence': 0.70,
-                'method': 'trend_analysis',
-                'horizon_hours': horizon_hours
-            }
-        
+
+        result = (forecast_from_server(current_tds, current_turbidity, horizon_hours)
+                  or forecast_in_process(current_tds, current_turbidity, horizon_hours))
         print(json.dumps(result))
-        
+
     except Exception as e:
         print(json.dumps({
             'status': 'error',
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Prediction Response Cache
+Bounded LRU cache with a TTL for /predict results, keyed on sensor inputs
+rounded to the sensors' precision
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class PredictionCache:
+    """Thread-safe LRU + TTL cache with hit/miss/eviction counters
+
+    maxsize <= 0 disables the cache (every lookup is a miss, nothing stored).
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (models or thresholds changed)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Counters for /status"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.maxsize > 0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+def quantize(value, precision):
+    """Round a reading to the sensor precision (as an int multiple of it)"""
+    return int(round(value / precision)) if precision > 0 else value
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Chunked Sensor Data Extraction
+Pages through tds_readings / turbidity_readings with keyset pagination on
+(reading_time, id) and yields typed pandas chunks, so training can read the
+full history in bounded memory instead of one big pd.read_sql.
+
+Works with any DB-API connection: mysql.connector in production, sqlite3
+as a local stand-in.
+"""
+
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from db import has_column, placeholder, sql_value, timed
+
+# Rows fetched per query
+CHUNK_SIZE = int(os.environ.get('SENSOR_CHUNK_SIZE', 50000))
+
+# Column dtypes per table. Readings are float32 (sensor precision is far
+# below float32's ~7 digits); ADC counts are int32 with NULL stored as 0,
+# the value the PHP receivers already write for a missing ADC reading.
+TABLE_COLUMNS = {
+    'tds_readings': {
+        'id': np.int64,
+        'tds_value': np.float32,
+        'analog_value': np.int32,
+        'voltage': np.float32,
+        'temperature': np.float32,
+        'reading_time': 'datetime64[ns]'
+    },
+    'turbidity_readings': {
+        'id': np.int64,
+        'ntu_value': np.float32,
+        'analog_value': np.float32,
+        'voltage': np.float32,
+        'raw_adc': np.int32,
+        'reading_time': 'datetime64[ns]'
+    }
+}
+
+# Columns only some installations have; fetched only when asked for
+OPTIONAL_COLUMNS = {
+    'device_id': object
+}
+
+def to_frame(rows, columns, dtypes):
+    """Typed DataFrame from fetched rows"""
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        dtype = dtypes[column]
+        if dtype is object:
+            frame[column] = frame[column].astype(object)
+        elif dtype == 'datetime64[ns]':
+            frame[column] = pd.to_datetime(frame[column]).astype(dtype)
+        elif np.issubdtype(dtype, np.integer):
+            frame[column] = pd.to_numeric(frame[column]).fillna(0).astype(dtype)
+        else:
+            frame[column] = pd.to_numeric(frame[column]).astype(dtype)
+    return frame
+
+def iter_chunks(conn, table, columns=None, where=None, since=None, until=None,
+                descending=False, limit=None, chunk_size=None, after_id=None):
+    """Yield typed DataFrame chunks of a sensor table in reading_time order
+
+    columns:    columns to fetch (default: all known columns of the table;
+                reading_time and id are always fetched for the keyset)
+    where:      extra SQL condition without parameters, e.g. 'tds_value > 0'
+    since:      only readings at or after this datetime
+    until:      only readings before this datetime
+    descending: newest first (for "most recent N" queries)
+    limit:      stop after this many rows in total
+    after_id:   only rows with id > after_id, paged in id order instead
+                (insertion order, for incremental syncs)
+
+    Each query resumes after the last (reading_time, id) seen, so pages stay
+    cheap however deep into the table they are, and rows inserted while
+    paging never shift the page boundaries.
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f'Unknown sensor table: {table}')
+    dtypes = dict(TABLE_COLUMNS[table], **OPTIONAL_COLUMNS)
+    columns = list(columns or TABLE_COLUMNS[table])
+    unknown = [column for column in columns if column not in dtypes]
+    if unknown:
+        raise ValueError(f'Unknown columns for {table}: {", ".join(unknown)}')
+    for key in ('reading_time', 'id'):
+        if key not in columns:
+            columns.append(key)
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    mark = placeholder(conn)
+    order = 'DESC' if descending else 'ASC'
+    after = '<' if descending else '>'
+
+    fixed_conditions, fixed_params = [], []
+    if where:
+        fixed_conditions.append(f'({where})')
+    if since is not None:
+        fixed_conditions.append(f'reading_time >= {mark}')
+        fixed_params.append(since)
+    if until is not None:
+        fixed_conditions.append(f'reading_time < {mark}')
+        fixed_params.append(until)
+
+    time_index = columns.index('reading_time')
+    id_index = columns.index('id')
+    last_key = None
+    remaining = limit
+    if after_id is not None:
+        order_clause = f'id {order}'
+        last_key = (None, after_id)
+    else:
+        order_clause = f'reading_time {order}, id {order}'
+
+    label = f'{table} {"sync" if after_id is not None else "range"} page'
+    cursor = conn.cursor()
+    try:
+        while remaining is None or remaining > 0:
+            conditions, params = list(fixed_conditions), list(fixed_params)
+            if after_id is not None:
+                conditions.append(f'id {after} {mark}')
+                params.append(last_key[1])
+            elif last_key is not None:
+                conditions.append(f'(reading_time {after} {mark} OR (reading_time = {mark} AND id {after} {mark}))')
+                params += [last_key[0], last_key[0], last_key[1]]
+
+            page_size = chunk_size if remaining is None else min(chunk_size, remaining)
+            query = (f'SELECT {", ".join(columns)} FROM {table}'
+                     f'{" WHERE " + " AND ".join(conditions) if conditions else ""}'
+                     f' ORDER BY {order_clause} LIMIT {int(page_size)}')
+            with timed(label):
+                cursor.execute(query, [sql_value(conn, value) for value in params])
+                rows = cursor.fetchall()
+            if not rows:
+                break
+
+            # Keyset from the raw row so the next query compares like with like
+            last_key = (rows[-1][time_index], rows[-1][id_index])
+            if remaining is not None:
+                remaining -= len(rows)
+
+            yield to_frame(rows, columns, dtypes)
+
+            if len(rows) < page_size:
+                break
+    finally:
+        cursor.close()
+
+def read_table(conn, table, **kwargs):
+    """Concatenate iter_chunks() into one typed DataFrame (same arguments)"""
+    chunks = list(iter_chunks(conn, table, **kwargs))
+    if not chunks:
+        columns = list(kwargs.get('columns') or TABLE_COLUMNS[table])
+        for key in ('reading_time', 'id'):
+            if key not in columns:
+                columns.append(key)
+        return to_frame([], columns, dict(TABLE_COLUMNS[table], **OPTIONAL_COLUMNS))
+    return pd.concat(chunks, ignore_index=True)
+
+def frame_nbytes(frame):
+    """In-memory size of a DataFrame's columns in bytes"""
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+def history_start(days):
+    """Start of a history window of `days` days (None for 0 = full history)"""
+    return datetime.now() - timedelta(days=days) if days > 0 else None
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Local Columnar Sensor Store
+Keeps a copy of tds_readings / turbidity_readings on disk as one .npy file
+per column, partitioned by day and device, so training and prediction read
+local memory-mapped columns instead of re-querying MySQL every run.
+
+Layout:
+    sensor_store/<table>/<YYYY-MM-DD>/<device>/<column>.npy
+    sensor_store/<table>/_state.json     high-water mark (last synced id)
+
+device_id is not stored as a column: reads that ask for it get it from the
+partition name (None for the default partition).
+
+sync() fetches only rows with an id above the high-water mark and rewrites
+just the partitions those rows fall in. Deleted or edited rows are not seen
+by an incremental sync; run `python sensor_store.py clear` (the synthetic
+data generators do this when they wipe the tables) and sync again.
+
+Usage:
+    python sensor_store.py sync | status | clear
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from sensor_extract import OPTIONAL_COLUMNS, TABLE_COLUMNS, has_column, iter_chunks, read_table
+
+STORE_DIR = os.environ.get('SENSOR_STORE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sensor_store'))
+
+# SENSOR_STORE=0 makes training and prediction query MySQL directly again
+STORE_ENABLED = os.environ.get('SENSOR_STORE', '1').lower() in ('1', 'true', 'yes')
+
+TABLES = ('tds_readings', 'turbidity_readings')
+
+# Partition name for tables (or rows) without a device_id
+DEFAULT_DEVICE = 'default'
+
+def table_dir(table):
+    """Directory holding one table's partitions"""
+    return os.path.join(STORE_DIR, table)
+
+def state_path(table):
+    """High-water mark file of a table"""
+    return os.path.join(table_dir(table), '_state.json')
+
+def load_state(table):
+    """Sync state of a table (last_id is 0 before the first sync)"""
+    try:
+        with open(state_path(table)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'last_id': 0, 'rows': 0, 'synced_at': None}
+
+def save_state(table, state):
+    """Write sync state atomically"""
+    os.makedirs(table_dir(table), exist_ok=True)
+    temp_path = f'{state_path(table)}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, state_path(table))
+
+@contextmanager
+def store_lock(shared=False):
+    """File lock around store access: exclusive for syncs, shared for reads
+
+    Keeps concurrent syncs (scheduler, prediction runs) from interleaving
+    and readers from opening a partition while it is being swapped.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(os.path.join(STORE_DIR, '.lock'), 'a+') as lock_file:
+        try:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        except ImportError:  # Windows has no shared locks; readers take it exclusively
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        yield
+
+def device_name(device_id):
+    """Directory-safe device name"""
+    if device_id is None or (isinstance(device_id, float) and np.isnan(device_id)) or str(device_id) == '':
+        return DEFAULT_DEVICE
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(device_id))
+
+def partition_dirs(table):
+    """(day, device, path) of every partition, oldest day first"""
+    root = table_dir(table)
+    if not os.path.isdir(root):
+        return []
+    partitions = []
+    for day in sorted(os.listdir(root)):
+        day_dir = os.path.join(root, day)
+        if day.startswith('_') or not os.path.isdir(day_dir):
+            continue
+        for device in sorted(os.listdir(day_dir)):
+            path = os.path.join(day_dir, device)
+            if os.path.isdir(path) and not device.endswith(('.new', '.old')):
+                partitions.append((day, device, path))
+    return partitions
+
+def load_partition(path, columns, mmap=True):
+    """Columns of one partition as arrays (memory-mapped read-only when mmap)"""
+    return {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r' if mmap else None)
+            for column in columns}
+
+def write_partition(path, arrays):
+    """Replace a partition's column files with new arrays
+
+    Columns are written to a sibling directory that is then renamed into
+    place, so a reader never sees columns of different lengths.
+    """
+    new_path, old_path = f'{path}.new', f'{path}.old'
+    shutil.rmtree(new_path, ignore_errors=True)
+    os.makedirs(new_path)
+    for column, values in arrays.items():
+        np.save(os.path.join(new_path, f'{column}.npy'), values)
+    if os.path.isdir(path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.rename(path, old_path)
+    os.rename(new_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def append_rows(table, frame):
+    """Merge new rows into the day/device partitions they belong to"""
+    columns = list(TABLE_COLUMNS[table])
+    days = frame['reading_time'].dt.strftime('%Y-%m-%d')
+    devices = (frame['device_id'].map(device_name) if 'device_id' in frame.columns
+               else pd.Series(DEFAULT_DEVICE, index=frame.index))
+
+    for (day, device), rows in frame.groupby([days, devices], sort=False):
+        path = os.path.join(table_dir(table), day, device)
+        new_arrays = {column: rows[column].to_numpy() for column in columns}
+        if os.path.isdir(path):
+            old_arrays = load_partition(path, columns, mmap=False)
+            new_arrays = {column: np.concatenate([old_arrays[column], new_arrays[column]]) for column in columns}
+
+        # Keep partitions sorted by time and free of rows synced twice
+        order = np.lexsort((new_arrays['id'], new_arrays['reading_time']))
+        ids = new_arrays['id'][order]
+        keep = np.ones(len(ids), dtype=bool)
+        if len(ids) > 1:
+            _, first = np.unique(ids, return_index=True)
+            keep[:] = False
+            keep[first] = True
+        write_partition(path, {column: values[order][keep] for column, values in new_arrays.items()})
+
+def sync(conn, tables=TABLES, chunk_size=None):
+    """Copy rows added since the last sync from the database into the store
+
+    Returns {table: rows fetched}.
+    """
+    fetched = {}
+    with store_lock():
+        for table in tables:
+            state = load_state(table)
+            columns = list(TABLE_COLUMNS[table])
+            if has_column(conn, table, 'device_id'):
+                columns.append('device_id')
+
+            count = 0
+            for chunk in iter_chunks(conn, table, columns=columns, after_id=state['last_id'], chunk_size=chunk_size):
+                last_id = int(chunk['id'].max())
+                chunk = chunk[chunk['reading_time'].notna()]
+                if len(chunk):
+                    append_rows(table, chunk)
+                    count += len(chunk)
+                    state['rows'] = state.get('rows', 0) + len(chunk)
+                state['last_id'] = last_id
+                save_state(table, state)  # Resume from here if interrupted
+
+            state['synced_at'] = datetime.now().isoformat()
+            save_state(table, state)
+            fetched[table] = count
+    return fetched
+
+def read(table, columns=None, since=None, until=None, devices=None, last=None, mmap=True):
+    """Readings from the store as a DataFrame sorted by reading_time
+
+    columns: columns to load (only those .npy files are opened); device_id
+             comes from the partition name
+    since / until: time window; whole day partitions outside it are skipped
+    devices: device names to include (default: all)
+    last: only the newest `last` rows (reads partitions newest-first and
+          stops once it has enough)
+    """
+    columns = list(columns or TABLE_COLUMNS[table])
+    load_columns = [column for column in columns if column != 'device_id']
+    if 'reading_time' not in load_columns:
+        load_columns.append('reading_time')
+    since = pd.Timestamp(since) if since is not None else None
+    until = pd.Timestamp(until) if until is not None else None
+
+    # Listed and read under one lock so a sync cannot swap partitions midway
+    with store_lock(shared=True):
+        partitions = partition_dirs(table)
+        if since is not None:
+            partitions = [p for p in partitions if p[0] >= since.strftime('%Y-%m-%d')]
+        if until is not None:
+            partitions = [p for p in partitions if p[0] <= until.strftime('%Y-%m-%d')]
+        if devices is not None:
+            allowed = {device_name(device) for device in devices}
+            partitions = [p for p in partitions if p[1] in allowed]
+
+        by_day = {}
+        for day, device, path in partitions:
+            by_day.setdefault(day, []).append((device, path))
+
+        # Newest days first when only the last rows are wanted. All devices of a
+        # day are read together since any of them may hold the newest rows.
+        pieces, total = [], 0
+        for day in sorted(by_day, reverse=bool(last)):
+            for device, path in by_day[day]:
+                arrays = load_partition(path, load_columns, mmap)
+                times = arrays['reading_time']
+                mask = np.ones(len(times), dtype=bool)
+                if since is not None:
+                    mask &= times >= since.to_datetime64()
+                if until is not None:
+                    mask &= times < until.to_datetime64()
+                piece = pd.DataFrame({column: arrays[column][mask] for column in load_columns})
+                if 'device_id' in columns:
+                    piece['device_id'] = pd.Series(None if device == DEFAULT_DEVICE else device,
+                                                   index=piece.index, dtype=object)
+                pieces.append(piece)
+                total += len(piece)
+            if last and total >= last:
+                break
+
+    if not pieces:
+        dtypes = dict(TABLE_COLUMNS[table], **OPTIONAL_COLUMNS)
+        return pd.DataFrame({column: np.array([], dtype=dtypes[column]) for column in columns})
+
+    frame = pd.concat(pieces, ignore_index=True).sort_values('reading_time', kind='mergesort')
+    if last:
+        frame = frame.tail(last)
+    return frame[columns].reset_index(drop=True)
+
+def fetch_readings(conn, table, columns, positive=None, since=None, last=None, with_device=False):
+    """Readings for training and prediction, oldest first
+
+    Syncs the delta into the store and reads it from there; with
+    SENSOR_STORE=0 it queries the database directly instead.
+    positive:    drop rows where this column is not > 0
+    last:        only the newest `last` rows
+    with_device: also return device_id if the table has that column
+    """
+    if with_device and 'device_id' not in columns and has_column(conn, table, 'device_id'):
+        columns = list(columns) + ['device_id']
+    if STORE_ENABLED:
+        sync(conn, (table,))
+        frame = read(table, columns, since=since, last=None if positive else last)
+        if positive:
+            frame = frame[frame[positive] > 0]
+        if last:
+            frame = frame.tail(last)
+        return frame.reset_index(drop=True)
+
+    frame = read_table(conn, table, columns=columns, where=f'{positive} > 0' if positive else None,
+                       since=since, descending=bool(last), limit=last)
+    if last:
+        frame = frame.iloc[::-1]
+    return frame[columns].reset_index(drop=True)
+
+def clear(tables=TABLES):
+    """Remove the stored copy of tables (the next sync starts from scratch)"""
+    with store_lock():
+        for table in tables:
+            shutil.rmtree(table_dir(table), ignore_errors=True)
+
+def status():
+    """Rows, partitions, size and high-water mark per table"""
+    summary = {}
+    for table in TABLES:
+        partitions = partition_dirs(table)
+        size = sum(os.path.getsize(os.path.join(path, name))
+                   for _, _, path in partitions for name in os.listdir(path))
+        summary[table] = dict(load_state(table), partitions=len(partitions), bytes=size,
+                              first_day=partitions[0][0] if partitions else None,
+                              last_day=partitions[-1][0] if partitions else None)
+    return summary
+
+def main():
+    """Command line entry point"""
+    if len(sys.argv) != 2 or sys.argv[1] not in ('sync', 'status', 'clear'):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'sync':
+        from db import connect_to_database
+        conn = connect_to_database()
+        if not conn:
+            sys.exit(1)
+        try:
+            for table, count in sync(conn).items():
+                print(f"✅ {table}: {count} new rows")
+        finally:
+            conn.close()
+    elif command == 'clear':
+        clear()
+        print(f"Cleared {STORE_DIR}")
+    print(json.dumps(status(), indent=2))
+
+if __name__ == "__main__":
+    main()
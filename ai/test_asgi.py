@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test the ASGI app: its routes answer like the Flask routes of ml_server.py,
+bad input and oversized bodies are rejected, unknown routes and methods get
+404 / 405, and /admin/reload checks the token before reloading the models
+
+Run with: python test_asgi.py   (or: python -m pytest test_asgi.py)
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import asgi
+import ml_server
+
+def call(method, path, query='', body=b'', headers=()):
+    """(status, JSON payload) of one request sent straight to the ASGI app"""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': [(name.encode(), value.encode()) for name, value in headers]}
+    chunks = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return chunks.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start, response = sent
+    return start['status'], json.loads(response['body'])
+
+def test_routes_match_flask():
+    """GET and POST /predict, /predict/batch and the info routes answer like the Flask app"""
+    client = ml_server.app.test_client()
+    status, payload = call('GET', '/predict', 'tds=350&turbidity=0.8')
+    expected = client.get('/predict?tds=350&turbidity=0.8').get_json()
+    assert status == 200 and payload['potability_status'] == expected['potability_status']
+    assert payload['recommendation'] == expected['recommendation']
+
+    status, posted = call('POST', '/predict', body=json.dumps({'tds': 350, 'turbidity': 0.8}).encode())
+    assert status == 200 and posted['potability_status'] == payload['potability_status']
+
+    readings = {'readings': [{'tds': 350, 'turbidity': 0.8}, {'tds': 900, 'turbidity': 12}]}
+    status, batch = call('POST', '/predict/batch', body=json.dumps(readings).encode())
+    assert status == 200 and batch['count'] == 2
+    assert batch['results'][1]['potability_status'] == 'Not Potable'
+
+    for path in ('/', '/status', '/health', '/test'):
+        assert call('GET', path)[0] == 200
+
+def test_bad_requests():
+    """Bad numbers, bad JSON, oversized bodies, unknown paths and wrong methods are errors"""
+    assert call('GET', '/predict', 'tds=abc')[0] == 400
+    assert call('GET', '/predict', 'tds=-5')[0] == 400
+    assert call('POST', '/predict', body=b'[1, 2]')[0] == 400
+    assert call('POST', '/predict/batch', body=b'not json')[0] == 400
+    assert call('GET', '/predict', 'tds=350&engine=quantum')[0] == 400
+    assert call('POST', '/predict', body=b' ' * (asgi.MAX_BODY_BYTES + 1))[0] == 413
+    assert call('GET', '/nowhere')[0] == 404
+    assert call('GET', '/predict/batch')[0] == 405
+    assert call('GET', '/admin/reload')[0] == 405
+
+def test_admin_reload():
+    """/admin/reload is disabled without ML_ADMIN_TOKEN, checks the token and bumps the generation"""
+    previous = ml_server.ADMIN_TOKEN
+    try:
+        ml_server.ADMIN_TOKEN = ''
+        assert call('POST', '/admin/reload', headers=[('X-Admin-Token', 'anything')])[0] == 403
+
+        ml_server.ADMIN_TOKEN = 'secret'
+        assert call('POST', '/admin/reload')[0] == 401
+        assert call('POST', '/admin/reload', headers=[('X-Admin-Token', 'wrong')])[0] == 401
+
+        generation = ml_server.current_models['generation']
+        status, payload = call('POST', '/admin/reload', headers=[('X-Admin-Token', 'secret')])
+        assert status == 200 and payload['status'] == 'success'
+        assert payload['previous_generation'] == generation
+        assert payload['generation'] == ml_server.current_models['generation'] == generation + 1
+    finally:
+        ml_server.ADMIN_TOKEN = previous
+
+if __name__ == "__main__":
+    print("🧪 Testing the ASGI app...")
+    test_routes_match_flask()
+    print("✅ Routes answer like the Flask app")
+    test_bad_requests()
+    print("✅ Bad requests are rejected")
+    test_admin_reload()
+    print("✅ /admin/reload checks the token and reloads")
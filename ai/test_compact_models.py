@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test forest compaction: depth-capped trees that sklearn and the tree
+compiler agree on, and compacted forests that stay within the tolerance
+while keeping fewer trees, selected on rows held out of the training split
+
+Run with: python test_compact_models.py   (or: python -m pytest test_compact_models.py)
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import compact_models
+from tree_compiler import compile_model
+
+def threshold_data(n_rows=3000, seed=1):
+    """Readings labeled by the two WHO thresholds, split into train and validation"""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'tds_value': rng.uniform(50, 1000, n_rows),
+        'turbidity_value': rng.exponential(2, n_rows),
+        'temperature': rng.normal(25, 5, n_rows)
+    })
+    y = np.where((X['tds_value'] <= 500) & (X['turbidity_value'] <= 1.0), 'Potable', 'Not Potable')
+    return X[:2400], y[:2400], X[2400:], y[2400:]
+
+def test_capped_tree_matches_compiled_and_sklearn():
+    """A depth-capped forest predicts the same through sklearn and the compiler"""
+    X_train, y_train, X_val, _ = threshold_data()
+    model = RandomForestClassifier(n_estimators=5, max_depth=12, random_state=0).fit(X_train, y_train)
+    capped = compact_models.subset_forest(model, range(5), max_depth=3)
+
+    assert all(tree.tree_.max_depth <= 3 for tree in capped.estimators_)
+    assert all(tree.tree_.node_count <= 15 for tree in capped.estimators_)
+    assert np.allclose(capped.predict_proba(X_val), compile_model(capped).predict_proba(X_val.to_numpy()))
+    # The original forest is left untouched
+    assert max(tree.tree_.max_depth for tree in model.estimators_) > 3
+
+def test_compaction_stays_within_tolerance():
+    """Fewer, shallower trees, validation score within the tolerance, float32 artifact"""
+    X_train, y_train, X_val, y_val = threshold_data()
+    model = RandomForestClassifier(n_estimators=60, max_depth=15, random_state=0).fit(X_train, y_train)
+    compacted, compiled, report = compact_models.compact_model(model, X_val, y_val, tolerance=0.01, float32=True)
+
+    assert report['after']['trees'] < report['before']['trees']
+    assert report['after']['nodes'] < report['before']['nodes']
+    assert report['after']['score'] >= report['before']['score'] - 0.01
+    assert (compacted.predict(X_val) == y_val).mean() >= report['before']['score'] - 0.01
+    assert report['float32'] and compiled.threshold.dtype == np.float32
+
+def test_regressors_and_passthrough():
+    """Forest regressors are scored by R2; other models pass through unchanged"""
+    X_train, _, X_val, _ = threshold_data()
+    target = lambda X: X['tds_value'] / 10 + X['turbidity_value']
+    model = RandomForestRegressor(n_estimators=30, max_depth=12, random_state=0).fit(X_train, target(X_train))
+    compacted, _, report = compact_models.compact_model(model, X_val, target(X_val), tolerance=0.02)
+    assert report['after']['trees'] < 30
+    assert compacted.score(X_val, target(X_val)) >= report['before']['score'] - 0.02
+
+    linear = LinearRegression().fit(X_train, target(X_train))
+    assert compact_models.compact_for_serving(linear, X_val, target(X_val)) == (linear, None, None)
+
+def test_validation_split_leaves_test_rows_alone():
+    """Selection rows come out of the training rows; non-forests fit on all of them"""
+    X_train, y_train, _, _ = threshold_data()
+    forest = RandomForestClassifier(n_estimators=5)
+    X_fit, X_val, y_fit, y_val = compact_models.validation_split(forest, X_train, y_train, stratify=True)
+    assert len(X_fit) + len(X_val) == len(X_train) and len(X_val) == 480
+    assert not set(X_fit.index) & set(X_val.index) and set(X_val.index) <= set(X_train.index)
+    assert set(y_val) == set(y_train)
+
+    X_fit, X_val, _, _ = compact_models.validation_split(forest, X_train, y_train, chronological=True)
+    assert list(X_val.index) == list(X_train.index[-480:])
+
+    X_fit, X_val, _, y_val = compact_models.validation_split(LinearRegression(), X_train, y_train)
+    assert len(X_fit) == len(X_train) and len(X_val) == len(y_val) == 0
+
+if __name__ == "__main__":
+    print("🧪 Testing forest compaction...")
+    test_capped_tree_matches_compiled_and_sklearn()
+    print("✅ Capped trees agree between sklearn and the compiler")
+    test_compaction_stays_within_tolerance()
+    print("✅ Compacted forest stays within tolerance")
+    test_regressors_and_passthrough()
+    print("✅ Regressors compacted, other models passed through")
+    test_validation_split_leaves_test_rows_alone()
+    print("✅ Trees are selected on held-out training rows")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the shared data-access module: parameters are passed to the driver
+(never formatted into the SQL), query timings are recorded per label, and
+the recommended indexes are created once, only where their columns exist
+
+Run with: python test_db.py   (or: python -m pytest test_db.py)
+"""
+
+import sys
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import db
+from sensor_extract import read_table
+
+def make_connection():
+    """In-memory copies of both sensor tables (only turbidity has device_id), an hour of readings each"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tds_readings (id INTEGER PRIMARY KEY, tds_value REAL, analog_value INTEGER, '
+                 'voltage REAL, temperature REAL, reading_time TEXT)')
+    conn.execute('CREATE TABLE turbidity_readings (id INTEGER PRIMARY KEY, device_id TEXT, ntu_value REAL, '
+                 'analog_value REAL, voltage REAL, raw_adc INTEGER, reading_time TEXT)')
+    start = datetime.now() - timedelta(hours=1)
+    for minute in range(60):
+        time = (start + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S')
+        conn.execute('INSERT INTO tds_readings (tds_value, analog_value, voltage, temperature, reading_time) '
+                     'VALUES (?, 1000, 3.3, 25.0, ?)', (400.0 + minute, time))
+        conn.execute('INSERT INTO turbidity_readings (device_id, ntu_value, analog_value, voltage, raw_adc, '
+                     'reading_time) VALUES (?, ?, 1800.0, 2.1, 1800, ?)', (f'SENSOR_00{minute % 2 + 1}', 2.5, time))
+    conn.commit()
+    return conn
+
+def test_parameterized_query():
+    """%s parameters bind on sqlite3 too, datetimes included, and a quote in a value is just data"""
+    conn = make_connection()
+    since = datetime.now() - timedelta(minutes=30)
+    rows = db.query(conn, 'SELECT COUNT(*) FROM tds_readings WHERE reading_time >= %s', (since,))
+    assert 29 <= rows[0][0] <= 31
+    rows = db.query(conn, 'SELECT COUNT(*) FROM turbidity_readings WHERE device_id = %s', ("x' OR '1'='1",))
+    assert rows[0][0] == 0
+
+def test_query_timings():
+    """Every query, including read_table()'s pages, is timed under its label"""
+    db.query_stats.clear()
+    conn = make_connection()
+    db.query(conn, 'SELECT MAX(id) FROM tds_readings', label='tds high-water mark')
+    db.query(conn, 'SELECT MAX(id) FROM tds_readings', label='tds high-water mark')
+    read_table(conn, 'turbidity_readings', chunk_size=25)
+    summary = db.query_summary()
+    assert summary['tds high-water mark']['count'] == 2
+    assert summary['turbidity_readings range page']['count'] == 3
+    assert all(stats['max_ms'] >= stats['avg_ms'] >= 0 for stats in summary.values())
+
+def test_ensure_indexes():
+    """Missing indexes are created, a second run finds them, and a missing column is skipped"""
+    conn = make_connection()
+    first = {name: status for _, name, status in db.ensure_indexes(conn)}
+    assert first == {'idx_tds_time_id': 'created', 'idx_tds_device_time': 'no such column',
+                     'idx_turbidity_time_id': 'created', 'idx_turbidity_device_time': 'created'}
+    assert ('device_id', 'reading_time') in db.index_columns(conn, 'turbidity_readings')
+    second = {name: status for _, name, status in db.ensure_indexes(conn)}
+    assert set(second.values()) == {'exists', 'no such column'}
+
+    # The device window is answered from the new index
+    plan = db.query(conn, 'EXPLAIN QUERY PLAN SELECT * FROM turbidity_readings WHERE device_id = %s '
+                          'AND reading_time >= %s', ('SENSOR_001', datetime.now() - timedelta(hours=1)))
+    assert any('idx_turbidity_device_time' in str(row) for row in plan)
+
+if __name__ == "__main__":
+    print("🧪 Testing shared database access...")
+    test_parameterized_query()
+    print("✅ Parameters are bound, never formatted into the SQL")
+    test_query_timings()
+    print("✅ Query timings are recorded per label")
+    test_ensure_indexes()
+    print("✅ Recommended indexes are created once")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Property test for the precomputed potability decision table
+Checks table lookups against the rule ladder on random and edge-case inputs
+
+Run with: python test_decision_table.py   (or: python -m pytest test_decision_table.py)
+"""
+
+import sys
+import os
+import numpy as np
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ml_server
+
+def sample_readings(n_random=20000, seed=7):
+    """Random readings over the /predict domain plus values around every band edge"""
+    rng = np.random.default_rng(seed)
+    tds = list(rng.uniform(0, 10000, n_random)) + list(rng.uniform(0, 1500, n_random))
+    turbidity = list(rng.uniform(0, 100, n_random)) + list(rng.uniform(0, 60, n_random))
+
+    # Exact edges and their float neighbours on both sides
+    tds_edges = [0.0, 10000.0]
+    for edge in ml_server.TDS_BAND_EDGES:
+        tds_edges += [np.nextafter(edge, -np.inf), float(edge), np.nextafter(edge, np.inf)]
+    turbidity_edges = [0.0, 100.0]
+    for edge in ml_server.TURBIDITY_BAND_EDGES:
+        turbidity_edges += [np.nextafter(edge, -np.inf), float(edge), np.nextafter(edge, np.inf)]
+    for t in tds_edges:
+        for u in turbidity_edges:
+            tds.append(t)
+            turbidity.append(u)
+
+    return [float(t) for t in tds], [float(u) for u in turbidity]
+
+def test_table_matches_rule_ladder():
+    """lookup_rules() must equal evaluate_rules() everywhere in the domain"""
+    tds, turbidity = sample_readings()
+    for t, u in zip(tds, turbidity):
+        assert ml_server.lookup_rules(t, u) == ml_server.evaluate_rules(t, u), (t, u)
+
+def test_batch_matches_single_reading():
+    """/predict/batch results must equal /predict results for the same readings"""
+    tds, turbidity = sample_readings(n_random=2000)
+    temperature = [25.0] * len(tds)
+    ph = [7.0] * len(tds)
+    batch = ml_server.get_potability_recommendations_batch(tds, turbidity, temperature, ph)
+    for t, u, result in zip(tds, turbidity, batch):
+        assert result == ml_server.get_potability_recommendation(t, u, 25.0, 7.0), (t, u)
+
+def test_thresholds_defined_once():
+    """Band edges, the ladder and who_guidelines all follow the threshold constants"""
+    assert ml_server.TDS_LIMIT in ml_server.TDS_BAND_EDGES
+    assert ml_server.TURBIDITY_WARNING_THRESHOLD in ml_server.TURBIDITY_BAND_EDGES
+    for threshold, _ in ml_server.TDS_PENALTIES:
+        assert threshold in ml_server.TDS_BAND_EDGES
+    for threshold, _ in ml_server.TURBIDITY_PENALTIES:
+        assert threshold in ml_server.TURBIDITY_BAND_EDGES
+
+    limit = ml_server.TDS_LIMIT
+    assert ml_server.evaluate_rules(limit, 0.5)['potability_status'] == 'Potable'
+    assert ml_server.evaluate_rules(np.nextafter(limit, np.inf), 0.5)['potability_status'] == 'Not Potable'
+    worst = ml_server.evaluate_rules(1e4, 0.5)['potability_score']
+    assert worst == 100.0 - ml_server.TDS_PENALTIES[-1][1]
+    assert ml_server.get_potability_recommendation(300.0, 0.5)['who_guidelines'] == {
+        'tds_limit': ml_server.TDS_LIMIT,
+        'turbidity_warning_threshold': ml_server.TURBIDITY_WARNING_THRESHOLD
+    }
+
+if __name__ == "__main__":
+    print("🧪 Testing decision table against the rule ladder...")
+    test_table_matches_rule_ladder()
+    print("✅ Table matches rule ladder")
+    test_batch_matches_single_reading()
+    print("✅ Batch matches single-reading results")
+    test_thresholds_defined_once()
+    print("✅ Thresholds are defined once")
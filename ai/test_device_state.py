@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the per-device forecast state: each device's ring buffer matches the
+features built from its own readings, running sums stay exact over long
+feeds, and a snapshot restores the same states
+
+Run with: python test_device_state.py   (or: python -m pytest test_device_state.py)
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import features
+from device_state import ALL_DEVICES, DeviceStates
+
+START = datetime(2024, 4, 1)
+
+def turbidity_rows(n_rows=500, seed=9):
+    """Readings of two devices in shuffled id order, with some non-positive values"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'id': np.arange(1, n_rows + 1),
+        'device_id': rng.choice(['SENSOR_001', 'SENSOR_002'], n_rows),
+        'ntu_value': rng.uniform(-1, 40, n_rows),
+        'analog_value': rng.uniform(1000, 3000, n_rows),
+        'voltage': rng.uniform(1.5, 3.0, n_rows),
+        'reading_time': [START + timedelta(minutes=int(m)) for m in range(n_rows)]
+    })
+    return frame.sample(frac=1, random_state=1).reset_index(drop=True)
+
+def expected_row(readings, value_col):
+    """forecast_features() row of the newest reading, missing lags filled with it"""
+    readings = readings.sort_values('reading_time')
+    full = features.forecast_features(readings[value_col], readings['reading_time'],
+                                      readings['analog_value'], readings['voltage'])
+    row = np.array([full[column][-1] for column in features.forecast_columns(full)])
+    row[np.isnan(row)] = readings[value_col].iloc[-1]
+    return row
+
+def test_device_states_match_their_readings():
+    """Per-device and combined states give each series' newest feature row"""
+    rows = turbidity_rows()
+    states = DeviceStates()
+    # Fed in two polls; the rows are in shuffled order, so a second-poll
+    # reading older than its device's newest one is dropped
+    fed = states.feed('turbidity_readings', rows.iloc[:200]) + states.feed('turbidity_readings', rows.iloc[200:])
+    assert states.last_id['turbidity_readings'] == 500
+    assert states.devices('turbidity_readings') == ['SENSOR_001', 'SENSOR_002']
+
+    positive = rows[rows['ntu_value'] > 0]
+    kept_total = 0
+    for device in ('SENSOR_001', 'SENSOR_002', ALL_DEVICES):
+        seen = positive if device == ALL_DEVICES else positive[positive['device_id'] == device]
+        first, second = seen[seen.index < 200], seen[seen.index >= 200]
+        kept = pd.concat([first, second[second['reading_time'] >= first['reading_time'].max()]])
+        kept_total += len(kept) if device != ALL_DEVICES else 0
+        state = states.state('turbidity_readings', None if device == ALL_DEVICES else device)
+        assert np.allclose(state.features()[0], expected_row(kept, 'ntu_value'))
+    assert fed == kept_total
+
+def test_running_sums_stay_exact():
+    """Thousands of pushes later the running mean and spread match a fresh computation"""
+    rng = np.random.default_rng(2)
+    values = rng.uniform(0, 1500, 5000)
+    times = [START + timedelta(minutes=i) for i in range(len(values))]
+    state = features.ForecastState(['analog_value', 'voltage'])
+    for value, time in zip(values, times):
+        state.push(value, time, analog_value=value * 2.5, voltage=3.3)
+    readings = pd.DataFrame({'tds_value': values[-20:], 'analog_value': values[-20:] * 2.5, 'voltage': 3.3,
+                             'reading_time': times[-20:]})
+    assert np.allclose(state.features()[0], expected_row(readings, 'tds_value'))
+
+def test_snapshot_round_trip():
+    """A restored snapshot has the same high-water marks and feature rows"""
+    states = DeviceStates()
+    states.feed('turbidity_readings', turbidity_rows())
+    path = os.path.join(tempfile.mkdtemp(), 'forecast_state.json')
+    states.save(path)
+
+    restored = DeviceStates.load(path)
+    assert restored.last_id == states.last_id
+    for device in (None, 'SENSOR_001', 'SENSOR_002'):
+        original, copy = states.state('turbidity_readings', device), restored.state('turbidity_readings', device)
+        assert np.allclose(copy.features(), original.features())
+        assert copy.interval() == original.interval()
+
+    assert restored.state('tds_readings') is None
+    assert DeviceStates.load(os.path.join(tempfile.mkdtemp(), 'missing.json')).last_id['tds_readings'] == 0
+
+if __name__ == "__main__":
+    print("🧪 Testing the per-device forecast state...")
+    test_device_states_match_their_readings()
+    print("✅ Device states match their readings")
+    test_running_sums_stay_exact()
+    print("✅ Running sums stay exact")
+    test_snapshot_round_trip()
+    print("✅ Snapshot round trip")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test the shared feature pipeline: vectorized forecast features against the
+pandas shift/rolling reference, training and serving features agreeing
+for the same readings (for both potability column sets), and the rolling
+forecast state as it advances
+
+Run with: python test_features.py   (or: python -m pytest test_features.py)
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import features
+
+START = datetime(2024, 3, 1)
+
+def make_series(n_rows=400, seed=5):
+    """One sensor's readings, shuffled, with a missing value"""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'tds_value': rng.uniform(100, 900, n_rows),
+        'analog_value': rng.uniform(0, 4000, n_rows),
+        'voltage': rng.uniform(3.0, 3.6, n_rows),
+        'reading_time': [START + timedelta(minutes=10 * int(i)) for i in rng.permutation(n_rows)]
+    })
+    data.loc[7, 'tds_value'] = np.nan
+    return data
+
+def pandas_reference(data, value_col):
+    """Forecast features the way the training scripts built them with pandas"""
+    data = data.sort_values('reading_time').reset_index(drop=True)
+    data['hour'] = data['reading_time'].dt.hour
+    data['day_of_week'] = data['reading_time'].dt.dayofweek
+    data['day_of_year'] = data['reading_time'].dt.dayofyear
+    for steps in (1, 3, 6, 12):
+        data[f'lag_{steps}'] = data[value_col].shift(steps)
+    data['rolling_mean_3'] = data[value_col].rolling(window=3, min_periods=1).mean()
+    data['rolling_mean_6'] = data[value_col].rolling(window=6, min_periods=1).mean()
+    data['rolling_std_6'] = data[value_col].rolling(window=6, min_periods=1).std()
+    data['target'] = data[value_col].shift(-1)
+    return data.dropna()
+
+def test_forecast_training_set_matches_pandas():
+    """Same rows, features and targets as the pandas shift/rolling version"""
+    data = make_series()
+    X, y, feature_cols = features.forecast_training_set(data, 'tds_value')
+    reference = pandas_reference(data, 'tds_value')
+
+    assert feature_cols == features.FORECAST_COLUMNS + ['analog_value', 'voltage']
+    assert X.index.tolist() == reference.index.tolist()
+    assert np.allclose(X.to_numpy(), reference[feature_cols].to_numpy())
+    assert np.allclose(y.to_numpy(), reference['target'].to_numpy())
+
+def test_latest_forecast_row_matches_training_row():
+    """The prediction row for a new reading is the training row it would get"""
+    data = make_series(n_rows=30).dropna().sort_values('reading_time').reset_index(drop=True)
+    history, current = data.iloc[:-1], data.iloc[-1]
+
+    row = features.latest_forecast_features(history, current['tds_value'], 'tds_value',
+                                            now=current['reading_time'].to_pydatetime())
+    # The current reading carries the newest history reading's sensor extras
+    series = data.copy()
+    series.loc[series.index[-1], ['analog_value', 'voltage']] = history.iloc[-1][['analog_value', 'voltage']].to_numpy()
+    full = features.forecast_features(series['tds_value'], series['reading_time'],
+                                      series['analog_value'], series['voltage'])
+    expected = [full[column][-1] for column in features.forecast_columns(full)]
+    assert np.allclose(row[0], expected)
+
+    # A short history falls back to the current value for missing lags
+    short = features.latest_forecast_features(history.iloc[-2:], 123.0, 'tds_value')
+    lag_columns = [features.FORECAST_COLUMNS.index(name) for name in ('lag_3', 'lag_6', 'lag_12')]
+    assert (short[0, lag_columns] == 123.0).all()
+    assert not np.isnan(short).any()
+
+def test_forecast_state_advances_like_training_rows():
+    """Each pushed reading gets the row forecast_features() builds for the extended series"""
+    data = make_series(n_rows=40).dropna().sort_values('reading_time').reset_index(drop=True)
+    history, current = data.iloc[:5], data.iloc[5]
+    state = features.ForecastState.from_history(history, current['tds_value'], 'tds_value',
+                                                now=current['reading_time'].to_pydatetime())
+    extras = history.iloc[-1][['analog_value', 'voltage']].to_numpy(dtype=float)
+
+    values = data['tds_value'].to_numpy()[:6].tolist()
+    times = data['reading_time'].tolist()[:6]
+    for step in range(20):
+        full = features.forecast_features(values, times, np.full(len(values), extras[0]),
+                                          np.full(len(values), extras[1]))
+        expected = np.array([full[column][-1] for column in features.forecast_columns(full)])
+        expected[np.isnan(expected)] = values[-1]  # Lags before the series start
+        assert np.allclose(state.features()[0], expected)
+
+        values.append(300.0 + step)
+        times.append(times[-1] + timedelta(minutes=10))
+        state.push(values[-1], times[-1])
+
+def test_training_and_serving_potability_features_agree():
+    """Server feature matrix equals the training features for the same readings"""
+    import train_with_real_db_data
+
+    now = datetime(2024, 6, 3, 14, 30)
+    tds = np.array([120.0, 480.0, 950.0])
+    turbidity = np.array([0.3, 1.5, 8.0])
+    data = pd.DataFrame({
+        'tds_value': tds,
+        'turbidity_value': turbidity,
+        'temperature': [21.0, 25.0, 29.0],
+        'voltage': features.DEFAULT_VOLTAGE,
+        'analog_value': tds * 2.5,
+        'reading_time': [now] * 3
+    })
+    feature_cols = train_with_real_db_data.prepare_features(data)
+    served = features.potability_matrix(tds, turbidity, [21.0, 25.0, 29.0], times=now)
+
+    assert feature_cols == features.POTABILITY_COLUMNS
+    assert np.allclose(data[feature_cols].to_numpy(dtype=float), served)
+
+def test_server_accepts_recommendation_models():
+    """Models trained on the recommendation columns (ph_level included) pass the server's feature check"""
+    import contextlib
+    import io
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    import ml_server
+    import train_potability_recommendation
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = train_potability_recommendation.create_potability_training_data()
+    X, y, feature_cols = train_potability_recommendation.prepare_potability_features(data)
+    classifier = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    regressor = RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, data['potability_score'])
+
+    tds = np.array([150.0, 450.0, 900.0])
+    turbidity = np.array([0.4, 3.0, 12.0])
+    now = datetime(2024, 6, 3, 14, 30)
+    served = ml_server.build_feature_matrix(tds, turbidity, 24.0, [6.5, 7.0, 8.2], now=now)
+    trained = pd.DataFrame(features.potability_matrix(tds, turbidity, 24.0, [6.5, 7.0, 8.2], times=now,
+                                                      columns=feature_cols), columns=feature_cols)
+    for model in (classifier, regressor):
+        columns, error = ml_server.check_model_features(model, 'model')
+        assert error is None
+        assert np.array_equal(model.predict(ml_server.model_input(model, served, columns)), model.predict(trained))
+
+if __name__ == "__main__":
+    print("🧪 Testing the shared feature pipeline...")
+    test_forecast_training_set_matches_pandas()
+    print("✅ Forecast features match the pandas reference")
+    test_latest_forecast_row_matches_training_row()
+    print("✅ Prediction row matches the training row")
+    test_forecast_state_advances_like_training_rows()
+    print("✅ Forecast state advances like the training rows")
+    test_training_and_serving_potability_features_agree()
+    print("✅ Training and serving potability features agree")
+    test_server_accepts_recommendation_models()
+    print("✅ Server serves models trained on the recommendation columns")
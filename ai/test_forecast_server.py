@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Test the forecasting server: warm models forecast like the sklearn models
+from per-device states fed over pooled connections, hourly trajectories
+match rebuilding the history each step, a restart resumes from the state
+snapshot, the recursion takes a bounded number of coarse steps, the
+endpoint returns predict_real_data.py's JSON shape, and the
+CLI shim still answers without a server but does not forecast again when a
+server is slow to answer
+
+Run with: python test_forecast_server.py   (or: python -m pytest test_forecast_server.py)
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from datetime import datetime, timedelta
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import forecast_server
+import model_registry
+import device_state
+import predict_real_data
+from features import forecast_training_set
+
+RESPONSE_KEYS = {'status', 'timestamp', 'tds_prediction', 'turbidity_prediction', 'confidence', 'method',
+                 'horizon_hours', 'trajectory'}
+
+class SQLitePool:
+    """Stand-in for the MySQL pool: a new connection to an SQLite file per checkout"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handed_out = []
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.path)
+        self.handed_out.append(conn)
+        return conn
+
+    def all_returned(self):
+        """Whether every connection handed out was closed again"""
+        for conn in self.handed_out:
+            try:
+                conn.execute('SELECT 1')
+                return False
+            except sqlite3.ProgrammingError:
+                pass
+        return True
+
+def readings(minutes=600, seed=0):
+    """Ten hours of TDS and turbidity readings, one per ten minutes, ending now"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(end=datetime.now().replace(microsecond=0) - timedelta(minutes=1),
+                          periods=minutes // 10, freq='10min')
+    # float32 values, as the sensor tables are read
+    tds_values = (400 + 50 * np.sin(np.arange(len(times)) / 6) + rng.normal(0, 5, len(times))).astype(np.float32)
+    tds = pd.DataFrame({'tds_value': tds_values.astype(float),
+                        'analog_value': 1000, 'voltage': 3.3, 'temperature': 25.0, 'reading_time': times})
+    turbidity = pd.DataFrame({'device_id': 'SENSOR_001',
+                              'ntu_value': (2 + rng.gamma(2, 0.5, len(times))).astype(np.float32).astype(float),
+                              'analog_value': 1800.0, 'voltage': 2.1, 'raw_adc': 1800, 'reading_time': times})
+    return tds, turbidity
+
+def make_database(tds, turbidity):
+    """SQLite file with copies of both sensor tables holding the readings"""
+    path = os.path.join(tempfile.mkdtemp(), 'readings.db')
+    with sqlite3.connect(path) as conn:
+        for table, frame in (('tds_readings', tds), ('turbidity_readings', turbidity)):
+            frame = frame.assign(reading_time=frame['reading_time'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+            frame.set_axis(frame.index + 1).to_sql(table, conn, index_label='id')
+    return path
+
+def setup_server():
+    """Train both forecast models into a temp dir and serve them with a SQLite pool"""
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    device_state.STATE_FILE = os.path.join(tempfile.mkdtemp(), 'forecast_state.json')
+    forecast_server.device_states = None
+    forecast_server.device_columns.clear()
+    tds, turbidity = readings()
+    X_tds, y_tds, _ = forecast_training_set(tds, 'tds_value')
+    X_turbidity, y_turbidity, _ = forecast_training_set(turbidity, 'ntu_value')
+    tds_model = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0).fit(X_tds, y_tds)
+    turbidity_model = GradientBoostingRegressor(n_estimators=30, random_state=0).fit(X_turbidity, y_turbidity)
+
+    directory = tempfile.mkdtemp()
+    forecast_server.TDS_MODEL_FILE = os.path.join(directory, 'tds_model_real.pkl')
+    forecast_server.TURBIDITY_MODEL_FILE = os.path.join(directory, 'turbidity_model_real.pkl')
+    joblib.dump(tds_model, forecast_server.TDS_MODEL_FILE)
+    joblib.dump(turbidity_model, forecast_server.TURBIDITY_MODEL_FILE)
+    assert forecast_server.load_models()
+
+    forecast_server.db_pool = SQLitePool(make_database(tds, turbidity))
+    return tds_model, turbidity_model, tds
+
+def test_forecast_matches_models():
+    """Compiled warm models forecast what the sklearn models predict, and the connection goes back"""
+    tds_model, _, tds = setup_server()
+    assert forecast_server.current_models['sources']['tds']['compiled']
+
+    now = datetime.now()
+    result = forecast_server.predict_with_ml_models(420.0, 2.5, 1, now=now)
+    assert result['method'] == 'ml_models'
+    assert forecast_server.db_pool.all_returned()
+
+    # Readings are ten minutes apart, but the recursion steps an hour at a time
+    assert forecast_server.forecast_step(600, 1) == 3600
+    expected = forecast_server.rebuilt_trajectory(tds_model, tds, 420.0, 'tds_value', 1, 3600,
+                                                  forecast_server.TDS_BOUNDS, now)
+    assert np.isclose(result['tds_prediction'], expected[0])
+
+def test_forecast_steps_are_bounded():
+    """Steps are at least FORECAST_STEP_SECONDS and never more than FORECAST_MAX_STEPS per trajectory"""
+    assert forecast_server.forecast_step(30, 168) == 3600
+    assert forecast_server.forecast_step(7200, 6) == 7200
+    previous = forecast_server.FORECAST_STEP_SECONDS, forecast_server.FORECAST_MAX_STEPS
+    forecast_server.FORECAST_STEP_SECONDS, forecast_server.FORECAST_MAX_STEPS = 30, 100
+    try:
+        assert forecast_server.forecast_step(30, 1) == 36
+        assert forecast_server.forecast_step(30, 168) * 100 == 168 * 3600
+
+        # A week at the sensors' 30 s cadence takes FORECAST_MAX_STEPS model calls
+        calls = []
+        class CountingModel:
+            def predict(self, row):
+                calls.append(1)
+                return np.array([400.0])
+        tds = readings()[0]
+        state = forecast_server.ForecastState.from_history(tds, 420.0, 'tds_value', datetime.now())
+        step = forecast_server.forecast_step(30, 168)
+        hourly = forecast_server.forecast_trajectory(CountingModel(), state, 168, step, forecast_server.TDS_BOUNDS)
+        assert len(calls) == 100 and len(hourly) == 168 and np.all(hourly == 400.0)
+    finally:
+        forecast_server.FORECAST_STEP_SECONDS, forecast_server.FORECAST_MAX_STEPS = previous
+
+def test_trajectory_matches_rebuilt_history():
+    """Every hour of a trajectory matches appending each prediction to the history frame"""
+    tds_model, _, tds = setup_server()
+    now = datetime.now()
+
+    state = forecast_server.ForecastState.from_history(tds, 420.0, 'tds_value', now)
+    hourly = forecast_server.forecast_trajectory(forecast_server.current_models['tds'], state, 24, 600,
+                                                 forecast_server.TDS_BOUNDS)
+    expected = forecast_server.rebuilt_trajectory(tds_model, tds, 420.0, 'tds_value', 24, 600,
+                                                  forecast_server.TDS_BOUNDS, now)
+    assert np.allclose(hourly, expected)
+
+    # Readings two hours apart fill two hours per step
+    state = forecast_server.ForecastState.from_history(tds, 420.0, 'tds_value', now)
+    sparse = forecast_server.forecast_trajectory(tds_model, state, 4, 7200, forecast_server.TDS_BOUNDS)
+    assert sparse[0] == sparse[1] and sparse[2] == sparse[3]
+
+def test_states_resume_from_snapshot():
+    """Only new rows are fetched, per device, and a restart continues from the snapshot"""
+    setup_server()
+    states = forecast_server.refresh_device_states()
+    assert states.last_id == {'tds_readings': 60, 'turbidity_readings': 60}
+    assert states.devices('turbidity_readings') == ['SENSOR_001']
+
+    newest = datetime.now().replace(microsecond=0).strftime('%Y-%m-%d %H:%M:%S')
+    with sqlite3.connect(forecast_server.db_pool.path) as conn:
+        conn.execute("INSERT INTO turbidity_readings (id, device_id, ntu_value, analog_value, voltage, raw_adc, "
+                     "reading_time) VALUES (61, 'SENSOR_002', 4.5, 1800.0, 2.1, 1800, ?)", (newest,))
+    assert forecast_server.feed_new_readings(forecast_server.db_pool.get_connection(), states) == \
+        {'tds_readings': 0, 'turbidity_readings': 1}
+    states.save()
+
+    restored = device_state.DeviceStates.load()
+    assert restored.last_id == states.last_id
+    assert restored.devices('turbidity_readings') == ['SENSOR_001', 'SENSOR_002']
+    for table in ('tds_readings', 'turbidity_readings'):
+        for device in (None, *states.devices(table)):
+            assert np.allclose(restored.state(table, device).features(), states.state(table, device).features())
+    assert len(restored.state('turbidity_readings', 'SENSOR_002')) == 1
+
+def test_forecast_endpoint():
+    """/forecast answers in predict_real_data.py's JSON shape; bad input is a 400"""
+    setup_server()
+    client = forecast_server.app.test_client()
+    response = client.get('/forecast?tds=420&turbidity=2.5&horizon_hours=6')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert set(payload) == RESPONSE_KEYS
+    assert payload['status'] == 'success' and payload['method'] == 'ml_models' and payload['horizon_hours'] == 6
+    assert [point['hour'] for point in payload['trajectory']] == [1, 2, 3, 4, 5, 6]
+    assert payload['trajectory'][-1]['tds_prediction'] == payload['tds_prediction']
+
+    posted = client.post('/forecast', json={'tds': 420, 'turbidity': 2.5, 'horizon_hours': 6}).get_json()
+    assert posted['tds_prediction'] == payload['tds_prediction']
+    assert client.get('/forecast?tds=abc&turbidity=2.5').status_code == 400
+    # TDS readings carry no device_id, so a named device uses every TDS reading
+    named = client.get('/forecast?tds=420&turbidity=2.5&horizon_hours=6&device=SENSOR_001').get_json()
+    assert named['method'] == 'ml_models'
+    assert client.get('/forecast?tds=420&turbidity=2.5&horizon_hours=0').status_code == 400
+    assert client.get('/health').get_json()['models_loaded']
+
+def test_cli_without_server():
+    """The shim prints only the forecast JSON when no server is running"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'predict_real_data.py')
+    env = dict(os.environ, FORECAST_SERVER_URL='http://127.0.0.1:9', FORECAST_SERVER_TIMEOUT='1',
+               FORECAST_TDS_MODEL_FILE=os.path.join(tempfile.mkdtemp(), 'missing.pkl'))
+    output = subprocess.run([sys.executable, script, '420', '2.5', '6'], capture_output=True, text=True,
+                            env=env, timeout=120).stdout
+    payload = json.loads(output)
+    assert set(payload) == RESPONSE_KEYS and payload['method'] == 'trend_analysis'
+    assert len(payload['trajectory']) == 6
+
+    usage = subprocess.run([sys.executable, script], capture_output=True, text=True, timeout=60).stdout
+    assert json.loads(usage)['status'] == 'error'
+
+def test_client_does_not_repeat_slow_forecasts():
+    """A server that took the request but answers late is an error; no server at all is a fallback"""
+    class SlowHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(1.0)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    previous = predict_real_data.FORECAST_SERVER_URL, predict_real_data.FORECAST_SERVER_TIMEOUT
+    try:
+        predict_real_data.FORECAST_SERVER_URL = f'http://127.0.0.1:{server.server_port}'
+        predict_real_data.FORECAST_SERVER_TIMEOUT = 0.2
+        result = predict_real_data.forecast_from_server(420.0, 2.5, 168)
+        assert result['status'] == 'error' and 'did not answer within 0.2s' in result['message']
+
+        predict_real_data.FORECAST_SERVER_URL = 'http://127.0.0.1:9'
+        assert predict_real_data.forecast_from_server(420.0, 2.5, 6) is None
+    finally:
+        predict_real_data.FORECAST_SERVER_URL, predict_real_data.FORECAST_SERVER_TIMEOUT = previous
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    print("🧪 Testing the forecasting server...")
+    test_forecast_matches_models()
+    print("✅ Warm models forecast like the sklearn models")
+    test_forecast_steps_are_bounded()
+    print("✅ Forecast steps are coarse and bounded")
+    test_trajectory_matches_rebuilt_history()
+    print("✅ Trajectory matches rebuilding the history")
+    test_states_resume_from_snapshot()
+    print("✅ Device states resume from the snapshot")
+    test_forecast_endpoint()
+    print("✅ Endpoint keeps the CLI's JSON shape")
+    test_cli_without_server()
+    print("✅ CLI shim works without a server")
+    test_client_does_not_repeat_slow_forecasts()
+    print("✅ CLI shim reports a slow server instead of forecasting again")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the request micro-batcher: concurrent callers share one vectorized
+call and each gets its own row back, a partial batch is flushed once the
+wait is over, and a failed batch fails every caller in it
+
+Run with: python test_micro_batcher.py   (or: python -m pytest test_micro_batcher.py)
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from micro_batcher import MicroBatcher
+
+def recording_predict(calls):
+    """Batch predict function that records each batch and returns ten times each item"""
+    def predict(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+    return predict
+
+def test_concurrent_calls_share_a_batch():
+    """Eight threads calling at once are answered by one call, each with its own result"""
+    calls = []
+    batcher = MicroBatcher(recording_predict(calls), max_batch_size=8, max_wait_ms=2000)
+    results = {}
+    start = threading.Barrier(8)
+
+    def caller(item):
+        start.wait()
+        results[item] = batcher.predict(item, timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(item,)) for item in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The batch filled up, so it ran without waiting out the two seconds
+    assert len(calls) == 1 and sorted(calls[0]) == list(range(8))
+    assert results == {item: item * 10 for item in range(8)}
+    stats = batcher.stats()
+    assert stats['batches'] == 1 and stats['batch_size']['buckets']['<=8'] == 1
+
+def test_partial_batch_flushes_after_wait():
+    """Fewer items than the batch size are run together once max_wait_ms has passed"""
+    calls = []
+    batcher = MicroBatcher(recording_predict(calls), max_batch_size=32, max_wait_ms=50)
+    started = time.perf_counter()
+    futures = [batcher.submit(item) for item in (1, 2, 3)]
+    assert [future.result(timeout=5) for future in futures] == [10, 20, 30]
+    assert time.perf_counter() - started >= 0.045
+    assert calls == [[1, 2, 3]]
+
+    # A lone later call is flushed on its own
+    assert batcher.predict(4, timeout=5) == 40
+    assert calls[-1] == [4] and batcher.stats()['batches'] == 2
+
+def test_failed_batch_fails_every_caller():
+    """An exception (or a wrong result count) reaches each caller of that batch"""
+    def broken(items):
+        return items[:-1]
+
+    batcher = MicroBatcher(broken, max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit(item) for item in (1, 2)]
+    for future in futures:
+        try:
+            future.result(timeout=5)
+            assert False, 'expected RuntimeError'
+        except RuntimeError as e:
+            assert '1 results for 2 items' in str(e)
+    assert batcher.stats()['failures'] == 1
+
+if __name__ == "__main__":
+    print("🧪 Testing the micro-batcher...")
+    test_concurrent_calls_share_a_batch()
+    print("✅ Concurrent calls share one batch")
+    test_partial_batch_flushes_after_wait()
+    print("✅ Partial batches are flushed after the wait")
+    test_failed_batch_fails_every_caller()
+    print("✅ A failed batch fails every caller")
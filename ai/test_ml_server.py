@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test the ML server's model engine: ML responses whose risk and advice
+follow the model's status, and /admin/reload (token check, a failed load
+keeps the previous snapshot, a reload moves cache keys to a new generation)
+
+Run with: python test_ml_server.py   (or: python -m pytest test_ml_server.py)
+"""
+
+import sys
+import os
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ml_server
+import model_registry
+from features import POTABILITY_COLUMNS, potability_matrix
+
+def fit_models(potable_below=500.0, seed=0):
+    """Small classifier / score regressor calling readings under potable_below ppm TDS potable"""
+    rng = np.random.default_rng(seed)
+    tds = rng.uniform(50, 1500, 400)
+    turbidity = rng.uniform(0.1, 3.0, 400)
+    X = pd.DataFrame(potability_matrix(tds, turbidity, 25.0), columns=POTABILITY_COLUMNS)
+    potable = tds < potable_below
+    classifier = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=seed)
+    classifier.fit(X, np.where(potable, 'Potable', 'Not Potable'))
+    regressor = RandomForestRegressor(n_estimators=10, max_depth=4, random_state=seed)
+    regressor.fit(X, np.where(potable, 90.0, 25.0))
+    return classifier, regressor
+
+def server_state():
+    """Server and registry globals the tests replace"""
+    return (ml_server.CLASSIFIER_MODEL_FILE, ml_server.SCORE_REGRESSOR_MODEL_FILE, ml_server.ADMIN_TOKEN,
+            ml_server.current_models, model_registry.MODEL_REGISTRY_DIR)
+
+def restore_server(state):
+    """Put back the globals saved by server_state(), dropping responses cached from the test models"""
+    (ml_server.CLASSIFIER_MODEL_FILE, ml_server.SCORE_REGRESSOR_MODEL_FILE, ml_server.ADMIN_TOKEN,
+     ml_server.current_models, model_registry.MODEL_REGISTRY_DIR) = state
+    ml_server.prediction_cache.clear()
+
+def serve_models(classifier, regressor, directory=None):
+    """Write the models to a temp dir (outside any registry) and load them into the server"""
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    directory = directory or tempfile.mkdtemp()
+    ml_server.CLASSIFIER_MODEL_FILE = os.path.join(directory, 'potability_classifier.pkl')
+    ml_server.SCORE_REGRESSOR_MODEL_FILE = os.path.join(directory, 'potability_score_regressor.pkl')
+    joblib.dump(classifier, ml_server.CLASSIFIER_MODEL_FILE)
+    joblib.dump(regressor, ml_server.SCORE_REGRESSOR_MODEL_FILE)
+    assert ml_server.load_models()
+    return directory
+
+def test_ml_response_follows_model_status():
+    """Where model and rules disagree, risk and advice describe the model's status"""
+    state = server_state()
+    try:
+        serve_models(*fit_models(potable_below=200.0))
+
+        # Rules: potable; model: not potable
+        result = ml_server.get_potability_recommendation(350.0, 0.5, engine='ml')
+        assert result['potability_status'] == 'Not Potable' and result['risk_level'] == 'High'
+        assert 'NOT potable' in result['recommendation'] and result['action_required'] != 'None'
+        assert result['who_compliance']['overall_compliant']
+
+        # Both agree: the rule ladder's specific advice is kept
+        result = ml_server.get_potability_recommendation(900.0, 0.5, engine='ml')
+        rules = ml_server.get_potability_recommendation(900.0, 0.5)
+        assert result['potability_status'] == rules['potability_status'] == 'Not Potable'
+        assert result['recommendation'] == rules['recommendation']
+
+        # The batch path agrees with the single-reading path
+        batch = ml_server.get_potability_recommendations_batch([350.0, 100.0], [0.5, 0.5], [25.0, 25.0], [7.0, 7.0],
+                                                               engine='ml')
+        assert batch[0]['risk_level'] == 'High' and batch[1]['potability_status'] == 'Potable'
+        assert batch[1]['recommendation'] == 'Water is POTABLE. No immediate action needed.'
+    finally:
+        restore_server(state)
+
+def cached_generations():
+    """Model generations held in the response cache's keys"""
+    return {key[1] for key in ml_server.prediction_cache._entries}
+
+def test_admin_reload_requires_token():
+    """Reload is refused while disabled and with a missing or wrong token"""
+    state = server_state()
+    try:
+        serve_models(*fit_models())
+        client = ml_server.app.test_client()
+        generation = ml_server.current_models['generation']
+
+        ml_server.ADMIN_TOKEN = ''
+        assert client.post('/admin/reload', headers={'X-Admin-Token': 'anything'}).status_code == 403
+
+        ml_server.ADMIN_TOKEN = 'secret'
+        assert client.post('/admin/reload').status_code == 401
+        assert client.post('/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+        assert ml_server.current_models['generation'] == generation
+    finally:
+        restore_server(state)
+
+def test_admin_reload_swaps_snapshot():
+    """A failed load keeps serving the previous snapshot; a good one bumps the cache generation"""
+    state = server_state()
+    try:
+        directory = serve_models(*fit_models())
+        client = ml_server.app.test_client()
+        ml_server.ADMIN_TOKEN = 'secret'
+        headers = {'X-Admin-Token': 'secret'}
+
+        snapshot = ml_server.current_models
+        ml_server.cached_recommendation(350.0, 0.5)
+        assert cached_generations() == {snapshot['generation']}
+
+        # A corrupt classifier file: the reload fails and nothing changes
+        with open(ml_server.CLASSIFIER_MODEL_FILE, 'wb') as f:
+            f.write(b'not a model')
+        response = client.post('/admin/reload', headers=headers)
+        assert response.status_code == 500 and response.get_json()['generation'] == snapshot['generation']
+        assert ml_server.current_models is snapshot
+        assert ml_server.current_models['classifier'] is not None
+
+        # New models: the generation moves on and cached results are keyed on it
+        serve_models(*fit_models(potable_below=300.0, seed=1), directory=directory)
+        response = client.post('/admin/reload', headers=headers)
+        body = response.get_json()
+        assert response.status_code == 200 and body['generation'] == body['previous_generation'] + 1
+        assert cached_generations() == set()
+        ml_server.cached_recommendation(350.0, 0.5)
+        assert cached_generations() == {body['generation']}
+    finally:
+        restore_server(state)
+
+if __name__ == "__main__":
+    print("🧪 Testing the ML server engine...")
+    test_ml_response_follows_model_status()
+    print("✅ ML responses follow the model's status")
+    test_admin_reload_requires_token()
+    print("✅ /admin/reload rejects missing and wrong tokens")
+    test_admin_reload_swaps_snapshot()
+    print("✅ Failed reloads keep the previous models; good ones bump the generation")
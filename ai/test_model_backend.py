@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test the boosting backends: both build, the hist backend trains and saves
+the turbidity forecast and potability score models (missing values and
+all), and add_boosting_stages warm-starts either kind
+
+Run with: python test_model_backend.py   (or: python -m pytest test_model_backend.py)
+"""
+
+import sys
+import os
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_backend
+import model_registry
+import train_with_real_data as forecast_training
+import train_with_real_db_data as potability_training
+
+def turbidity_frame(n_rows=600, seed=7):
+    """Turbidity readings shaped like the database table, one a minute"""
+    rng = np.random.default_rng(seed)
+    ntu = 2.0 + np.sin(np.arange(n_rows) / 30) + rng.normal(0, 0.1, n_rows)
+    return pd.DataFrame({
+        'ntu_value': ntu,
+        'analog_value': ntu * 300,
+        'voltage': rng.uniform(2.0, 2.2, n_rows),
+        'reading_time': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(n_rows), unit='min')
+    })
+
+def test_backends_build():
+    """Each backend name builds its regressor; an unknown one is refused"""
+    assert isinstance(model_backend.boosting_regressor('gb'), GradientBoostingRegressor)
+    assert isinstance(model_backend.boosting_regressor('hist'), HistGradientBoostingRegressor)
+    assert model_backend.handles_missing_values('hist') and not model_backend.handles_missing_values('gb')
+    try:
+        model_backend.boosting_regressor('xgb')
+        assert False, 'expected ValueError'
+    except ValueError as e:
+        assert 'xgb' in str(e)
+
+def test_hist_backend_trains_and_saves():
+    """MODEL_BACKEND=hist trains, reports and saves the turbidity and score models"""
+    previous = (model_backend.MODEL_BACKEND, model_registry.MODEL_REGISTRY_DIR, os.getcwd())
+    model_backend.MODEL_BACKEND = 'hist'
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    os.chdir(tempfile.mkdtemp())  # Model files are written to the working directory
+    try:
+        assert forecast_training.train_turbidity_model_with_real_data(turbidity_frame())
+        assert isinstance(joblib.load(forecast_training.TURBIDITY_MODEL_FILE), HistGradientBoostingRegressor)
+
+        data = potability_training.create_potability_labels(*potability_training.synthetic_sensor_frames(600))
+        data.loc[data.index[::10], 'temperature'] = np.nan  # Left missing on the hist backend
+        assert potability_training.train_potability_score_regressor_with_real_data(data)
+        assert isinstance(joblib.load(potability_training.REGRESSOR_FILE), HistGradientBoostingRegressor)
+    finally:
+        model_backend.MODEL_BACKEND, model_registry.MODEL_REGISTRY_DIR, previous_dir = previous
+        os.chdir(previous_dir)
+
+def test_add_boosting_stages():
+    """Warm start adds rounds to either backend and keeps the fitted ones"""
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, (300, 3))
+    y = X[:, 0] * 10 + rng.normal(0, 0.1, 300)
+    for backend in model_backend.BACKENDS:
+        model = model_backend.boosting_regressor(backend)
+        model.set_params(**({'max_iter': 10} if backend == 'hist' else {'n_estimators': 10}))
+        model.fit(X, y)
+        first = model.estimators_[0, 0].tree_.threshold.copy() if backend == 'gb' else None
+
+        model_backend.add_boosting_stages(model, 5)
+        model.fit(X, y)
+        assert model_backend.boosting_stages(model) == 15
+        if backend == 'gb':
+            assert np.array_equal(model.estimators_[0, 0].tree_.threshold, first)
+
+if __name__ == "__main__":
+    print("🧪 Testing the boosting backends...")
+    test_backends_build()
+    print("✅ Both backends build")
+    test_hist_backend_trains_and_saves()
+    print("✅ The hist backend trains and saves the turbidity and score models")
+    test_add_boosting_stages()
+    print("✅ add_boosting_stages warm-starts both backends")
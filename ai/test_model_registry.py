@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test the model registry: versioned artifacts with manifests, compressed and
+mmap variants that predict like the original, CURRENT promotion and
+pruning, and the server serving (and reporting) the current version
+
+Run with: python test_model_registry.py   (or: python -m pytest test_model_registry.py)
+"""
+
+import sys
+import os
+import json
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LinearRegression
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_registry
+
+def use_temporary_registry():
+    """Point the registry at an empty directory; returns the previous location"""
+    previous = model_registry.MODEL_REGISTRY_DIR
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    return previous
+
+def fitted_models():
+    """A small forest and a linear model trained on named features"""
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame(rng.uniform(0, 10, (200, 3)), columns=['tds_value', 'turbidity_value', 'temperature'])
+    y = (X['tds_value'] > 5).map({True: 'Not Potable', False: 'Potable'})
+    forest = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+    linear = LinearRegression().fit(X, X['tds_value'] * 2)
+    return forest, linear, X
+
+def test_register_load_and_variants():
+    """Manifest records the artifacts; both variants predict like the original"""
+    previous = use_temporary_registry()
+    try:
+        forest, linear, X = fitted_models()
+        times = pd.date_range('2024-05-01', periods=len(X), freq='h')
+        manifest = model_registry.register(forest, 'classifier', window=model_registry.training_window(times),
+                                           metrics={'accuracy': 0.97})
+        assert model_registry.current_version('classifier') == manifest['version']
+        assert manifest['features'] == ['tds_value', 'turbidity_value', 'temperature']
+        assert manifest['training_window']['rows'] == len(X)
+        assert manifest['artifacts']['mmap']['format'] == 'compiled'
+
+        directory = os.path.join(model_registry.model_dir('classifier'), manifest['version'])
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            assert json.load(f) == manifest
+        for artifact in manifest['artifacts'].values():
+            path = os.path.join(directory, artifact['file'])
+            assert os.path.getsize(path) == artifact['size_bytes']
+            assert model_registry.sha256_file(path) == artifact['sha256']
+
+        expected = forest.predict_proba(X)
+        compressed, _ = model_registry.load('classifier')
+        mapped, _ = model_registry.load('classifier', variant='mmap')
+        assert np.allclose(compressed.predict_proba(X), expected)
+        assert np.allclose(mapped.predict_proba(X.to_numpy()), expected)
+        assert isinstance(mapped.feature, np.memmap)
+
+        # Models the tree compiler does not handle get a plain uncompressed pickle
+        linear_manifest = model_registry.register(linear, 'regressor')
+        assert linear_manifest['artifacts']['mmap']['format'] == 'joblib'
+        mapped_linear, _ = model_registry.load('regressor', variant='mmap')
+        assert np.allclose(mapped_linear.predict(X), linear.predict(X))
+    finally:
+        model_registry.MODEL_REGISTRY_DIR = previous
+
+def test_promote_prune_and_verify():
+    """Rollback via CURRENT, pruning keeps the current version, tampering is caught"""
+    previous = use_temporary_registry()
+    try:
+        forest, _, _ = fitted_models()
+        first = model_registry.register(forest, 'classifier')['version']
+        second = model_registry.register(forest, 'classifier')['version']
+        third = model_registry.register(forest, 'classifier')['version']
+        assert model_registry.versions('classifier') == [first, second, third]
+
+        model_registry.set_current('classifier', first)
+        model_registry.prune('classifier', keep=1)
+        assert model_registry.versions('classifier') == [first, third]
+        assert model_registry.load('classifier')[1]['version'] == first
+
+        path = os.path.join(model_registry.model_dir('classifier'), first, 'model.pkl.z')
+        with open(path, 'ab') as f:
+            f.write(b'tampered')
+        try:
+            model_registry.load('classifier')
+            assert False, 'tampered artifact loaded'
+        except ValueError:
+            pass
+    finally:
+        model_registry.MODEL_REGISTRY_DIR = previous
+
+def test_server_serves_current_version():
+    """ml_server loads the CURRENT version and reports its metadata in ai_info"""
+    import ml_server
+
+    previous = use_temporary_registry()
+    try:
+        classifier_path, regressor_path = ml_server.model_paths()
+        classifier = model_registry.register(joblib.load(classifier_path), 'potability_classifier',
+                                             metrics={'accuracy': 0.981})
+        regressor = model_registry.register(joblib.load(regressor_path), 'potability_score_regressor')
+
+        assert ml_server.load_models()
+        result = ml_server.get_potability_recommendation(350, 0.8)
+        assert result['ai_info']['model_version'] == classifier['version']
+        assert result['ai_info']['regressor_version'] == regressor['version']
+        assert result['ai_info']['accuracy'] == '98.1%'
+        assert ml_server.status_payload()['models']['sources']['classifier']['registry']
+    finally:
+        model_registry.MODEL_REGISTRY_DIR = previous
+        ml_server.load_models()
+    # Unregistered models still load from their plain files
+    assert ml_server.current_models['info']['model_version'] == 'unregistered'
+
+if __name__ == "__main__":
+    print("🧪 Testing the model registry...")
+    test_register_load_and_variants()
+    print("✅ Versions, manifests and variants")
+    test_promote_prune_and_verify()
+    print("✅ Promote, prune and verify")
+    test_server_serves_current_version()
+    print("✅ Server serves the current version")
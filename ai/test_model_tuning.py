@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test hyperparameter tuning: forward-chaining folds for the forecast models,
+the params file next to the model file and its pickup by the build
+functions, and repeated searches served from the on-disk cache
+
+Run with: python test_model_tuning.py   (or: python -m pytest test_model_tuning.py)
+"""
+
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_tuning
+import train_with_real_data
+import train_with_real_db_data
+
+def test_chronological_folds_train_on_the_past():
+    """Every time-series fold scores rows that come after all of its training rows"""
+    y = pd.Series(np.arange(100.0))
+    folds = model_tuning.fold_indices(y, 'chronological', n_splits=4)
+    assert len(folds) == 4
+    for train, test in folds:
+        assert train.max() < test.min()
+    assert model_tuning.fold_indices(y[:5], 'chronological', n_splits=4) is None
+
+def test_tuned_params_written_cached_and_applied():
+    """Tuning writes the params file, build_tds_model uses it, a repeat run is cached"""
+    previous_dir = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    saved = model_tuning.TUNING_CANDIDATES, model_tuning.TUNING_FOLDS, model_tuning.TUNING_CACHE_DIR
+    model_tuning.TUNING_CANDIDATES, model_tuning.TUNING_FOLDS = 3, 3
+    model_tuning.TUNING_CACHE_DIR = os.path.join(os.getcwd(), 'tuning_cache')
+    try:
+        sensor_data = train_with_real_db_data.synthetic_sensor_frames(400)
+        window = train_with_real_data.TRAINING_HISTORY_DAYS
+        train_with_real_data.TRAINING_HISTORY_DAYS = 0  # The synthetic readings are from 2024
+        try:
+            records = model_tuning.tune_models(['tds_model'], sensor_data=sensor_data)
+            again = model_tuning.tune_models(['tds_model'], sensor_data=sensor_data)
+        finally:
+            train_with_real_data.TRAINING_HISTORY_DAYS = window
+
+        with open('tds_model_real.params.json') as f:
+            record = json.load(f)
+        assert record['estimator'] == 'RandomForestRegressor'
+        assert record['cv'] == 'TimeSeriesSplit(n_splits=3)'
+        assert record['candidates'][0] == 3
+        assert again[0]['params'] == records[0]['params']
+        assert again[0]['search_seconds'] == records[0]['search_seconds']  # Served from the cache
+
+        model = train_with_real_data.build_tds_model()
+        for key, value in record['params'].items():
+            assert model.get_params()[key] == value
+        # Parameters tuned for another estimator type are not applied
+        assert model_tuning.apply_tuned_params(train_with_real_data.build_turbidity_model(),
+                                               'tds_model_real.pkl').get_params()['max_depth'] == 8
+    finally:
+        model_tuning.TUNING_CANDIDATES, model_tuning.TUNING_FOLDS, model_tuning.TUNING_CACHE_DIR = saved
+        os.chdir(previous_dir)
+
+if __name__ == "__main__":
+    print("🧪 Testing hyperparameter tuning...")
+    test_chronological_folds_train_on_the_past()
+    print("✅ Time-series folds train on the past only")
+    test_tuned_params_written_cached_and_applied()
+    print("✅ Tuned parameters written, cached and applied")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the prediction response cache: least recently used entries are evicted
+first, entries expire after the TTL, and the server's keys move to a new
+model generation after a reload
+
+Run with: python test_prediction_cache.py   (or: python -m pytest test_prediction_cache.py)
+"""
+
+import sys
+import os
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prediction_cache import PredictionCache
+
+def test_lru_eviction():
+    """A full cache drops the entry used longest ago, not the oldest stored"""
+    cache = PredictionCache(maxsize=2, ttl=0)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['size'] == 2 and stats['evictions'] == 1
+
+    # maxsize 0 stores nothing
+    disabled = PredictionCache(maxsize=0)
+    disabled.put('a', 1)
+    assert disabled.get('a') is None and not disabled.stats()['enabled']
+
+def test_ttl_expiry():
+    """Entries older than the TTL are misses and are dropped"""
+    cache = PredictionCache(maxsize=10, ttl=0.05)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['size'] == 0
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+def test_key_follows_model_generation():
+    """A new model generation misses entries of the old one, even if they were never cleared"""
+    import ml_server
+
+    snapshot = ml_server.current_models
+    ml_server.prediction_cache.clear()
+    try:
+        first = ml_server.cached_recommendation(350.0, 0.5)
+        misses = ml_server.prediction_cache.misses
+        assert ml_server.cached_recommendation(350.4, 0.5)['potability_status'] == first['potability_status']
+        assert ml_server.prediction_cache.misses == misses
+
+        # Swap in a new generation without clearing the cache, as a reload racing a request could
+        ml_server.current_models = dict(snapshot, generation=snapshot['generation'] + 1)
+        ml_server.cached_recommendation(350.0, 0.5)
+        assert ml_server.prediction_cache.misses == misses + 1
+        generations = {key[1] for key in ml_server.prediction_cache._entries}
+        assert generations == {snapshot['generation'], snapshot['generation'] + 1}
+    finally:
+        ml_server.current_models = snapshot
+        ml_server.prediction_cache.clear()
+
+if __name__ == "__main__":
+    print("🧪 Testing the prediction cache...")
+    test_lru_eviction()
+    print("✅ Least recently used entries are evicted first")
+    test_ttl_expiry()
+    print("✅ Entries expire after the TTL")
+    test_key_follows_model_generation()
+    print("✅ Cache keys follow the model generation")
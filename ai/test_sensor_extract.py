@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test chunked sensor extraction against an in-memory SQLite stand-in
+for the tds_readings / turbidity_readings tables
+
+Run with: python test_sensor_extract.py   (or: python -m pytest test_sensor_extract.py)
+"""
+
+import sys
+import os
+import sqlite3
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sensor_extract import iter_chunks, read_table
+
+START = datetime(2024, 1, 1)
+
+def make_database(n_rows=1000, seed=3):
+    """SQLite database with both sensor tables; several readings share a timestamp"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tds_readings (id INTEGER PRIMARY KEY, tds_value REAL, analog_value INTEGER, '
+                 'voltage REAL, temperature REAL, reading_time TEXT)')
+    conn.execute('CREATE TABLE turbidity_readings (id INTEGER PRIMARY KEY, ntu_value REAL, analog_value REAL, '
+                 'voltage REAL, raw_adc INTEGER, reading_time TEXT)')
+
+    # Every timestamp is used by up to three readings, inserted out of time order
+    times = [(START + timedelta(minutes=int(m))).strftime('%Y-%m-%d %H:%M:%S')
+             for m in rng.integers(0, n_rows // 3, n_rows)]
+    conn.executemany('INSERT INTO tds_readings (tds_value, analog_value, voltage, temperature, reading_time) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [(float(v), int(v * 2.5), 3.3, None if i % 10 == 0 else 25.0, t)
+                      for i, (v, t) in enumerate(zip(rng.uniform(0, 900, n_rows), times))])
+    conn.executemany('INSERT INTO turbidity_readings (ntu_value, analog_value, voltage, raw_adc, reading_time) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [(float(v), 1800.0, 2.1, None if i % 7 == 0 else 1800, t)
+                      for i, (v, t) in enumerate(zip(rng.uniform(0, 20, n_rows), times))])
+    conn.commit()
+    return conn
+
+def expected(conn, table, where='1=1', descending=False):
+    """Reference result: one unpaginated query"""
+    order = 'DESC' if descending else 'ASC'
+    return pd.read_sql(f'SELECT * FROM {table} WHERE {where} ORDER BY reading_time {order}, id {order}', conn)
+
+def test_chunks_cover_every_row_once_in_order():
+    """Pages never skip or repeat rows, even when readings share a timestamp"""
+    conn = make_database()
+    for descending in (False, True):
+        chunks = list(iter_chunks(conn, 'tds_readings', chunk_size=64, descending=descending))
+        assert all(len(chunk) <= 64 for chunk in chunks)
+        ids = pd.concat(chunks)['id'].tolist()
+        assert ids == expected(conn, 'tds_readings', descending=descending)['id'].tolist()
+
+def test_chunk_dtypes():
+    """Readings are float32, ADC counts int32 (NULL -> 0), times datetime64"""
+    conn = make_database()
+    tds = read_table(conn, 'tds_readings', chunk_size=100)
+    assert tds['tds_value'].dtype == np.float32
+    assert tds['analog_value'].dtype == np.int32
+    assert tds['temperature'].dtype == np.float32 and tds['temperature'].isna().any()
+    assert tds['reading_time'].dtype == 'datetime64[ns]'
+
+    turbidity = read_table(conn, 'turbidity_readings', columns=['ntu_value', 'raw_adc'], chunk_size=100)
+    assert list(turbidity.columns) == ['ntu_value', 'raw_adc', 'reading_time', 'id']
+    assert turbidity['raw_adc'].dtype == np.int32 and (turbidity['raw_adc'] == 0).any()
+
+def test_filters_and_limit():
+    """where/since/until/limit give the same rows as a single query"""
+    conn = make_database()
+    since, until = START + timedelta(minutes=50), START + timedelta(minutes=200)
+    frame = read_table(conn, 'tds_readings', where='tds_value > 300', since=since, until=until, chunk_size=17)
+    reference = expected(conn, 'tds_readings', where="tds_value > 300 AND reading_time >= '2024-01-01 00:50:00' "
+                                                     "AND reading_time < '2024-01-01 03:20:00'")
+    assert frame['id'].tolist() == reference['id'].tolist()
+
+    newest = read_table(conn, 'tds_readings', descending=True, limit=25, chunk_size=10)
+    assert newest['id'].tolist() == expected(conn, 'tds_readings', descending=True)['id'].tolist()[:25]
+
+    empty = read_table(conn, 'tds_readings', where='tds_value > 100000')
+    assert empty.empty and empty['tds_value'].dtype == np.float32
+
+if __name__ == "__main__":
+    print("🧪 Testing chunked sensor extraction...")
+    test_chunks_cover_every_row_once_in_order()
+    print("✅ Chunks cover every row once, in order")
+    test_chunk_dtypes()
+    print("✅ Chunk dtypes")
+    test_filters_and_limit()
+    print("✅ Filters and limit")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test the local columnar sensor store: incremental sync from an SQLite
+stand-in database, pruned reads back out of the store, and device_id
+returned from the device partitions
+
+Run with: python test_sensor_store.py   (or: python -m pytest test_sensor_store.py)
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sensor_store
+
+START = datetime(2024, 1, 1)
+
+def make_database():
+    """Empty SQLite copies of both sensor tables (turbidity has a device_id)"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tds_readings (id INTEGER PRIMARY KEY, tds_value REAL, analog_value INTEGER, '
+                 'voltage REAL, temperature REAL, reading_time TEXT)')
+    conn.execute('CREATE TABLE turbidity_readings (id INTEGER PRIMARY KEY, device_id TEXT, ntu_value REAL, '
+                 'analog_value REAL, voltage REAL, raw_adc INTEGER, reading_time TEXT)')
+    return conn
+
+def insert_readings(conn, minutes, seed):
+    """One TDS and one turbidity reading at each START + minute offset"""
+    rng = np.random.default_rng(seed)
+    times = [(START + timedelta(minutes=int(m))).strftime('%Y-%m-%d %H:%M:%S') for m in minutes]
+    conn.executemany('INSERT INTO tds_readings (tds_value, analog_value, voltage, temperature, reading_time) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [(float(v), int(v * 2.5), 3.3, 25.0, t) for v, t in zip(rng.uniform(-50, 900, len(times)), times)])
+    conn.executemany('INSERT INTO turbidity_readings (device_id, ntu_value, analog_value, voltage, raw_adc, reading_time) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     [(f'SENSOR_00{i % 2}', float(v), 1800.0, 2.1, 1800, t)
+                      for i, (v, t) in enumerate(zip(rng.uniform(0, 20, len(times)), times))])
+    conn.commit()
+
+def database_rows(conn, table):
+    """Reference copy of a table straight from the database, by time then id"""
+    frame = pd.read_sql(f'SELECT * FROM {table} ORDER BY reading_time, id', conn)
+    frame['reading_time'] = pd.to_datetime(frame['reading_time'])
+    return frame
+
+def use_temporary_store():
+    """Point the store at a fresh temporary directory"""
+    sensor_store.STORE_DIR = tempfile.mkdtemp(prefix='sensor_store_')
+
+def test_incremental_sync_matches_database():
+    """A second sync fetches only new rows, including back-dated ones"""
+    use_temporary_store()
+    conn = make_database()
+    insert_readings(conn, range(0, 3 * 1440, 7), seed=1)  # three days
+
+    first = sensor_store.sync(conn, chunk_size=50)
+    assert first['tds_readings'] == len(range(0, 3 * 1440, 7))
+
+    # New readings today plus a late upload stamped on the first day
+    insert_readings(conn, list(range(3 * 1440, 4 * 1440, 11)) + [5], seed=2)
+    second = sensor_store.sync(conn, chunk_size=50)
+    assert second['tds_readings'] == len(range(3 * 1440, 4 * 1440, 11)) + 1
+    assert sensor_store.sync(conn) == {'tds_readings': 0, 'turbidity_readings': 0}
+
+    for table in sensor_store.TABLES:
+        stored = sensor_store.read(table, columns=['id', 'reading_time'])
+        expected = database_rows(conn, table)
+        assert stored['id'].tolist() == expected['id'].tolist(), table
+
+    status = sensor_store.status()
+    assert status['tds_readings']['partitions'] == 4
+    assert status['turbidity_readings']['partitions'] == 8  # 4 days x 2 devices
+
+def test_pruned_reads():
+    """Column, day, device and newest-N reads give the same rows as the database"""
+    use_temporary_store()
+    conn = make_database()
+    insert_readings(conn, range(0, 5 * 1440, 13), seed=3)
+    sensor_store.sync(conn)
+    expected = database_rows(conn, 'turbidity_readings')
+
+    since, until = START + timedelta(days=1, hours=6), START + timedelta(days=3)
+    window = sensor_store.read('turbidity_readings', columns=['ntu_value'], since=since, until=until)
+    assert list(window.columns) == ['ntu_value']
+    assert window['ntu_value'].dtype == np.float32
+    reference = expected[(expected['reading_time'] >= since) & (expected['reading_time'] < until)]
+    assert np.allclose(window['ntu_value'], reference['ntu_value'].astype(np.float32))
+
+    one_device = sensor_store.read('turbidity_readings', columns=['id'], devices=['SENSOR_001'])
+    assert one_device['id'].tolist() == expected[expected['device_id'] == 'SENSOR_001']['id'].tolist()
+
+    newest = sensor_store.read('turbidity_readings', columns=['id', 'reading_time'], last=30)
+    assert newest['id'].tolist() == expected['id'].tolist()[-30:]
+
+def test_fetch_readings_with_and_without_store():
+    """fetch_readings() returns the same frame from the store and from the database"""
+    use_temporary_store()
+    conn = make_database()
+    insert_readings(conn, range(0, 2 * 1440, 5), seed=4)
+    columns = ['tds_value', 'analog_value', 'voltage', 'reading_time']
+    since = START + timedelta(hours=30)
+
+    results = []
+    for enabled in (True, False):
+        sensor_store.STORE_ENABLED = enabled
+        results.append(sensor_store.fetch_readings(conn, 'tds_readings', columns, positive='tds_value',
+                                                   since=since, last=20))
+    sensor_store.STORE_ENABLED = True
+
+    from_store, from_database = results
+    assert len(from_store) == 20 and (from_store['tds_value'] > 0).all()
+    pd.testing.assert_frame_equal(from_store, from_database)
+
+def test_device_id_from_partitions():
+    """device_id comes back from the partition names, as the database has it, for tables that have one"""
+    use_temporary_store()
+    conn = make_database()
+    insert_readings(conn, range(0, 1440, 5), seed=5)
+    conn.execute('UPDATE turbidity_readings SET device_id = NULL WHERE id % 10 = 0')
+    conn.commit()
+    columns = ['ntu_value', 'reading_time']
+
+    results = []
+    for enabled in (True, False):
+        sensor_store.STORE_ENABLED = enabled
+        results.append(sensor_store.fetch_readings(conn, 'turbidity_readings', columns, with_device=True))
+    sensor_store.STORE_ENABLED = True
+
+    from_store, from_database = results
+    pd.testing.assert_frame_equal(from_store, from_database)
+    assert set(from_store['device_id'].dropna()) == {'SENSOR_000', 'SENSOR_001'}
+    assert from_store['device_id'].isna().sum() == len(from_store) // 10
+
+    # Tables without device_id are returned without it
+    tds = sensor_store.fetch_readings(conn, 'tds_readings', ['tds_value', 'reading_time'], with_device=True)
+    assert 'device_id' not in tds.columns
+    empty = sensor_store.read('turbidity_readings', ['id', 'device_id'], since=START + timedelta(days=30))
+    assert list(empty.columns) == ['id', 'device_id'] and len(empty) == 0
+
+if __name__ == "__main__":
+    print("🧪 Testing the local sensor store...")
+    test_incremental_sync_matches_database()
+    print("✅ Incremental sync matches the database")
+    test_pruned_reads()
+    print("✅ Pruned reads")
+    test_fetch_readings_with_and_without_store()
+    print("✅ Store and database reads agree")
+    test_device_id_from_partitions()
+    print("✅ device_id comes back from the partitions")
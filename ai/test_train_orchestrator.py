@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test the training orchestrator's job runner: every model is fitted in its
+own worker process, also with a single worker, so each reported peak RSS
+is that model's own, and the workers register models in the parent's
+registry directory
+
+Run with: python test_train_orchestrator.py   (or: python -m pytest test_train_orchestrator.py)
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_registry
+import train_orchestrator
+
+def linear_jobs(directory, count=3):
+    """count small linear-regression jobs on one shared feature file"""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'a': rng.normal(size=200), 'b': rng.normal(size=200)})
+    features = train_orchestrator.save_features(directory, 'linear', X, {'target': 2 * X['a'] - X['b']})
+    return [{'name': f'linear_{i}', 'build': LinearRegression, 'kwargs': {}, 'features': features,
+             'target': 'target', 'split': 'random', 'output': os.path.join(directory, f'linear_{i}.pkl')}
+            for i in range(count)]
+
+def test_single_worker_fits_each_model_in_its_own_process():
+    """One worker still starts a fresh process per model, registering where the parent points"""
+    previous = model_registry.MODEL_REGISTRY_DIR
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    try:
+        reports = train_orchestrator.run_jobs(linear_jobs(tempfile.mkdtemp()), workers=1)
+        assert sorted(os.listdir(model_registry.MODEL_REGISTRY_DIR)) == ['linear_0', 'linear_1', 'linear_2']
+    finally:
+        model_registry.MODEL_REGISTRY_DIR = previous
+    assert len(reports) == 3 and not any('error' in report for report in reports)
+    pids = {report['pid'] for report in reports}
+    assert len(pids) == 3 and os.getpid() not in pids
+    assert all(report['r2'] > 0.99 for report in reports)
+
+if __name__ == "__main__":
+    print("🧪 Testing the training orchestrator...")
+    test_single_worker_fits_each_model_in_its_own_process()
+    print("✅ Each model is fitted in its own process")
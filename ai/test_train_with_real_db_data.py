@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Test the real-data potability training: TDS readings are labeled from the
+nearest turbidity reading within the match tolerance, of the same device
+when both tables record one, and an incremental run adds trees and boosting
+stages to the saved models (the full forest, not its compacted serving
+copy), also from a window of one class, and records a new generation
+
+Run with: python test_train_with_real_db_data.py   (or: python -m pytest test_train_with_real_db_data.py)
+"""
+
+import sys
+import os
+import json
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_registry
+import train_with_real_db_data as training
+
+def frames(tds_rows, turbidity_rows):
+    """TDS / turbidity frames from (minutes, value[, device]) tuples, newest first like the queries"""
+    start = pd.Timestamp('2024-01-01 08:00')
+
+    def frame(rows, value_column):
+        data = {
+            value_column: [row[1] for row in rows],
+            'reading_time': [start + pd.Timedelta(minutes=row[0]) for row in rows]
+        }
+        if rows and len(rows[0]) > 2:
+            data['device_id'] = [row[2] for row in rows]
+        return pd.DataFrame(data).iloc[::-1].reset_index(drop=True)
+
+    return frame(tds_rows, 'tds_value'), frame(turbidity_rows, 'ntu_value')
+
+def test_nearest_reading_within_tolerance():
+    """The closest turbidity reading on either side labels a TDS reading; none in the window, no label"""
+    tolerance = int(training.MATCH_TOLERANCE.total_seconds() // 60)
+    tds_data, turbidity_data = frames(
+        [(0, 300.0), (30, 300.0), (100, 300.0), (100 + tolerance + 200, 300.0)],
+        [(-50, 9.0), (5, 0.5), (35, 0.8), (100 + tolerance, 0.2)])
+    labeled = training.create_potability_labels(tds_data, turbidity_data)
+
+    by_time = dict(zip(labeled['reading_time'], labeled['turbidity_value']))
+    start = pd.Timestamp('2024-01-01 08:00')
+    assert by_time[start] == 0.5                                   # 5 min later beats 50 min earlier
+    assert by_time[start + pd.Timedelta(minutes=30)] == 0.8         # nearest, not the first in the window
+    assert by_time[start + pd.Timedelta(minutes=100)] == 0.2        # exactly at the tolerance still matches
+    assert len(labeled) == 3                                        # nothing within the window: no label
+    assert list(labeled['potability_status']) == ['Potable'] * 3
+
+    # No pair at all: the caller falls back to demo data
+    far_tds, far_turbidity = frames([(0, 300.0)], [(tolerance + 1, 0.5)])
+    assert training.create_potability_labels(far_tds, far_turbidity) is None
+
+def test_readings_pair_within_a_device():
+    """With device_id on both tables a reading never borrows another device's turbidity"""
+    tds_data, turbidity_data = frames(
+        [(0, 300.0, 'SENSOR_001'), (0, 300.0, 'SENSOR_002'), (12, 300.0, 'SENSOR_003')],
+        [(1, 8.0, 'SENSOR_001'), (20, 0.4, 'SENSOR_001'), (30, 0.6, 'SENSOR_002')])
+    labeled = training.create_potability_labels(tds_data, turbidity_data)
+
+    # SENSOR_001 takes its own nearest reading, SENSOR_002 its only one, SENSOR_003 has none
+    assert sorted(labeled['turbidity_value']) == [0.6, 8.0]
+    assert sorted(labeled['potability_status']) == ['Not Potable', 'Potable']
+
+    # Without device_id on the turbidity table every reading pairs by time alone
+    labeled = training.create_potability_labels(tds_data, turbidity_data.drop(columns='device_id'))
+    assert sorted(labeled['turbidity_value']) == [0.4, 8.0, 8.0]
+
+def test_incremental_run_extends_saved_models():
+    """Warm start keeps the saved trees and stages, adds new ones and records the generation"""
+    tds_data, turbidity_data = training.synthetic_sensor_frames(1000, seed=3)
+    cutoff = pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=700)
+    previous = (model_registry.MODEL_REGISTRY_DIR, os.getcwd())
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    os.chdir(tempfile.mkdtemp())  # Model and generation files are written to the working directory
+    try:
+        # A full generation trained on the first 700 minutes
+        data = training.create_potability_labels(tds_data[tds_data['reading_time'] < cutoff],
+                                                 turbidity_data[turbidity_data['reading_time'] < cutoff])
+        X = data[training.prepare_features(data)]
+        classifier = training.build_potability_classifier(n_jobs=1).set_params(n_estimators=30)
+        classifier.fit(X, data['potability_status'])
+        regressor = training.build_potability_score_regressor().set_params(n_estimators=30)
+        regressor.fit(X, data['potability_score'])
+        joblib.dump(classifier, training.CLASSIFIER_FILE)
+        joblib.dump(regressor, training.REGRESSOR_FILE)
+        history = training.load_generations()
+        assert training.record_full_generation(history, data) == 1
+
+        # The incremental run sees every reading but trains on the newer ones only
+        outcome = training.train_incremental(training.load_generations(), sensor_data=(tds_data, turbidity_data))
+        assert outcome == 'trained'
+        extended_classifier = joblib.load(training.CLASSIFIER_FOREST_FILE)
+        extended_regressor = joblib.load(training.REGRESSOR_FILE)
+        assert len(extended_classifier.estimators_) == 30 + training.INCREMENT_TREES
+        assert len(extended_regressor.estimators_) == 30 + training.INCREMENT_STAGES
+        for old, kept in zip(classifier.estimators_, extended_classifier.estimators_):
+            assert np.array_equal(old.tree_.threshold, kept.tree_.threshold)
+        for old, kept in zip(regressor.estimators_[:, 0], extended_regressor.estimators_[:, 0]):
+            assert np.array_equal(old.tree_.threshold, kept.tree_.threshold)
+
+        with open(training.GENERATIONS_FILE) as f:
+            history = json.load(f)
+        full, incremental = history['generations']
+        assert full['mode'] == 'full' and incremental['mode'] == 'incremental'
+        assert incremental['generation'] == 2 and incremental['data_start'] > full['data_end']
+        assert incremental['classifier_trees'] == 50 and incremental['regressor_stages'] == 50
+        assert incremental['rows'] < full['rows']
+        assert history['tree_generations'] == [1] * 30 + [2] * training.INCREMENT_TREES
+
+        # Nothing new since: the models and the record stay as they are
+        assert training.train_incremental(history, sensor_data=(tds_data, turbidity_data)) == 'skipped'
+        assert len(training.load_generations()['generations']) == 2
+    finally:
+        model_registry.MODEL_REGISTRY_DIR, previous_dir = previous
+        os.chdir(previous_dir)
+
+def test_incremental_run_extends_the_full_forest():
+    """A compacted full run keeps its full forest; the next run grows that at full depth and re-compacts"""
+    tds_data, turbidity_data = training.synthetic_sensor_frames(3000, seed=4)
+    cutoff = pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=2400)
+    previous = (model_registry.MODEL_REGISTRY_DIR, os.getcwd())
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    os.chdir(tempfile.mkdtemp())
+    try:
+        data = training.create_potability_labels(tds_data[tds_data['reading_time'] < cutoff],
+                                                 turbidity_data[turbidity_data['reading_time'] < cutoff])
+        assert training.train_potability_classifier_with_real_data(data)
+        assert training.train_potability_score_regressor_with_real_data(data)
+        training.record_full_generation(training.load_generations(), data)
+        served = joblib.load(training.CLASSIFIER_FILE)
+        forest = joblib.load(training.CLASSIFIER_FOREST_FILE)
+        assert len(served.estimators_) < len(forest.estimators_) == 200
+        assert forest.max_depth == training.build_potability_classifier().max_depth
+
+        outcome = training.train_incremental(training.load_generations(), sensor_data=(tds_data, turbidity_data))
+        assert outcome == 'trained'
+        extended = joblib.load(training.CLASSIFIER_FOREST_FILE)
+        assert len(extended.estimators_) == training.MAX_FOREST_TREES  # 20 added, the 20 oldest retired
+        assert all(tree.max_depth == forest.max_depth for tree in extended.estimators_)
+        assert len(joblib.load(training.CLASSIFIER_FILE).estimators_) < len(extended.estimators_)
+
+        history = training.load_generations()
+        assert history['tree_generations'].count(2) == training.INCREMENT_TREES
+        assert history['generations'][-1]['classifier_trees'] == training.MAX_FOREST_TREES
+    finally:
+        model_registry.MODEL_REGISTRY_DIR, previous_dir = previous
+        os.chdir(previous_dir)
+
+def test_single_class_window_extends_incrementally():
+    """A window of only potable readings adds trees that keep both classes instead of forcing a full retrain"""
+    tds_data, turbidity_data = training.synthetic_sensor_frames(1000, seed=5)
+    cutoff = pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=700)
+    newer = tds_data['reading_time'] >= cutoff
+    tds_data.loc[newer, 'tds_value'] = 150.0
+    turbidity_data.loc[turbidity_data['reading_time'] >= cutoff, 'ntu_value'] = 0.3
+    previous = (model_registry.MODEL_REGISTRY_DIR, os.getcwd())
+    model_registry.MODEL_REGISTRY_DIR = tempfile.mkdtemp()
+    os.chdir(tempfile.mkdtemp())
+    try:
+        data = training.create_potability_labels(tds_data[~newer],
+                                                 turbidity_data[turbidity_data['reading_time'] < cutoff])
+        X = data[training.prepare_features(data)]
+        classifier = training.build_potability_classifier(n_jobs=1).set_params(n_estimators=30)
+        classifier.fit(X, data['potability_status'])
+        regressor = training.build_potability_score_regressor().set_params(n_estimators=30)
+        regressor.fit(X, data['potability_score'])
+        joblib.dump(classifier, training.CLASSIFIER_FILE)
+        joblib.dump(regressor, training.REGRESSOR_FILE)
+        training.record_full_generation(training.load_generations(), data)
+
+        outcome = training.train_incremental(training.load_generations(), sensor_data=(tds_data, turbidity_data))
+        assert outcome == 'trained'
+        extended = joblib.load(training.CLASSIFIER_FOREST_FILE)
+        assert list(extended.classes_) == list(classifier.classes_) == ['Not Potable', 'Potable']
+        assert len(extended.estimators_) == 30 + training.INCREMENT_TREES
+        assert all(tree.n_classes_ == 2 for tree in extended.estimators_)
+        assert training.load_generations()['generations'][-1]['mode'] == 'incremental'
+
+        # Every new tree calls the new window potable; the old trees still vote for both classes
+        probabilities = extended.predict_proba(X)
+        assert probabilities.shape == (len(X), 2)
+        for tree in extended.estimators_[-training.INCREMENT_TREES:]:
+            assert np.all(tree.predict_proba(X.to_numpy())[:, 1] == 1.0)
+        assert probabilities[:, 0].max() > 0.5
+    finally:
+        model_registry.MODEL_REGISTRY_DIR, previous_dir = previous
+        os.chdir(previous_dir)
+
+if __name__ == "__main__":
+    print("🧪 Testing real-data potability labeling...")
+    test_nearest_reading_within_tolerance()
+    print("✅ Readings pair with the nearest turbidity reading within the tolerance")
+    test_readings_pair_within_a_device()
+    print("✅ Readings pair within their own device")
+    test_incremental_run_extends_saved_models()
+    print("✅ Incremental runs extend the saved models and record a generation")
+    test_incremental_run_extends_the_full_forest()
+    print("✅ Incremental runs extend the full forest and re-compact it")
+    test_single_class_window_extends_incrementally()
+    print("✅ A single-class window extends the models incrementally")
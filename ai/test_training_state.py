@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the training high-water marks: unchanged tables need no retrain, new
+rows past the marks do once there are enough, a drifted mean does with
+fewer rows, and a cleared table always does
+
+Run with: python test_training_state.py   (or: python -m pytest test_training_state.py)
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import training_state
+
+def make_connection(readings=200):
+    """In-memory copies of both sensor tables with steady readings, one per minute"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tds_readings (id INTEGER PRIMARY KEY, tds_value REAL, reading_time TEXT)')
+    conn.execute('CREATE TABLE turbidity_readings (id INTEGER PRIMARY KEY, ntu_value REAL, reading_time TEXT)')
+    add_readings(conn, readings, tds=400.0, ntu=2.0)
+    return conn
+
+def add_readings(conn, count, tds, ntu):
+    """Append readings around the given values, ending now"""
+    start = datetime.now() - timedelta(minutes=count)
+    for minute in range(count):
+        time = (start + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S')
+        wobble = (minute % 5 - 2) * 0.1
+        conn.execute('INSERT INTO tds_readings (tds_value, reading_time) VALUES (?, ?)', (tds * (1 + wobble), time))
+        conn.execute('INSERT INTO turbidity_readings (ntu_value, reading_time) VALUES (?, ?)', (ntu * (1 + wobble), time))
+    conn.commit()
+
+def record_training(conn):
+    """Save the current marks to a temp state file and return its path"""
+    path = os.path.join(tempfile.mkdtemp(), 'training_state.json')
+    training_state.save(training_state.high_water_marks(conn), path)
+    return path
+
+def test_marks_and_unchanged_tables():
+    """Marks hold the largest id and the window statistics; nothing new means no retrain"""
+    conn = make_connection()
+    path = record_training(conn)
+    marks = training_state.load(path)['tables']
+    assert marks['tds_readings']['last_id'] == 200 and marks['tds_readings']['readings'] == 200
+    assert abs(marks['tds_readings']['mean'] - 400.0) < 1e-6 and marks['tds_readings']['std'] > 0
+
+    reason, changes = training_state.check(conn, path)
+    assert reason is None
+    assert all(change['new_rows'] == 0 and not change['reset'] for change in changes.values())
+
+def test_new_rows_and_drift():
+    """A few steady rows wait, enough rows retrain, and a drifted mean retrains early"""
+    conn = make_connection()
+    path = record_training(conn)
+
+    add_readings(conn, 20, tds=400.0, ntu=2.0)
+    reason, changes = training_state.check(conn, path)
+    assert reason is None and changes['tds_readings']['new_rows'] == 20
+    assert changes['tds_readings']['drift'] < training_state.RETRAIN_DRIFT_STD
+
+    add_readings(conn, 40, tds=400.0, ntu=2.0)
+    reason, _ = training_state.check(conn, path)
+    assert reason.startswith('120 new readings')
+
+    # Turbidity jumps: 20 rows are enough
+    path = record_training(conn)
+    add_readings(conn, 20, tds=400.0, ntu=8.0)
+    reason, changes = training_state.check(conn, path)
+    assert reason.startswith('turbidity_readings drifted')
+    assert changes['turbidity_readings']['drift'] >= training_state.RETRAIN_DRIFT_STD
+
+def test_cleared_table():
+    """A table emptied (or recreated with lower ids) since training triggers a retrain"""
+    conn = make_connection()
+    path = record_training(conn)
+    conn.execute('DELETE FROM tds_readings')
+    conn.commit()
+    reason, changes = training_state.check(conn, path)
+    assert changes['tds_readings']['reset'] and reason.startswith('tds_readings was cleared')
+
+    # Without a recorded training every row is new
+    reason, changes = training_state.check(make_connection(), os.path.join(tempfile.mkdtemp(), 'missing.json'))
+    assert changes['turbidity_readings']['new_rows'] == 200 and reason.startswith('400 new readings')
+
+if __name__ == "__main__":
+    print("🧪 Testing training high-water marks...")
+    test_marks_and_unchanged_tables()
+    print("✅ Unchanged tables need no retrain")
+    test_new_rows_and_drift()
+    print("✅ New rows and drift trigger a retrain")
+    test_cleared_table()
+    print("✅ A cleared table triggers a retrain")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the tree compiler: compiled Random Forest, Extra Trees and Gradient
+Boosting models predict what sklearn predicts for the same inputs, a saved
+artifact loads back (also memory-mapped), and unsupported estimators are
+refused
+
+Run with: python test_tree_compiler.py   (or: python -m pytest test_tree_compiler.py)
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+from sklearn.ensemble import (ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingRegressor,
+                              HistGradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor)
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tree_compiler import compile_model, load_compiled, save_compiled
+
+def random_data(n_rows=600, n_features=6, seed=3):
+    """Random inputs, a regression target and three string classes"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    y = X[:, 0] * 3 - X[:, 1] ** 2 + rng.normal(0, 0.1, n_rows)
+    classes = np.array(['Marginal', 'Not Potable', 'Potable'])[np.digitize(y, [-1.0, 1.0])]
+    return X, y, classes
+
+def test_compiled_predictions_match_sklearn():
+    """Every supported estimator compiles to the same predictions"""
+    X, y, classes = random_data()
+    X_new = random_data(seed=4)[0]
+    regressors = [RandomForestRegressor(n_estimators=15, random_state=0),
+                  ExtraTreesRegressor(n_estimators=15, random_state=0),
+                  GradientBoostingRegressor(n_estimators=40, random_state=0)]
+    for model in regressors:
+        model.fit(X, y)
+        assert np.allclose(compile_model(model).predict(X_new), model.predict(X_new)), type(model).__name__
+
+    for model in (RandomForestClassifier(n_estimators=15, random_state=0),
+                  ExtraTreesClassifier(n_estimators=15, random_state=0)):
+        model.fit(X, classes)
+        compiled = compile_model(model)
+        assert np.allclose(compiled.predict_proba(X_new), model.predict_proba(X_new)), type(model).__name__
+        assert np.array_equal(compiled.predict(X_new), model.predict(X_new))
+
+def test_saved_artifact_loads_back():
+    """A saved compiled model predicts the same after loading, memory-mapped or not"""
+    X, y, _ = random_data()
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    path = os.path.join(tempfile.mkdtemp(), 'model_compiled.pkl')
+    save_compiled(compile_model(model), path)
+    for mmap_mode in (None, 'r'):
+        assert np.allclose(load_compiled(path, mmap_mode=mmap_mode).predict(X), model.predict(X))
+
+def test_unsupported_estimators_are_refused():
+    """Histogram boosting is not compiled: ValueError, so callers keep sklearn"""
+    X, y, _ = random_data()
+    model = HistGradientBoostingRegressor(max_iter=10).fit(X, y)
+    try:
+        compile_model(model)
+    except ValueError:
+        return
+    raise AssertionError('HistGradientBoostingRegressor should not compile')
+
+if __name__ == "__main__":
+    print("🧪 Testing the tree compiler...")
+    test_compiled_predictions_match_sklearn()
+    print("✅ Compiled models predict like sklearn")
+    test_saved_artifact_loads_back()
+    print("✅ Saved artifacts load back")
+    test_unsupported_estimators_are_refused()
+    print("✅ Unsupported estimators are refused")
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Parallel Training Orchestrator
+Trains every real-data model in one run: reads the sensor tables once,
+builds the shared feature matrices once, and fits the models side by side
+in a process pool sized to the available cores.
+
+Models (same settings and files as the single-model scripts):
+    potability_classifier_real.pkl        train_with_real_db_data.py
+    potability_score_regressor_real.pkl   train_with_real_db_data.py
+    tds_model_real.pkl                    train_with_real_data.py
+    turbidity_model_real.pkl              train_with_real_data.py
+
+Each model's fit time and peak memory are reported. The tune subcommand
+searches the models' hyperparameters instead (see model_tuning.py).
+
+Usage:
+    python train_orchestrator.py [--incremental] [--workers N]
+    python train_orchestrator.py tune [model ...] [--workers N]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import accuracy_score, mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+
+import model_registry
+import train_with_real_data as forecast_training
+import train_with_real_db_data as potability_training
+from compact_models import compact_for_serving, validation_split
+from db import connect_to_database
+from model_backend import handles_missing_values
+from model_registry import save_model, training_window
+from sensor_extract import frame_nbytes, history_start
+from sensor_store import fetch_readings
+
+# Worker processes (0 = one per core, capped at the number of models)
+TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 0))
+
+# Columns read once per table, covering every model's features
+TDS_COLUMNS = ['tds_value', 'analog_value', 'voltage', 'temperature', 'reading_time']
+TURBIDITY_COLUMNS = ['ntu_value', 'analog_value', 'voltage', 'reading_time']
+
+# Forecast models need this many rows after feature building (as in train_with_real_data.py)
+MIN_FORECAST_ROWS = 50
+
+def load_sensor_data():
+    """Read both sensor tables once over a single connection"""
+    conn = connect_to_database()
+    if not conn:
+        return None, None
+
+    try:
+        limit = potability_training.TRAINING_ROW_LIMIT or None
+        # device_id (where a table has it) pairs readings within a device for the potability labels
+        tds_data = fetch_readings(conn, 'tds_readings', TDS_COLUMNS, last=limit, with_device=True)
+        turbidity_data = fetch_readings(conn, 'turbidity_readings', TURBIDITY_COLUMNS, last=limit, with_device=True)
+        print(f"SUCCESS: TDS data: {len(tds_data)} records ({frame_nbytes(tds_data) / 1e6:.1f} MB)")
+        print(f"SUCCESS: Turbidity data: {len(turbidity_data)} records ({frame_nbytes(turbidity_data) / 1e6:.1f} MB)")
+        return tds_data, turbidity_data
+    except Exception as e:
+        print(f"ERROR: Error fetching data: {e}")
+        return None, None
+    finally:
+        conn.close()
+
+def forecast_window(frame, value_col):
+    """Positive readings inside the forecast history window (TRAINING_HISTORY_DAYS)"""
+    frame = frame[frame[value_col] > 0]
+    since = history_start(forecast_training.TRAINING_HISTORY_DAYS)
+    if since is not None:
+        frame = frame[pd.to_datetime(frame['reading_time']) >= since]
+    return frame.reset_index(drop=True)
+
+def save_features(directory, name, X, targets):
+    """Write a feature matrix and its targets for the workers to memory-map"""
+    path = os.path.join(directory, f'{name}.joblib')
+    joblib.dump({
+        'columns': list(X.columns),
+        'X': np.ascontiguousarray(X.to_numpy(dtype=np.float64)),
+        'targets': {target: np.asarray(values) for target, values in targets.items()}
+    }, path)
+    return path
+
+def build_jobs(directory, tds_data, turbidity_data, include_potability, threads):
+    """Build each shared feature set once and describe the model fits on it
+
+    Returns (jobs, labeled potability data or None).
+    """
+    jobs = []
+    labeled = None
+
+    if include_potability:
+        labeled = potability_training.create_potability_labels(tds_data, turbidity_data)
+    if labeled is not None:
+        # Left unfilled: each job fills missing values only if its model needs it
+        feature_cols = potability_training.prepare_features(labeled, fill_missing=False)
+        window = training_window(labeled['reading_time'])
+        features = save_features(directory, 'potability', labeled[feature_cols], {
+            'potability_status': labeled['potability_status'],
+            'potability_score': labeled['potability_score']
+        })
+        jobs.append({
+            'name': 'potability_classifier',
+            'build': potability_training.build_potability_classifier,
+            'kwargs': {'n_jobs': threads},
+            'features': features,
+            'target': 'potability_status',
+            'split': 'stratified',
+            'fill_missing': True,
+            'output': potability_training.CLASSIFIER_FILE,
+            'forest_output': potability_training.CLASSIFIER_FOREST_FILE,
+            'window': window
+        })
+        regressor = {
+            'name': 'potability_score_regressor',
+            'build': potability_training.build_potability_score_regressor,
+            'kwargs': {},
+            'features': features,
+            'target': 'potability_score',
+            'split': 'random',
+            'fill_missing': not handles_missing_values(),
+            'output': potability_training.REGRESSOR_FILE,
+            'window': window
+        }
+        if len(labeled) < 10:
+            # Too few rows for gradient boosting (as in train_with_real_db_data.py)
+            regressor.update(build=LinearRegression, columns=['tds_value', 'turbidity_value'], fill_missing=True)
+        jobs.append(regressor)
+
+    forecasts = [
+        ('tds_model', tds_data, 'tds_value', forecast_training.build_tds_model, {'n_jobs': threads},
+         forecast_training.TDS_MODEL_FILE),
+        ('turbidity_model', turbidity_data, 'ntu_value', forecast_training.build_turbidity_model, {},
+         forecast_training.TURBIDITY_MODEL_FILE)
+    ]
+    for name, frame, value_col, build, kwargs, output in forecasts:
+        frame = forecast_window(frame, value_col)
+        X, y, _ = forecast_training.prepare_features(frame, value_col)
+        if len(X) < MIN_FORECAST_ROWS:
+            print(f"Skipping {name} - only {len(X)} usable readings (need {MIN_FORECAST_ROWS})")
+            continue
+        jobs.append({
+            'name': name,
+            'build': build,
+            'kwargs': kwargs,
+            'features': save_features(directory, name, X, {'target': y}),
+            'target': 'target',
+            'split': 'chronological',
+            'output': output,
+            'window': training_window(frame['reading_time'])
+        })
+
+    return jobs, labeled
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def fit_model(job):
+    """Fit one model in a worker process and save it; returns its report"""
+    data = joblib.load(job['features'], mmap_mode='r')
+    X = pd.DataFrame(data['X'], columns=data['columns'], copy=False)
+    y = pd.Series(data['targets'][job['target']])
+    if job.get('columns'):
+        X = X[job['columns']]
+    if job.get('fill_missing'):
+        X = potability_training.fill_missing_values(X.copy()).fillna(0)
+
+    if job['split'] == 'chronological':
+        split_point = int(len(X) * 0.8)
+        X_train, X_test, y_train, y_test = X[:split_point], X[split_point:], y[:split_point], y[split_point:]
+    elif job['split'] == 'stratified':
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    model = job['build'](**job['kwargs'])
+    # Trees are selected on held-out training rows; the test split only scores
+    X_fit, X_val, y_fit, y_val = validation_split(model, X_train, y_train, stratify=job['split'] == 'stratified',
+                                                  chronological=job['split'] == 'chronological')
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    seconds = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+    if job.get('forest_output'):
+        joblib.dump(model, job['forest_output'])  # Full forest, extended by incremental runs
+    model, compiled, compaction = compact_for_serving(model, X_val, y_val)
+
+    report = {
+        'model': job['name'],
+        'file': job['output'],
+        'samples': len(X),
+        'fit_seconds': round(seconds, 3),
+        'peak_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'fit_rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+        'pid': os.getpid()
+    }
+    if len(X_test):
+        y_pred = model.predict(X_test)
+        if job['split'] == 'stratified':
+            report['accuracy'] = round(float(accuracy_score(y_test, y_pred)), 3)
+        else:
+            report['r2'] = round(float(r2_score(y_test, y_pred)), 3)
+            report['mae'] = round(float(mean_absolute_error(y_test, y_pred)), 2)
+
+    if compaction:
+        report['compacted_trees'] = f"{compaction['before']['trees']} -> {compaction['after']['trees']}"
+    metrics = {key: report[key] for key in ('accuracy', 'r2', 'mae') if key in report}
+    report['version'] = save_model(model, job['output'], window=job.get('window'), metrics=metrics,
+                                   compiled=compiled, compaction=compaction)['version']
+    return report
+
+def pool_size(n_jobs, workers=None):
+    """(worker processes, threads per forest) for n_jobs models on this machine"""
+    cores = os.cpu_count() or 1
+    workers = workers or TRAINING_WORKERS or cores
+    workers = max(1, min(workers, n_jobs, cores))
+    return workers, max(1, cores // workers)
+
+def print_report(report):
+    """One line per finished model"""
+    print(f"SUCCESS: {report['model']} -> {report['file']} "
+          f"({report['samples']} samples, fit {report['fit_seconds']:.2f}s, "
+          f"peak RSS {report['peak_rss_mb']} MB, +{report['fit_rss_growth_mb']} MB during fit)")
+
+def init_worker(registry_dir):
+    """Register worker models where the parent would (workers are spawned and re-import model_registry)"""
+    model_registry.MODEL_REGISTRY_DIR = registry_dir
+
+def run_jobs(jobs, workers):
+    """Fit the jobs in a process pool, printing each report as it finishes
+
+    Every model is fitted in a fresh worker process, also with a single
+    worker, so each peak_rss_mb is that model's own peak and not the
+    running maximum of the models fitted before it.
+    """
+    reports = []
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1, initializer=init_worker,
+                             initargs=(model_registry.MODEL_REGISTRY_DIR,)) as pool:
+        futures = {pool.submit(fit_model, job): job['name'] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as e:
+                print(f"ERROR: {futures[future]} failed: {e}")
+                reports.append({'model': futures[future], 'error': str(e)})
+                continue
+            print_report(report)
+            reports.append(report)
+    return reports
+
+def train_all(incremental=False, workers=None):
+    """Train every model from one read of the sensor tables
+
+    incremental: extend the potability models with the new readings (see
+    train_with_real_db_data.train_incremental) instead of refitting them.
+    Returns the list of per-model reports, or None when no data could be read.
+    """
+    print("TRAINING ORCHESTRATOR")
+    print("=" * 50)
+    print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    started = time.perf_counter()
+
+    tds_data, turbidity_data = load_sensor_data()
+    if tds_data is None or turbidity_data is None:
+        print("ERROR: No real data available. Please ensure your database has sensor readings.")
+        return None
+
+    history = potability_training.load_generations()
+    include_potability = True
+    if incremental:
+        outcome = potability_training.train_incremental(history, sensor_data=(tds_data, turbidity_data))
+        include_potability = outcome == 'full'
+
+    directory = tempfile.mkdtemp(prefix='training_features_')
+    try:
+        features_start = time.perf_counter()
+        # Size the pool for the largest possible job list; forests get the spare cores
+        workers, threads = pool_size(4, workers)
+        jobs, labeled = build_jobs(directory, tds_data, turbidity_data, include_potability, threads)
+        print(f"Shared features built in {time.perf_counter() - features_start:.2f}s")
+        if not jobs:
+            print("Nothing to train.")
+            return []
+
+        workers, _ = pool_size(len(jobs), workers)
+        print(f"Fitting {len(jobs)} models in {workers} worker processes ({threads} threads per forest)...")
+        reports = run_jobs(jobs, workers)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    trained = {report['model'] for report in reports if 'error' not in report}
+    if {'potability_classifier', 'potability_score_regressor'} <= trained:
+        potability_training.record_full_generation(history, labeled)
+
+    print(f"\nTRAINING COMPLETE: {len(trained)}/{len(jobs)} models in {time.perf_counter() - started:.2f}s")
+    print(f"Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    return reports
+
+def main():
+    """Command line entry point"""
+    args = sys.argv[1:]
+    workers = None
+    if '--workers' in args:
+        workers = int(args.pop(args.index('--workers') + 1))
+        args.remove('--workers')
+    if args and args[0] == 'tune':
+        from model_tuning import tune_models
+        reports = tune_models(args[1:] or None, workers=workers)
+    else:
+        reports = train_all(incremental='--incremental' in args, workers=workers)
+    print(json.dumps(reports, indent=2))
+    if reports is None or any('error' in report for report in reports):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
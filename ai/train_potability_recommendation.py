@@ -6,14 +6,18 @@ Trains AI models to recommend water safety based on TDS and Turbidity
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, mean_absolute_error, r2_score
-import joblib
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from compact_models import compact_for_serving, validation_split
+from features import RECOMMENDATION_COLUMNS, derived_features
+from model_backend import boosting_regressor
+from model_registry import save_model
+
 def create_potability_training_data():
     """Create training data for potability recommendation"""
     print("Creating potability training data...")
@@ -59,13 +63,12 @@ def create_potability_training_data():
         'hour': np.random.randint(0, 24, n_samples),
         'day_of_week': np.random.randint(0, 7, n_samples),
         'temperature': np.random.normal(25, 5, n_samples),  # Water temperature
-        'ph_level': np.random.normal(7.0, 0.5, n_samples),  # pH level
-        'conductivity': tds_values * 2 + np.random.normal(0, 50, n_samples)
+        'ph_level': np.random.normal(7.0, 0.5, n_samples)  # pH level
     })
     
-    # Add some realistic patterns
-    data['tds_turbidity_ratio'] = data['tds_value'] / (data['turbidity_value'] + 0.1)
-    data['quality_index'] = (data['tds_value'] / 500) + (data['turbidity_value'] / 1.0)
+    # Conductivity, ratio and quality index as the serving side computes them
+    for column, values in derived_features(tds_values, turbidity_values).items():
+        data[column] = values
     
     print(f"Training data created: {len(data)} samples")
     print(f"   - Potable: {sum(1 for x in potability_labels if x == 'Potable')}")
@@ -78,11 +81,7 @@ def prepare_potability_features(data):
     """Prepare features for potability recommendation"""
     
     # Define feature columns
-    feature_cols = [
-        'tds_value', 'turbidity_value', 'hour', 'day_of_week',
-        'temperature', 'ph_level', 'conductivity',
-        'tds_turbidity_ratio', 'quality_index'
-    ]
+    feature_cols = RECOMMENDATION_COLUMNS
     
     X = data[feature_cols]
     y = data['potability_status']
@@ -110,7 +109,11 @@ def train_potability_classifier(data):
         n_jobs=-1
     )
     
-    model.fit(X_train, y_train)
+    X_fit, X_val, y_fit, y_val = validation_split(model, X_train, y_train, stratify=True)
+    model.fit(X_fit, y_fit)
+    
+    # Compact for serving: fewer, shallower trees, checked against held-out training rows
+    model, compiled, compaction = compact_for_serving(model, X_val, y_val)
     
     # Evaluate
     y_pred = model.predict(X_test)
@@ -121,7 +124,8 @@ def train_potability_classifier(data):
     feature_importance.sort(key=lambda x: x[1], reverse=True)
     
     # Save model
-    joblib.dump(model, 'potability_classifier.pkl')
+    save_model(model, 'potability_classifier.pkl', metrics={'accuracy': round(float(accuracy), 4)},
+               compiled=compiled, compaction=compaction)
     
     print(f"Potability Classifier trained successfully!")
     print(f"   - Samples: {len(X)}")
@@ -146,15 +150,8 @@ def train_potability_score_regressor(data):
         X, y_scores, test_size=0.2, random_state=42
     )
     
-    # Train Gradient Boosting Regressor for scores (not classifier!)
-    model = GradientBoostingRegressor(
-        n_estimators=200,
-        learning_rate=0.05,
-        max_depth=8,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42
-    )
+    # Train Gradient Boosting Regressor for scores (not classifier!); MODEL_BACKEND picks gb or hist
+    model = boosting_regressor()
     
     model.fit(X_train, y_train)
     
@@ -164,7 +161,7 @@ def train_potability_score_regressor(data):
     r2 = r2_score(y_test, y_pred)
     
     # Save model
-    joblib.dump(model, 'potability_score_regressor.pkl')
+    save_model(model, 'potability_score_regressor.pkl', metrics={'r2': round(float(r2), 4), 'mae': round(float(mae), 4)})
     
     print(f"Potability Score Regressor trained successfully!")
     print(f"   - Samples: {len(X)}")
@@ -177,6 +174,11 @@ def create_potability_recommendation_api():
     """Create API function for potability recommendations"""
     
     api_code = '''
+import joblib
+import pandas as pd
+
+from features import RECOMMENDATION_COLUMNS, potability_matrix
+
 def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph_level=7.0):
     """
     Get potability recommendation based on water quality parameters
@@ -201,15 +203,10 @@ def get_potability_recommendation(tds_value, turbidity_value, temperature=25, ph
             'message': 'Models not found. Please train models first.'
         }
     
-    # Prepare input features
-    features = np.array([[
-        tds_value, turbidity_value, 
-        datetime.now().hour, datetime.now().weekday(),
-        temperature, ph_level,
-        tds_value * 2,  # conductivity approximation
-        tds_value / (turbidity_value + 0.1),  # ratio
-        (tds_value / 500) + (turbidity_value / 1.0)  # quality index
-    ]])
+    # Prepare input features (same pipeline as training)
+    features = pd.DataFrame(potability_matrix([tds_value], [turbidity_value], temperature, ph_level,
+                                              columns=RECOMMENDATION_COLUMNS),
+                            columns=RECOMMENDATION_COLUMNS)
     
     # Get prediction
     potability_status = classifier.predict(features)[0]
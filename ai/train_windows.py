@@ -7,11 +7,13 @@ No emoji characters to avoid Unicode errors
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-import joblib
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from features import forecast_training_set
+from model_registry import save_model, training_window
+
 def create_realistic_demo_data():
     """Create realistic demo data based on typical water quality patterns"""
     print("Creating training data...")
@@ -65,45 +67,7 @@ def create_realistic_demo_data():
 
 def prepare_features(data, target_col):
     """Prepare features for training"""
-    # Sort by time
-    data = data.sort_values('reading_time').reset_index(drop=True)
-    
-    # Create time features
-    data['hour'] = pd.to_datetime(data['reading_time']).dt.hour
-    data['day_of_week'] = pd.to_datetime(data['reading_time']).dt.dayofweek
-    data['day_of_year'] = pd.to_datetime(data['reading_time']).dt.dayofyear
-    
-    # Create lagged features
-    data['lag_1'] = data[target_col].shift(1)
-    data['lag_3'] = data[target_col].shift(3)
-    data['lag_6'] = data[target_col].shift(6)
-    data['lag_12'] = data[target_col].shift(12)
-    
-    # Create rolling features
-    data['rolling_mean_3'] = data[target_col].rolling(window=3, min_periods=1).mean()
-    data['rolling_mean_6'] = data[target_col].rolling(window=6, min_periods=1).mean()
-    data['rolling_std_6'] = data[target_col].rolling(window=6, min_periods=1).std()
-    
-    # Create target (next value)
-    data['target'] = data[target_col].shift(-1)
-    
-    # Remove NaN values
-    data = data.dropna()
-    
-    # Define features
-    feature_cols = ['hour', 'day_of_week', 'day_of_year', 'lag_1', 'lag_3', 'lag_6', 'lag_12',
-                   'rolling_mean_3', 'rolling_mean_6', 'rolling_std_6']
-    
-    # Add sensor features if available
-    if 'analog_value' in data.columns:
-        feature_cols.append('analog_value')
-    if 'voltage' in data.columns:
-        feature_cols.append('voltage')
-    
-    X = data[feature_cols]
-    y = data['target']
-    
-    return X, y, feature_cols
+    return forecast_training_set(data, target_col)
 
 def train_tds_model(tds_data):
     """Train TDS prediction model"""
@@ -142,7 +106,8 @@ def train_tds_model(tds_data):
     feature_importance.sort(key=lambda x: x[1], reverse=True)
     
     # Save model
-    joblib.dump(model, 'tds_model.pkl')
+    save_model(model, 'tds_model.pkl', window=training_window(tds_data['reading_time']),
+               metrics={'r2': round(float(r2), 4), 'mae': round(float(mae), 4)})
     
     print(f"TDS Model trained successfully!")
     print(f"   - Samples: {len(X)}")
@@ -189,7 +154,8 @@ def train_turbidity_model(turbidity_data):
     feature_importance.sort(key=lambda x: x[1], reverse=True)
     
     # Save model
-    joblib.dump(model, 'turbidity_model.pkl')
+    save_model(model, 'turbidity_model.pkl', window=training_window(turbidity_data['reading_time']),
+               metrics={'r2': round(float(r2), 4), 'mae': round(float(mae), 4)})
     
     print(f"Turbidity Model trained successfully!")
     print(f"   - Samples: {len(X)}")
@@ -4,29 +4,28 @@ Train ML Models with Real Sensor Data
 Uses actual TDS and turbidity readings from your database
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-import joblib
-from datetime import datetime, timedelta
+from sklearn.ensemble import RandomForestRegressor
+from datetime import datetime
 import warnings
-import mysql.connector
 import os
 warnings.filterwarnings('ignore')
 
-def connect_to_database():
-    """Connect to your MySQL database"""
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='u520834156_DBBagoWaters25'
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        return None
+from compact_models import compact_for_serving, validation_split
+from db import connect_to_database
+from features import forecast_training_set
+from model_backend import boosting_regressor, feature_importances
+from model_registry import save_model, training_window
+from model_tuning import apply_tuned_params
+from sensor_extract import frame_nbytes, history_start
+from sensor_store import fetch_readings
+
+# Days of history to train on (0 trains on every reading in the tables)
+TRAINING_HISTORY_DAYS = int(os.environ.get('TRAINING_HISTORY_DAYS', 30))
+
+# Model files written by this script (tuned parameters sit next to them as .params.json)
+TDS_MODEL_FILE = 'tds_model_real.pkl'
+TURBIDITY_MODEL_FILE = 'turbidity_model_real.pkl'
 
 def get_tds_data():
     """Get TDS readings from database"""
@@ -37,23 +36,16 @@ def get_tds_data():
         return None
     
     try:
-        # Get TDS readings from last 30 days
-        query = """
-        SELECT tds_value, analog_value, voltage, reading_time 
-        FROM tds_readings 
-        WHERE tds_value > 0 
-        AND reading_time >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-        ORDER BY reading_time ASC
-        """
-        
-        df = pd.read_sql(query, conn)
+        # Get TDS readings in the history window (synced into the local sensor store)
+        df = fetch_readings(conn, 'tds_readings', ['tds_value', 'analog_value', 'voltage', 'reading_time'],
+                            positive='tds_value', since=history_start(TRAINING_HISTORY_DAYS))
         conn.close()
         
         if len(df) < 50:
             print(f"Not enough TDS data: {len(df)} records found")
             return None
         
-        print(f"TDS data loaded: {len(df)} records")
+        print(f"TDS data loaded: {len(df)} records ({frame_nbytes(df) / 1e6:.1f} MB)")
         print(f"Date range: {df['reading_time'].min()} to {df['reading_time'].max()}")
         print(f"TDS range: {df['tds_value'].min():.1f} - {df['tds_value'].max():.1f} ppm")
         
@@ -73,23 +65,16 @@ def get_turbidity_data():
         return None
     
     try:
-        # Get turbidity readings from last 30 days
-        query = """
-        SELECT ntu_value, analog_value, voltage, reading_time 
-        FROM turbidity_readings 
-        WHERE ntu_value > 0 
-        AND reading_time >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-        ORDER BY reading_time ASC
-        """
-        
-        df = pd.read_sql(query, conn)
+        # Get turbidity readings in the history window (synced into the local sensor store)
+        df = fetch_readings(conn, 'turbidity_readings', ['ntu_value', 'analog_value', 'voltage', 'reading_time'],
+                            positive='ntu_value', since=history_start(TRAINING_HISTORY_DAYS))
         conn.close()
         
         if len(df) < 50:
             print(f"Not enough turbidity data: {len(df)} records found")
             return None
         
-        print(f"Turbidity data loaded: {len(df)} records")
+        print(f"Turbidity data loaded: {len(df)} records ({frame_nbytes(df) / 1e6:.1f} MB)")
         print(f"Date range: {df['reading_time'].min()} to {df['reading_time'].max()}")
         print(f"Turbidity range: {df['ntu_value'].min():.1f} - {df['ntu_value'].max():.1f} NTU")
         
@@ -102,45 +87,22 @@ def get_turbidity_data():
 
 def prepare_features(data, target_col):
     """Prepare features for training with real data"""
-    # Sort by time
-    data = data.sort_values('reading_time').reset_index(drop=True)
-    
-    # Create time features
-    data['hour'] = pd.to_datetime(data['reading_time']).dt.hour
-    data['day_of_week'] = pd.to_datetime(data['reading_time']).dt.dayofweek
-    data['day_of_year'] = pd.to_datetime(data['reading_time']).dt.dayofyear
-    
-    # Create lagged features
-    data['lag_1'] = data[target_col].shift(1)
-    data['lag_3'] = data[target_col].shift(3)
-    data['lag_6'] = data[target_col].shift(6)
-    data['lag_12'] = data[target_col].shift(12)
-    
-    # Create rolling features
-    data['rolling_mean_3'] = data[target_col].rolling(window=3, min_periods=1).mean()
-    data['rolling_mean_6'] = data[target_col].rolling(window=6, min_periods=1).mean()
-    data['rolling_std_6'] = data[target_col].rolling(window=6, min_periods=1).std()
-    
-    # Create target (next value)
-    data['target'] = data[target_col].shift(-1)
-    
-    # Remove NaN values
-    data = data.dropna()
-    
-    # Define features
-    feature_cols = ['hour', 'day_of_week', 'day_of_year', 'lag_1', 'lag_3', 'lag_6', 'lag_12',
-                   'rolling_mean_3', 'rolling_mean_6', 'rolling_std_6']
-    
-    # Add sensor features if available
-    if 'analog_value' in data.columns:
-        feature_cols.append('analog_value')
-    if 'voltage' in data.columns:
-        feature_cols.append('voltage')
-    
-    X = data[feature_cols]
-    y = data['target']
-    
-    return X, y, feature_cols
+    return forecast_training_set(data, target_col)
+
+def build_tds_model(n_jobs=-1):
+    """Untrained TDS forecast model (with tuned parameters, if model_tuning.py found any)"""
+    return apply_tuned_params(RandomForestRegressor(
+        n_estimators=200,
+        max_depth=15,
+        min_samples_split=5,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=n_jobs
+    ), TDS_MODEL_FILE)
+
+def build_turbidity_model():
+    """Untrained turbidity forecast model (MODEL_BACKEND picks gb or hist; tuned parameters apply)"""
+    return apply_tuned_params(boosting_regressor(), TURBIDITY_MODEL_FILE)
 
 def train_tds_model_with_real_data(tds_data):
     """Train TDS model with real sensor data"""
@@ -158,16 +120,13 @@ def train_tds_model_with_real_data(tds_data):
     y_train, y_test = y[:split_point], y[split_point:]
     
     # Train Random Forest model
-    model = RandomForestRegressor(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        n_jobs=-1
-    )
+    model = build_tds_model()
+    X_fit, X_val, y_fit, y_val = validation_split(model, X_train, y_train, chronological=True)
     
-    model.fit(X_train, y_train)
+    model.fit(X_fit, y_fit)
+    
+    # Compact for serving: fewer, shallower trees, checked against the newest training rows
+    model, compiled, compaction = compact_for_serving(model, X_val, y_val)
     
     # Evaluate
     y_pred = model.predict(X_test)
@@ -179,7 +138,9 @@ def train_tds_model_with_real_data(tds_data):
     feature_importance.sort(key=lambda x: x[1], reverse=True)
     
     # Save model
-    joblib.dump(model, 'tds_model_real.pkl')
+    save_model(model, TDS_MODEL_FILE, window=training_window(tds_data['reading_time']),
+               metrics={'r2': round(float(r2), 4), 'mae': round(float(mae), 4)},
+               compiled=compiled, compaction=compaction)
     
     print(f"TDS Model trained successfully with REAL DATA!")
     print(f"   - Samples: {len(X)}")
@@ -205,14 +166,7 @@ def train_turbidity_model_with_real_data(turbidity_data):
     y_train, y_test = y[:split_point], y[split_point:]
     
     # Train Gradient Boosting model
-    model = GradientBoostingRegressor(
-        n_estimators=200,
-        learning_rate=0.05,
-        max_depth=8,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42
-    )
+    model = build_turbidity_model()
     
     model.fit(X_train, y_train)
     
@@ -221,12 +175,13 @@ def train_turbidity_model_with_real_data(turbidity_data):
     mae = np.mean(np.abs(y_test - y_pred))
     r2 = model.score(X_test, y_test)
     
-    # Feature importance
-    feature_importance = list(zip(feature_cols, model.feature_importances_))
+    # Feature importance (permutation importance on the test rows for the hist backend)
+    feature_importance = list(zip(feature_cols, feature_importances(model, X_test, y_test)))
     feature_importance.sort(key=lambda x: x[1], reverse=True)
     
     # Save model
-    joblib.dump(model, 'turbidity_model_real.pkl')
+    save_model(model, TURBIDITY_MODEL_FILE, window=training_window(turbidity_data['reading_time']),
+               metrics={'r2': round(float(r2), 4), 'mae': round(float(mae), 4)})
     
     print(f"Turbidity Model trained successfully with REAL DATA!")
     print(f"   - Samples: {len(X)}")
@@ -2,38 +2,65 @@
 """
 Train Potability Recommendation Models with Real Database Data
 Uses actual TDS and turbidity readings from your database
+
+Full retrain:        python train_with_real_db_data.py
+Incremental:         python train_with_real_db_data.py --incremental
+Labeling benchmark:  python train_with_real_db_data.py --benchmark-labels [rows ...]
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score, mean_absolute_error, r2_score
 import joblib
 from datetime import datetime, timedelta
+import contextlib
+import io
+import json
 import warnings
-import mysql.connector
 import os
+import sys
+import time
 warnings.filterwarnings('ignore')
 
-def connect_to_database():
-    """Connect to your MySQL database"""
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='u520834156_dbbagoWaters25',
-            charset='utf8mb4',
-            collation='utf8mb4_general_ci'
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        return None
+from compact_models import compact_for_serving, validation_split
+from db import connect_to_database
+from features import POTABILITY_COLUMNS, potability_features
+from model_backend import (MODEL_BACKEND, add_boosting_stages, boosting_regressor, boosting_stages,
+                           handles_missing_values, is_boosting_regressor)
+from model_registry import save_model, training_window
+from model_tuning import apply_tuned_params
+from sensor_extract import frame_nbytes
+from sensor_store import fetch_readings
+
+# Most recent readings fetched per sensor table (0 fetches every row)
+TRAINING_ROW_LIMIT = int(os.environ.get('TRAINING_ROW_LIMIT', 1000000))
 
-def get_real_sensor_data():
-    """Get real sensor data from your database"""
+# A TDS reading is paired with the nearest turbidity reading within this window
+MATCH_TOLERANCE = timedelta(hours=1)
+
+# Model files written by this script, and the record of what each model
+# generation was trained on
+CLASSIFIER_FILE = 'potability_classifier_real.pkl'
+REGRESSOR_FILE = 'potability_score_regressor_real.pkl'
+GENERATIONS_FILE = 'potability_models_real_generations.json'
+
+# The classifier's full forest before compaction; incremental runs extend it
+# and compact a copy for serving
+CLASSIFIER_FOREST_FILE = 'potability_classifier_real.forest.pkl'
+
+# Incremental mode (--incremental): each run adds trees / boosting stages
+# fitted on the readings that arrived since the previous generation
+INCREMENT_TREES = int(os.environ.get('INCREMENT_TREES', 20))
+MAX_FOREST_TREES = int(os.environ.get('MAX_FOREST_TREES', 200))        # oldest trees retire beyond this
+INCREMENT_STAGES = int(os.environ.get('INCREMENT_STAGES', 20))
+MAX_BOOSTING_STAGES = int(os.environ.get('MAX_BOOSTING_STAGES', 400))  # full retrain beyond this
+FULL_RETRAIN_EVERY = int(os.environ.get('FULL_RETRAIN_EVERY', 28))     # incremental runs between full retrains
+MIN_INCREMENT_ROWS = int(os.environ.get('MIN_INCREMENT_ROWS', 20))
+
+def get_real_sensor_data(since=None):
+    """Get real sensor data from your database (optionally only readings from `since` on)"""
     print("Connecting to database...")
     conn = connect_to_database()
     
@@ -42,28 +69,21 @@ def get_real_sensor_data():
         return None, None
     
     try:
-        # Get TDS data
+        limit = TRAINING_ROW_LIMIT if TRAINING_ROW_LIMIT > 0 else None
+        
+        # Get TDS data (synced into the local sensor store, then read from it)
         print("Fetching TDS data...")
-        tds_query = """
-        SELECT tds_value, analog_value, voltage, temperature, reading_time 
-        FROM tds_readings 
-        ORDER BY reading_time DESC 
-        LIMIT 1000
-        """
-        tds_data = pd.read_sql(tds_query, conn)
+        tds_data = fetch_readings(conn, 'tds_readings',
+                                  ['tds_value', 'analog_value', 'voltage', 'temperature', 'reading_time'],
+                                  since=since, last=limit, with_device=True)
         
         # Get Turbidity data
         print("Fetching Turbidity data...")
-        turbidity_query = """
-        SELECT ntu_value, raw_adc, reading_time 
-        FROM turbidity_readings 
-        ORDER BY reading_time DESC 
-        LIMIT 1000
-        """
-        turbidity_data = pd.read_sql(turbidity_query, conn)
+        turbidity_data = fetch_readings(conn, 'turbidity_readings', ['ntu_value', 'raw_adc', 'reading_time'],
+                                        since=since, last=limit, with_device=True)
         
-        print(f"SUCCESS: TDS data: {len(tds_data)} records")
-        print(f"SUCCESS: Turbidity data: {len(turbidity_data)} records")
+        print(f"SUCCESS: TDS data: {len(tds_data)} records ({frame_nbytes(tds_data) / 1e6:.1f} MB)")
+        print(f"SUCCESS: Turbidity data: {len(turbidity_data)} records ({frame_nbytes(turbidity_data) / 1e6:.1f} MB)")
         
         return tds_data, turbidity_data
         
@@ -74,76 +94,105 @@ def get_real_sensor_data():
         conn.close()
 
 def create_potability_labels(tds_data, turbidity_data):
-    """Create potability labels based on WHO guidelines"""
+    """Create potability labels based on WHO guidelines
+    
+    Each TDS reading is paired with the nearest turbidity reading within
+    MATCH_TOLERANCE using one sorted as-of join, then labeled in bulk.
+    When both tables carry device_id, readings are only paired within the
+    same device.
+    """
     print("Creating potability labels based on WHO guidelines...")
     
     # WHO Guidelines
     tds_limit = 500  # mg/L
     turbidity_limit = 1.0  # NTU
     
-    # Create combined dataset
-    combined_data = []
-    
-    for _, tds_row in tds_data.iterrows():
-        # Find matching turbidity reading (closest time)
-        tds_time = pd.to_datetime(tds_row['reading_time'])
-        
-        # Find closest turbidity reading within 1 hour
-        turbidity_matches = turbidity_data[
-            abs(pd.to_datetime(turbidity_data['reading_time']) - tds_time) <= timedelta(hours=1)
-        ]
-        
-        if not turbidity_matches.empty:
-            turbidity_row = turbidity_matches.iloc[0]
-            
-            # Determine potability based on WHO guidelines
-            tds_value = tds_row['tds_value']
-            turbidity_value = turbidity_row['ntu_value']
-            
-            if tds_value <= tds_limit and turbidity_value <= turbidity_limit:
-                status = 'Potable'
-                score = 90 + np.random.normal(0, 5)  # 85-95
-            else:
-                status = 'Not Potable'
-                score = 30 + np.random.normal(0, 15)  # 15-45
-            
-            combined_data.append({
-                'tds_value': tds_value,
-                'turbidity_value': turbidity_value,
-                'temperature': tds_row.get('temperature', 25),
-                'voltage': tds_row.get('voltage', 3.5),
-                'analog_value': tds_row.get('analog_value', tds_value * 2.5),
-                'potability_status': status,
-                'potability_score': score,
-                'reading_time': tds_time
-            })
-    
-    if not combined_data:
+    # Parse timestamps once and sort both sides for the as-of join
+    tds = tds_data.copy()
+    tds['reading_time'] = pd.to_datetime(tds['reading_time'])
+    tds = tds.dropna(subset=['reading_time']).sort_values('reading_time', kind='mergesort')
+    
+    turbidity = pd.DataFrame({
+        'reading_time': pd.to_datetime(turbidity_data['reading_time']),
+        'turbidity_value': turbidity_data['ntu_value']
+    })
+    by_device = 'device_id' in tds.columns and 'device_id' in turbidity_data.columns
+    if by_device:
+        turbidity['device_id'] = turbidity_data['device_id']
+    turbidity = turbidity.dropna(subset=['reading_time']).sort_values('reading_time', kind='mergesort')
+    
+    # Nearest turbidity reading (either side, same device) within the tolerance
+    matched = pd.merge_asof(tds, turbidity, on='reading_time', by='device_id' if by_device else None,
+                            direction='nearest', tolerance=pd.Timedelta(MATCH_TOLERANCE))
+    matched = matched[matched['turbidity_value'].notna()]
+    
+    if matched.empty:
         print("ERROR: No matching data found. Using demo data.")
         return None
     
-    df = pd.DataFrame(combined_data)
+    tds_value = matched['tds_value'].to_numpy(dtype=float)
+    turbidity_value = matched['turbidity_value'].to_numpy(dtype=float)
+    
+    # Determine potability based on WHO guidelines
+    potable = (tds_value <= tds_limit) & (turbidity_value <= turbidity_limit)
+    noise = np.random.normal(0, 1, len(matched))
+    score = np.where(potable, 90 + 5 * noise, 30 + 15 * noise)  # ~85-95 / ~15-45
+    
+    def sensor_column(name, default):
+        return matched[name].to_numpy() if name in matched.columns else default
+    
+    df = pd.DataFrame({
+        'tds_value': tds_value,
+        'turbidity_value': turbidity_value,
+        'temperature': sensor_column('temperature', 25),
+        'voltage': sensor_column('voltage', 3.5),
+        'analog_value': sensor_column('analog_value', tds_value * 2.5),
+        'potability_status': np.where(potable, 'Potable', 'Not Potable'),
+        'potability_score': score,
+        'reading_time': matched['reading_time'].to_numpy()
+    })
+    
+    potable_count = int(potable.sum())
     print(f"SUCCESS: Combined dataset: {len(df)} records")
-    print(f"   - Potable: {sum(1 for x in df['potability_status'] if x == 'Potable')}")
-    print(f"   - Not Potable: {sum(1 for x in df['potability_status'] if x == 'Not Potable')}")
+    print(f"   - Potable: {potable_count}")
+    print(f"   - Not Potable: {len(df) - potable_count}")
     
     return df
 
-def prepare_features(data):
-    """Prepare features for training"""
-    print("Preparing features...")
-    
-    # Create time features
-    data['hour'] = pd.to_datetime(data['reading_time']).dt.hour
-    data['day_of_week'] = pd.to_datetime(data['reading_time']).dt.dayofweek
-    data['day_of_year'] = pd.to_datetime(data['reading_time']).dt.dayofyear
-    
-    # Create additional features
-    data['tds_turbidity_ratio'] = data['tds_value'] / (data['turbidity_value'] + 0.1)
-    data['quality_index'] = (data['tds_value'] / 500) + (data['turbidity_value'] / 1.0)
-    data['conductivity'] = data['tds_value'] * 2 + np.random.normal(0, 50, len(data))
-    
-    # Handle NaN values - fill with median or mean
+def synthetic_sensor_frames(n_rows, seed=42):
+    """TDS and turbidity frames shaped like the database tables, one reading a minute"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01')
+    tds_times = start + pd.to_timedelta(np.arange(n_rows) * 60 + rng.integers(0, 30, n_rows), unit='s')
+    turbidity_times = start + pd.to_timedelta(np.arange(n_rows) * 60 + rng.integers(0, 60, n_rows), unit='s')
+    tds_value = rng.uniform(100, 900, n_rows)
+    tds_data = pd.DataFrame({
+        'tds_value': tds_value,
+        'analog_value': tds_value * 2.5,
+        'voltage': rng.uniform(3.0, 3.6, n_rows),
+        'temperature': rng.uniform(20, 30, n_rows),
+        'reading_time': tds_times[::-1]  # newest first, like ORDER BY reading_time DESC
+    })
+    turbidity_data = pd.DataFrame({
+        'ntu_value': rng.uniform(0, 10, n_rows),
+        'raw_adc': rng.integers(0, 4096, n_rows),
+        'reading_time': turbidity_times[::-1]
+    })
+    return tds_data, turbidity_data
+
+def benchmark_labels(sizes=(10000, 100000, 1000000)):
+    """Time create_potability_labels() on synthetic tables of each size"""
+    print("Labeling benchmark (rows per table -> wall time)")
+    for n_rows in sizes:
+        tds_data, turbidity_data = synthetic_sensor_frames(n_rows)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            labeled = create_potability_labels(tds_data, turbidity_data)
+        elapsed = time.perf_counter() - start
+        print(f"   - {n_rows:>9,} rows: {elapsed:8.3f} s ({len(labeled):,} labeled)")
+
+def fill_missing_values(data):
+    """Fill NaN features in place - median for time features, mean for the rest"""
     numeric_cols = ['tds_value', 'turbidity_value', 'analog_value', 'voltage', 'temperature',
                    'hour', 'day_of_week', 'day_of_year', 'tds_turbidity_ratio', 'quality_index', 'conductivity']
     
@@ -156,22 +205,46 @@ def prepare_features(data):
                 else:
                     # For other features, use mean
                     data[col] = data[col].fillna(data[col].mean())
+    return data
+
+def prepare_features(data, fill_missing=True):
+    """Prepare features for training (fill_missing=False leaves NaN in place)"""
+    print("Preparing features...")
+    
+    # Time, sensor and derived features from the shared pipeline (as the server builds them)
+    features = potability_features(data['tds_value'], data['turbidity_value'], data['temperature'],
+                                   times=data['reading_time'], voltage=data['voltage'],
+                                   analog_value=data['analog_value'])
+    for col in POTABILITY_COLUMNS:
+        data[col] = features[col]
     
-    # Define feature columns
-    feature_cols = [
-        'tds_value', 'turbidity_value', 'hour', 'day_of_week', 'day_of_year',
-        'temperature', 'voltage', 'analog_value', 'conductivity',
-        'tds_turbidity_ratio', 'quality_index'
-    ]
+    # Handle NaN values - fill with median or mean (models that handle NaN skip this)
+    if fill_missing:
+        fill_missing_values(data)
     
-    return feature_cols
+    return list(POTABILITY_COLUMNS)
+
+def build_potability_classifier(n_jobs=-1):
+    """Untrained potability classifier (with tuned parameters, if model_tuning.py found any)"""
+    return apply_tuned_params(RandomForestClassifier(
+        n_estimators=200,
+        max_depth=15,
+        min_samples_split=5,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=n_jobs
+    ), CLASSIFIER_FILE)
+
+def build_potability_score_regressor():
+    """Untrained potability score regressor (MODEL_BACKEND picks gb or hist; tuned parameters apply)"""
+    return apply_tuned_params(boosting_regressor(), REGRESSOR_FILE)
 
 def train_potability_classifier_with_real_data(data):
     """Train potability classifier with real data"""
     print("\nTraining Potability Classifier with REAL DATA...")
     
-    feature_cols = prepare_features(data)
-    X = data[feature_cols]
+    feature_cols = prepare_features(data, fill_missing=False)
+    X = fill_missing_values(data[feature_cols].copy())
     y = data['potability_status']
     
     # Split data
@@ -180,16 +253,14 @@ def train_potability_classifier_with_real_data(data):
     )
     
     # Train Random Forest Classifier
-    model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        n_jobs=-1
-    )
+    model = build_potability_classifier()
+    X_fit, X_val, y_fit, y_val = validation_split(model, X_train, y_train, stratify=True)
     
-    model.fit(X_train, y_train)
+    model.fit(X_fit, y_fit)
+    joblib.dump(model, CLASSIFIER_FOREST_FILE)  # Base for incremental runs
+    
+    # Compact for serving: fewer, shallower trees, checked against held-out training rows
+    model, compiled, compaction = compact_for_serving(model, X_val, y_val)
     
     # Evaluate
     y_pred = model.predict(X_test)
@@ -200,7 +271,8 @@ def train_potability_classifier_with_real_data(data):
     feature_importance.sort(key=lambda x: x[1], reverse=True)
     
     # Save model
-    joblib.dump(model, 'potability_classifier_real.pkl')
+    save_model(model, CLASSIFIER_FILE, window=training_window(data['reading_time']),
+               metrics={'accuracy': round(float(accuracy), 4)}, compiled=compiled, compaction=compaction)
     
     print(f"SUCCESS: Potability Classifier trained with REAL DATA!")
     print(f"   - Samples: {len(X)}")
@@ -223,7 +295,7 @@ def train_potability_score_regressor_with_real_data(data):
         print("Creating a simple model with available data...")
         
         # Create a simple model with just basic features
-        X = data[['tds_value', 'turbidity_value']].fillna(0)
+        X = fill_missing_values(data[['tds_value', 'turbidity_value']].copy()).fillna(0)
         y_scores = data['potability_score']
         
         # Use a simpler model for small datasets
@@ -232,7 +304,7 @@ def train_potability_score_regressor_with_real_data(data):
         model.fit(X, y_scores)
         
         # Save model
-        joblib.dump(model, 'potability_score_regressor_real.pkl')
+        save_model(model, REGRESSOR_FILE, window=training_window(data['reading_time']))
         
         print(f"SUCCESS: Simple Potability Score Regressor trained with REAL DATA!")
         print(f"   - Samples: {len(X)}")
@@ -240,12 +312,13 @@ def train_potability_score_regressor_with_real_data(data):
         
         return True
     
-    feature_cols = prepare_features(data)
+    feature_cols = prepare_features(data, fill_missing=False)
     X = data[feature_cols]
     y_scores = data['potability_score']
     
-    # Fill any remaining NaN values with 0 (safety check)
-    X = X.fillna(0)
+    if not handles_missing_values():
+        # Fill NaN values, then any remaining ones with 0 (safety check)
+        X = fill_missing_values(X.copy()).fillna(0)
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
@@ -253,14 +326,7 @@ def train_potability_score_regressor_with_real_data(data):
     )
     
     # Train Gradient Boosting Regressor
-    model = GradientBoostingRegressor(
-        n_estimators=200,
-        learning_rate=0.05,
-        max_depth=8,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42
-    )
+    model = build_potability_score_regressor()
     
     model.fit(X_train, y_train)
     
@@ -270,7 +336,8 @@ def train_potability_score_regressor_with_real_data(data):
     r2 = r2_score(y_test, y_pred)
     
     # Save model
-    joblib.dump(model, 'potability_score_regressor_real.pkl')
+    save_model(model, REGRESSOR_FILE, window=training_window(data['reading_time']),
+               metrics={'r2': round(float(r2), 4), 'mae': round(float(mae), 4)})
     
     print(f"SUCCESS: Potability Score Regressor trained with REAL DATA!")
     print(f"   - Samples: {len(X)}")
@@ -279,12 +346,192 @@ def train_potability_score_regressor_with_real_data(data):
     
     return True
 
-def main():
+def load_generations():
+    """Generation records of the current models (empty before the first run)"""
+    try:
+        with open(GENERATIONS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'generations': [], 'tree_generations': []}
+
+def save_generations(history):
+    """Write the generation records next to the models"""
+    temp_path = f'{GENERATIONS_FILE}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    os.replace(temp_path, GENERATIONS_FILE)
+
+def record_generation(history, mode, data, classifier, regressor, **details):
+    """Append what this run trained on and the resulting model sizes"""
+    generation = len(history['generations']) + 1
+    times = pd.to_datetime(data['reading_time'])
+    history['generations'].append(dict({
+        'generation': generation,
+        'mode': mode,
+        'trained_at': datetime.now().isoformat(),
+        'data_start': times.min().isoformat(),
+        'data_end': times.max().isoformat(),
+        'rows': int(len(data)),
+        'classifier_trees': len(getattr(classifier, 'estimators_', [])),
+        'regressor_stages': boosting_stages(regressor) if is_boosting_regressor(regressor) else 0
+    }, **details))
+    return generation
+
+def load_classifier_forest():
+    """The classifier's full forest (the served, possibly compacted, one for older runs)"""
+    return joblib.load(CLASSIFIER_FOREST_FILE if os.path.exists(CLASSIFIER_FOREST_FILE) else CLASSIFIER_FILE)
+
+def record_full_generation(history, data):
+    """Record freshly trained models as a new full generation"""
+    classifier = load_classifier_forest()
+    regressor = joblib.load(REGRESSOR_FILE)
+    generation = record_generation(history, 'full', data, classifier, regressor)
+    # Every tree of a freshly trained forest belongs to this generation
+    history['tree_generations'] = [generation] * len(getattr(classifier, 'estimators_', []))
+    save_generations(history)
+    print(f"   - Recorded as model generation {generation} in {GENERATIONS_FILE}")
+    return generation
+
+def extend_forest(model, X, y, tree_generations, generation):
+    """Grow a random forest by INCREMENT_TREES trees fitted on the new window
+
+    Trees beyond MAX_FOREST_TREES are retired oldest first (a sliding-window
+    ensemble). tree_generations tracks which generation fitted each tree and
+    is trimmed alongside. New trees are grown to the configured depth even
+    if the model was depth-capped by compaction. A window without some of
+    the model's classes (a day of steady water is often all one class) gets
+    one zero-weight row per missing class, so the new trees keep the
+    model's classes_ and predict_proba columns. Returns the number of
+    retired trees.
+    """
+    missing = [label for label in model.classes_ if label not in set(y)]
+    weights = np.ones(len(y) + len(missing))
+    weights[len(y):] = 0
+    X = pd.concat([X, X.iloc[[0] * len(missing)]], ignore_index=True)
+    y = pd.concat([pd.Series(y), pd.Series(missing, dtype=object)], ignore_index=True)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + INCREMENT_TREES,
+                     max_depth=build_potability_classifier().max_depth)
+    model.fit(X, y, sample_weight=weights)
+    tree_generations.extend([generation] * INCREMENT_TREES)
+
+    retired = max(0, len(model.estimators_) - MAX_FOREST_TREES)
+    if retired:
+        model.estimators_ = model.estimators_[retired:]
+        model.set_params(n_estimators=len(model.estimators_))
+        del tree_generations[:retired]
+    return retired
+
+def extend_boosting(model, X, y):
+    """Add INCREMENT_STAGES boosting stages fitted to the current model's residuals on the new window"""
+    add_boosting_stages(model, INCREMENT_STAGES)
+    model.fit(X, y)
+
+def incremental_plan(history):
+    """(models, reason) - the current models to extend, or None and why a full retrain is needed"""
+    incremental_runs = 0
+    for record in reversed(history['generations']):
+        if record['mode'] == 'full':
+            break
+        incremental_runs += 1
+    else:
+        return None, 'no full training on record'
+
+    if incremental_runs >= FULL_RETRAIN_EVERY:
+        return None, f'{incremental_runs} incremental runs since the last full retrain'
+    try:
+        classifier = load_classifier_forest()
+        regressor = joblib.load(REGRESSOR_FILE)
+    except Exception as e:
+        return None, f'cannot load current models ({e})'
+    if not isinstance(classifier, RandomForestClassifier) or not is_boosting_regressor(regressor):
+        return None, 'current models are not a random forest + gradient boosting pair'
+    if type(regressor) is not type(build_potability_score_regressor()):
+        return None, f'MODEL_BACKEND is now {MODEL_BACKEND}'
+    if boosting_stages(regressor) + INCREMENT_STAGES > MAX_BOOSTING_STAGES:
+        return None, f'regressor would exceed {MAX_BOOSTING_STAGES} boosting stages'
+    return (classifier, regressor), None
+
+def train_incremental(history, sensor_data=None):
+    """Extend the current models with readings newer than the last generation
+
+    sensor_data: (tds_data, turbidity_data) already fetched by the caller;
+    by default the new window is fetched here.
+    Returns 'trained', 'skipped' (not enough new data) or 'full' (a full
+    retrain is needed instead).
+    """
+    models, reason = incremental_plan(history)
+    if models is None:
+        print(f"Incremental training not possible: {reason}. Running a full retrain.")
+        return 'full'
+    classifier, regressor = models
+
+    last_seen = pd.Timestamp(history['generations'][-1]['data_end'])
+    print(f"Incremental training on readings after {last_seen}...")
+
+    # Pull the new window plus the tolerance so the first readings still find a partner
+    since = last_seen - MATCH_TOLERANCE
+    if sensor_data is None:
+        tds_data, turbidity_data = get_real_sensor_data(since=since.to_pydatetime())
+    else:
+        tds_data, turbidity_data = (frame[pd.to_datetime(frame['reading_time']) >= since] for frame in sensor_data)
+    if tds_data is None or turbidity_data is None:
+        return 'skipped'
+    data = create_potability_labels(tds_data, turbidity_data)
+    if data is not None:
+        data = data[pd.to_datetime(data['reading_time']) > last_seen].reset_index(drop=True)
+    if data is None or len(data) < MIN_INCREMENT_ROWS:
+        print(f"Only {0 if data is None else len(data)} new labeled readings "
+              f"(need {MIN_INCREMENT_ROWS}) - keeping the current models")
+        return 'skipped'
+
+    feature_cols = prepare_features(data)
+    X = data[feature_cols]
+    y = data['potability_status']
+    if not set(y.unique()) <= set(classifier.classes_):
+        # A class the current trees never saw needs every tree refitted
+        print(f"New window has classes {sorted(y.unique())}, model has {list(classifier.classes_)}. "
+              f"Running a full retrain.")
+        return 'full'
+
+    generation = len(history['generations']) + 1
+    tree_generations = history.get('tree_generations') or [history['generations'][-1]['generation']] * len(classifier.estimators_)
+
+    # The full forest grows; a compacted copy of it is served
+    X_fit, X_val, y_fit, y_val = validation_split(classifier, X, y, stratify=True)
+    start = time.perf_counter()
+    retired = extend_forest(classifier, X_fit, y_fit, tree_generations, generation)
+    extend_boosting(regressor, X.fillna(0), data['potability_score'])
+    seconds = time.perf_counter() - start
+    joblib.dump(classifier, CLASSIFIER_FOREST_FILE)
+    served, compiled, compaction = compact_for_serving(classifier, X_val, y_val)
+
+    window = training_window(data['reading_time'])
+    save_model(served, CLASSIFIER_FILE, window=window, compiled=compiled, compaction=compaction)
+    save_model(regressor, REGRESSOR_FILE, window=window)
+
+    history['tree_generations'] = tree_generations
+    record_generation(history, 'incremental', data, classifier, regressor,
+                      trees_added=INCREMENT_TREES, trees_retired=retired, served_trees=len(served.estimators_),
+                      stages_added=INCREMENT_STAGES, fit_seconds=round(seconds, 3))
+    save_generations(history)
+
+    print(f"SUCCESS: Generation {generation} (incremental) trained on {len(data)} new readings in {seconds:.2f}s")
+    print(f"   - Classifier: +{INCREMENT_TREES} trees, {retired} retired, {len(classifier.estimators_)} total "
+          f"({len(served.estimators_)} served)")
+    print(f"   - Regressor: +{INCREMENT_STAGES} stages, {boosting_stages(regressor)} total")
+    return 'trained'
+
+def main(incremental=False):
     """Main training function with real database data"""
     print("TRAINING WITH REAL DATABASE DATA")
     print("=" * 50)
     print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    history = load_generations()
+    if incremental and train_incremental(history) != 'full':
+        print(f"\nCompleted at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        return
+    
     # Get real sensor data
     tds_data, turbidity_data = get_real_sensor_data()
     
@@ -314,6 +561,9 @@ def main():
     if train_potability_score_regressor_with_real_data(combined_data):
         success_count += 1
     
+    if success_count == 2:
+        record_full_generation(history, combined_data)
+    
     # Summary
     print(f"\nTRAINING WITH REAL DATA COMPLETE!")
     print(f"   - Models trained: {success_count}/2")
@@ -334,4 +584,8 @@ def main():
     print(f"\nCompleted at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark-labels":
+        sizes = [int(n) for n in sys.argv[2:]] or [10000, 100000, 1000000]
+        benchmark_labels(sizes)
+    else:
+        main(incremental="--incremental" in sys.argv[1:])
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Training High-Water Marks
+Records each sensor table's largest id and reading_time at the last
+successful training, with the mean and spread of its readings over the
+training window. Deciding whether to retrain is then a primary-key probe of
+the rows added since (COUNT(*) / AVG WHERE id > last_id) instead of counting
+a time window of both tables.
+
+Retraining is due when enough rows arrived (RETRAIN_MIN_NEW_ROWS), when the
+new readings' mean drifted from the trained one by RETRAIN_DRIFT_STD
+standard deviations, or when a table was cleared (its largest id went back).
+
+Usage:
+    python training_state.py show     # the recorded marks
+    python training_state.py check    # what a check would find now
+"""
+
+import json
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+
+from db import connect_to_database, query
+from device_state import TABLE_VALUES
+
+STATE_FILE = os.environ.get('TRAINING_STATE_FILE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training_state.json'))
+
+# New rows (both tables together) that make a retrain worthwhile
+RETRAIN_MIN_NEW_ROWS = int(os.environ.get('RETRAIN_MIN_NEW_ROWS', 100))
+
+# Shift of the new readings' mean, in training-window standard deviations,
+# that triggers a retrain with fewer rows (at least RETRAIN_DRIFT_MIN_ROWS)
+RETRAIN_DRIFT_STD = float(os.environ.get('RETRAIN_DRIFT_STD', 1.0))
+RETRAIN_DRIFT_MIN_ROWS = int(os.environ.get('RETRAIN_DRIFT_MIN_ROWS', 20))
+
+# Window the trained statistics cover (as the training scripts read it)
+TRAINING_HISTORY_DAYS = int(os.environ.get('TRAINING_HISTORY_DAYS', 30))
+
+def high_water_marks(conn):
+    """{table: {'last_id', 'last_reading_time', 'readings', 'mean', 'std'}} as the tables stand now"""
+    marks = {}
+    for table, value_col in TABLE_VALUES.items():
+        last_id, last_time = query(conn, f'SELECT MAX(id), MAX(reading_time) FROM {table}',
+                                   label=f'{table} high-water mark')[0]
+        conditions, params = [f'{value_col} > 0', 'id <= %s'], [last_id or 0]
+        if TRAINING_HISTORY_DAYS > 0:
+            conditions.append('reading_time >= %s')
+            params.append(datetime.now() - timedelta(days=TRAINING_HISTORY_DAYS))
+        count, mean, mean_square = query(conn, f'SELECT COUNT(*), AVG({value_col}), AVG({value_col} * {value_col}) '
+                                               f'FROM {table} WHERE {" AND ".join(conditions)}',
+                                         params, label=f'{table} window statistics')[0]
+        marks[table] = {
+            'last_id': int(last_id or 0),
+            'last_reading_time': str(last_time) if last_time is not None else None,
+            'readings': int(count),
+            'mean': float(mean) if mean is not None else None,
+            'std': math.sqrt(max(float(mean_square) - float(mean) ** 2, 0.0)) if mean is not None else None
+        }
+    return marks
+
+def changes_since(conn, marks):
+    """{table: {'new_rows', 'new_mean', 'drift', 'reset'}} for the rows past each table's mark
+
+    drift is the new readings' mean shift in trained standard deviations
+    (None without trained statistics or positive new readings).
+    """
+    changes = {}
+    for table, value_col in TABLE_VALUES.items():
+        mark = marks.get(table, {})
+        last_id = mark.get('last_id', 0)
+        largest_id = query(conn, f'SELECT MAX(id) FROM {table}', label=f'{table} high-water mark')[0][0] or 0
+        new_rows, new_mean = query(conn, f'SELECT COUNT(*), AVG(CASE WHEN {value_col} > 0 THEN {value_col} END) '
+                                         f'FROM {table} WHERE id > %s', (last_id,), label=f'{table} new rows')[0]
+        drift = None
+        if new_mean is not None and mark.get('std'):
+            drift = abs(float(new_mean) - mark['mean']) / mark['std']
+        changes[table] = {
+            'new_rows': int(new_rows),
+            'new_mean': float(new_mean) if new_mean is not None else None,
+            'drift': drift,
+            'reset': largest_id < last_id
+        }
+    return changes
+
+def retrain_reason(changes):
+    """Why the changes call for a retrain, or None if they do not"""
+    for table, change in changes.items():
+        if change['reset']:
+            return f"{table} was cleared since the last training"
+    for table, change in changes.items():
+        if (change['drift'] is not None and change['drift'] >= RETRAIN_DRIFT_STD
+                and change['new_rows'] >= RETRAIN_DRIFT_MIN_ROWS):
+            return f"{table} drifted {change['drift']:.1f} std over {change['new_rows']} new readings"
+    new_rows = sum(change['new_rows'] for change in changes.values())
+    if new_rows >= RETRAIN_MIN_NEW_ROWS:
+        return f"{new_rows} new readings (need {RETRAIN_MIN_NEW_ROWS})"
+    return None
+
+def load(path=None):
+    """The recorded state, or None when no training was recorded (or the file is unreadable)"""
+    try:
+        with open(path or STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save(marks, path=None):
+    """Record the marks of a successful training (atomically)"""
+    path = path or STATE_FILE
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'trained_at': datetime.now().isoformat(timespec='seconds'), 'tables': marks}, f, indent=2)
+    os.replace(temp_path, path)
+
+def check(conn, path=None):
+    """(reason to retrain or None, changes) against the recorded marks
+
+    Without a recorded training every row counts as new.
+    """
+    state = load(path)
+    changes = changes_since(conn, state['tables'] if state else {})
+    return retrain_reason(changes), changes
+
+def main():
+    """Command line entry point"""
+    if len(sys.argv) != 2 or sys.argv[1] not in ('show', 'check'):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    if sys.argv[1] == 'show':
+        print(json.dumps(load(), indent=2))
+        return
+    conn = connect_to_database()
+    if not conn:
+        sys.exit(1)
+    try:
+        reason, changes = check(conn)
+    finally:
+        conn.close()
+    print(json.dumps(changes, indent=2))
+    print(f"Retrain: {reason}" if reason else "No retrain needed")
+
+if __name__ == "__main__":
+    main()
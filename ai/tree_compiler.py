@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Tree Model Compiler
+Exports fitted Random Forest / Gradient Boosting models into flat NumPy node
+arrays and evaluates them without going through sklearn's estimator machinery.
+
+Usage:
+    python tree_compiler.py compile potability_classifier.pkl [more.pkl ...]
+    python tree_compiler.py benchmark potability_classifier.pkl [rows]
+"""
+
+import os
+import sys
+import time
+import joblib
+import numpy as np
+
+# Estimators the compiler understands, by class name
+FOREST_CLASSIFIERS = ('RandomForestClassifier', 'ExtraTreesClassifier')
+FOREST_REGRESSORS = ('RandomForestRegressor', 'ExtraTreesRegressor')
+BOOSTING_REGRESSORS = ('GradientBoostingRegressor',)
+
+class CompiledForest:
+    """All trees of an ensemble packed into contiguous node arrays
+
+    Node i of the packed layout has feature[i], threshold[i], left[i],
+    right[i] and value[i]. Leaves point both children at themselves, so a
+    fixed number of steps (max_depth) walks every tree to its leaf without
+    per-node branching in Python.
+    """
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.missing_left = arrays['missing_left']
+        self.roots = arrays['roots']
+        self.kind = str(arrays['kind'])
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features'])
+        self.scale = float(arrays['scale'])
+        self.base = np.asarray(arrays['base'], dtype=float)
+        self.classes_ = arrays.get('classes')
+        self.feature_names_in_ = arrays.get('feature_names')
+
+    def to_dict(self):
+        """Plain dict of arrays and metadata (what save_compiled writes)"""
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'missing_left': self.missing_left,
+            'roots': self.roots,
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features_in_,
+            'scale': self.scale,
+            'base': self.base,
+            'classes': self.classes_,
+            'feature_names': self.feature_names_in_
+        }
+
+    def leaves(self, X):
+        """Leaf node index reached in every tree, shape (n_rows, n_trees)"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f'X has {X.shape[1]} features, model expects {self.n_features_in_}')
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_raw(self, X):
+        """Aggregated leaf values, shape (n_rows, n_outputs)"""
+        leaf_values = self.value[self.leaves(X)]
+        if self.kind == 'boosting':
+            return self.base + self.scale * leaf_values.sum(axis=1)
+        return leaf_values.mean(axis=1)
+
+    def predict_proba(self, X):
+        """Class probabilities (classifiers only)"""
+        if self.kind != 'classifier':
+            raise AttributeError('predict_proba is only available for classifiers')
+        return self.predict_raw(X)
+
+    def predict(self, X):
+        """Class labels for classifiers, values for regressors"""
+        raw = self.predict_raw(X)
+        if self.kind == 'classifier':
+            return self.classes_[np.argmax(raw, axis=1)]
+        return raw[:, 0]
+
+def compile_model(model):
+    """Compile a fitted tree ensemble into a CompiledForest
+
+    Raises ValueError for estimators that are not supported.
+    """
+    name = type(model).__name__
+
+    if name in FOREST_CLASSIFIERS or name in FOREST_REGRESSORS:
+        kind = 'classifier' if name in FOREST_CLASSIFIERS else 'forest'
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        scale, base = 1.0, np.zeros(1)
+    elif name in BOOSTING_REGRESSORS:
+        kind = 'boosting'
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        scale = float(model.learning_rate)
+        if model.init_ == 'zero':
+            base = np.zeros(1)
+        else:
+            # Constant initial prediction (DummyRegressor for squared error)
+            base = np.asarray(model.init_.predict(np.zeros((1, model.n_features_in_))), dtype=float).ravel()
+    else:
+        raise ValueError(f'Cannot compile {name}: only Random Forest / Extra Trees and '
+                         f'GradientBoostingRegressor models are supported')
+
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError(f'Cannot compile {name}: multi-output models are not supported')
+
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    n_nodes = int(offsets[-1])
+
+    feature = np.zeros(n_nodes, dtype=np.intp)
+    threshold = np.zeros(n_nodes, dtype=np.float64)
+    left = np.zeros(n_nodes, dtype=np.intp)
+    right = np.zeros(n_nodes, dtype=np.intp)
+    missing_left = np.zeros(n_nodes, dtype=bool)
+    n_values = trees[0].value.shape[2] if kind == 'classifier' else 1
+    value = np.zeros((n_nodes, n_values), dtype=np.float64)
+    max_depth = 0
+
+    for tree, start in zip(trees, offsets[:-1]):
+        stop = start + tree.node_count
+        own = np.arange(start, stop)
+        is_leaf = tree.children_left == -1
+
+        feature[start:stop] = np.where(is_leaf, 0, tree.feature)
+        threshold[start:stop] = np.where(is_leaf, 0.0, tree.threshold)
+        left[start:stop] = np.where(is_leaf, own, tree.children_left + start)
+        right[start:stop] = np.where(is_leaf, own, tree.children_right + start)
+        if hasattr(tree, 'missing_go_to_left'):
+            missing_left[start:stop] = np.asarray(tree.missing_go_to_left, dtype=bool) & ~is_leaf
+
+        node_values = tree.value[:, 0, :]
+        if kind == 'classifier':
+            # Per-tree class proportions, as DecisionTreeClassifier.predict_proba
+            totals = node_values.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            node_values = node_values / totals
+        value[start:stop] = node_values
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    feature_names = getattr(model, 'feature_names_in_', None)
+    return CompiledForest({
+        'feature': feature,
+        'threshold': threshold,
+        'left': left,
+        'right': right,
+        'value': value,
+        'missing_left': missing_left,
+        'roots': offsets[:-1].astype(np.intp),
+        'kind': kind,
+        'max_depth': max_depth,
+        'n_features': int(model.n_features_in_),
+        'scale': scale,
+        'base': base,
+        'classes': getattr(model, 'classes_', None) if kind == 'classifier' else None,
+        'feature_names': None if feature_names is None else np.asarray(feature_names, dtype=object)
+    })
+
+def compiled_path_for(model_path):
+    """potability_classifier.pkl -> potability_classifier_compiled.pkl"""
+    root, ext = os.path.splitext(model_path)
+    return f'{root}_compiled{ext or ".pkl"}'
+
+def save_compiled(compiled, path):
+    """Write a compiled model as an uncompressed joblib file"""
+    joblib.dump(compiled.to_dict(), path)
+
+def load_compiled(path, mmap_mode=None):
+    """Load a compiled model written by save_compiled()"""
+    return CompiledForest(joblib.load(path, mmap_mode=mmap_mode))
+
+def sample_inputs(compiled, n_rows, seed=42):
+    """Random rows spanning the split thresholds each feature is tested against"""
+    rng = np.random.default_rng(seed)
+    is_split = compiled.left != np.arange(len(compiled.left))
+    X = np.empty((n_rows, compiled.n_features_in_))
+    for column in range(compiled.n_features_in_):
+        thresholds = compiled.threshold[is_split & (compiled.feature == column)]
+        if len(thresholds):
+            low, high = thresholds.min(), thresholds.max()
+            margin = max(1.0, 0.1 * (high - low))
+            X[:, column] = rng.uniform(low - margin, high + margin, n_rows)
+        else:
+            X[:, column] = rng.uniform(0, 1, n_rows)
+    return X
+
+def benchmark(model_path, n_rows=500):
+    """Compare per-row latency and outputs of sklearn vs the compiled evaluator"""
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = compile_model(model)
+    compile_seconds = time.perf_counter() - start
+
+    X = sample_inputs(compiled, n_rows)
+    predict_fn = model.predict_proba if compiled.kind == 'classifier' else model.predict
+
+    def per_row_latencies(fn):
+        fn(X[:1])  # warm up
+        latencies = np.empty(n_rows)
+        for i in range(n_rows):
+            start = time.perf_counter()
+            fn(X[i:i + 1])
+            latencies[i] = time.perf_counter() - start
+        return latencies * 1000
+
+    sklearn_ms = per_row_latencies(predict_fn)
+    compiled_fn = compiled.predict_proba if compiled.kind == 'classifier' else compiled.predict
+    compiled_ms = per_row_latencies(compiled_fn)
+
+    max_difference = float(np.max(np.abs(np.asarray(predict_fn(X), dtype=float) -
+                                         np.asarray(compiled_fn(X), dtype=float))))
+
+    print(f"Model: {model_path} ({type(model).__name__}, {len(compiled.roots)} trees, "
+          f"{len(compiled.feature)} nodes, depth {compiled.max_depth})")
+    print(f"   - joblib.load: {load_seconds * 1000:.1f} ms, compile: {compile_seconds * 1000:.1f} ms")
+    print(f"   - sklearn  per row: p50 {np.percentile(sklearn_ms, 50):.3f} ms, "
+          f"p99 {np.percentile(sklearn_ms, 99):.3f} ms")
+    print(f"   - compiled per row: p50 {np.percentile(compiled_ms, 50):.3f} ms, "
+          f"p99 {np.percentile(compiled_ms, 99):.3f} ms")
+    print(f"   - max |sklearn - compiled| over {n_rows} rows: {max_difference:.2e}")
+
+    return {
+        'sklearn_p50_ms': float(np.percentile(sklearn_ms, 50)),
+        'sklearn_p99_ms': float(np.percentile(sklearn_ms, 99)),
+        'compiled_p50_ms': float(np.percentile(compiled_ms, 50)),
+        'compiled_p99_ms': float(np.percentile(compiled_ms, 99)),
+        'max_difference': max_difference
+    }
+
+def main():
+    """Command line entry point"""
+    if len(sys.argv) < 3 or sys.argv[1] not in ('compile', 'benchmark'):
+        print(__doc__.strip())
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'compile':
+        for model_path in sys.argv[2:]:
+            compiled = compile_model(joblib.load(model_path))
+            output_path = compiled_path_for(model_path)
+            save_compiled(compiled, output_path)
+            print(f"Compiled {model_path} -> {output_path} "
+                  f"({len(compiled.roots)} trees, {len(compiled.feature)} nodes)")
+    else:
+        n_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+        benchmark(sys.argv[2], n_rows)
+
+if __name__ == "__main__":
+    main()